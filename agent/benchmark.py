@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the MCP agent
+
+Drives the compiled `graph` from mcp-agent/agent.py end to end against a
+deterministic scripted chat model (no network, no API key) and the real
+math_server.py and weather_server.py, then reports:
+
+  • session setup time (cold MCP pool entry)
+  • tool-call latency through the pooled sessions
+  • turn latency percentiles (p50/p95/p99)
+  • throughput with N concurrent conversation threads
+  • in-process cost of the weather tools' data lookup and formatting
+  • peak RSS of the agent process and the total of its running server subprocesses
+
+Usage:
+  poetry run python benchmark.py
+  poetry run python benchmark.py --turns 50 --concurrency 8 --save baseline.json
+  poetry run python benchmark.py --compare baseline.json
+  poetry run python benchmark.py --gateway memory   # tools hosted by the in-process gateway
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+AGENT_DIR = Path(__file__).parent
+sys.path.insert(0, str(AGENT_DIR / "mcp-agent"))
+
+# Keep benchmark checkpoints out of the real database
+os.environ.setdefault("CHECKPOINT_DB", os.path.join(tempfile.mkdtemp(prefix="mcp-bench-"), "checkpoints.sqlite"))
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from mcp.client.stdio import get_default_environment
+
+import agent as agent_module
+from agent_cache import set_chat_model_factory
+from session_pool import MCPSessionPool, get_session_pool, shutdown_session_pool
+from tool_cache import get_tool_cache
+
+# Relative slowdown of a metric (vs. the baseline) that counts as a regression
+REGRESSION_THRESHOLD = 0.20
+
+
+def resolve_tool_name(names: List[str], name: str) -> str:
+    """`name`, or its namespaced form (e.g. math_add) when the tools come from the gateway"""
+    if name in names:
+        return name
+    return next((candidate for candidate in names if candidate.endswith(f"_{name}")), name)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    A deterministic stand-in for the chat model.
+
+    A new human message gets one step with parallel calls to `add` and
+    `get_current_weather`; once tool results are present it answers. The
+    reply depends only on the conversation, so it is safe to share between
+    concurrent threads.
+    """
+
+    tool_names: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        return self.model_copy(update={"tool_names": [tool.name for tool in tools]})
+
+    def _reply(self, messages: List[Any]) -> AIMessage:
+        if messages and isinstance(messages[-1], ToolMessage):
+            results = ", ".join(str(m.content).splitlines()[0] for m in messages if isinstance(m, ToolMessage))
+            return AIMessage(content=f"Final Answer: {results}")
+        turn = sum(isinstance(m, HumanMessage) for m in messages)
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": resolve_tool_name(self.tool_names, "add"), "args": {"a": turn, "b": 3}, "id": f"call_add_{uuid.uuid4().hex[:8]}"},
+                {"name": resolve_tool_name(self.tool_names, "get_current_weather"), "args": {"city": "Tokyo"}, "id": f"call_weather_{uuid.uuid4().hex[:8]}"},
+            ],
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        if reply.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                    for index, call in enumerate(reply.tool_calls)
+                ],
+            ))
+            return
+        for word in reply.content.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+def benchmark_mcp_config(gateway: str = agent_module.TOOL_GATEWAY) -> Dict[str, Any]:
+    """The default MCP config, with stdio servers run by this interpreter and with quiet server logging"""
+    env = {**get_default_environment(), "FASTMCP_LOG_LEVEL": "WARNING"}
+    return {
+        name: {**connection, "command": sys.executable, "env": env} if connection["transport"] == "stdio" else connection
+        for name, connection in agent_module.default_mcp_config(gateway).items()
+    }
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarize latencies (seconds) as milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return ordered[min(int(round(p * (len(ordered) - 1))), len(ordered) - 1)] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def measure_session_setup(config: Dict[str, Any], repeats: int) -> List[float]:
+    """Time opening a cold pool entry, i.e. spawning the servers and doing the handshake"""
+    samples = []
+    for _ in range(repeats):
+        pool = MCPSessionPool()
+        start = time.perf_counter()
+        async with pool.session(config):
+            samples.append(time.perf_counter() - start)
+        await pool.aclose()
+    return samples
+
+
+async def measure_tool_calls(config: Dict[str, Any], calls: int) -> Dict[str, List[float]]:
+    """Time individual tool calls through a warm pooled session (result cache bypassed)"""
+    samples: Dict[str, List[float]] = {"add": [], "get_current_weather": []}
+    arguments = {"add": {"a": 2, "b": 3}, "get_current_weather": {"city": "Paris"}}
+    async with get_session_pool().session(config) as client:
+        tools = {tool.name: tool for tool in client.get_tools()}
+        for _ in range(calls):
+            for name, args in arguments.items():
+                get_tool_cache().invalidate()
+                start = time.perf_counter()
+                await tools[resolve_tool_name(list(tools), name)].ainvoke(args)
+                samples[name].append(time.perf_counter() - start)
+    return samples
+
+
+async def run_turns(config: Dict[str, Any], thread_id: str, turns: int, samples: List[float]) -> None:
+    run_config = {"configurable": {"thread_id": thread_id}}
+    for turn in range(turns):
+        state = {"messages": [HumanMessage(content=f"What is {turn} + 3, and the weather in Tokyo?")]}
+        if turn == 0:
+            state["mcp_config"] = config
+        start = time.perf_counter()
+        await agent_module.graph.ainvoke(state, run_config)
+        samples.append(time.perf_counter() - start)
+
+
+async def measure_turns(config: Dict[str, Any], turns: int, concurrency: int) -> Dict[str, Any]:
+    """Run `concurrency` conversation threads of `turns` turns each against the compiled graph"""
+    # Warm the pool and the compiled agent so the numbers describe steady state
+    await run_turns(config, f"warmup-{uuid.uuid4().hex}", 1, [])
+
+    samples: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_turns(config, f"bench-{uuid.uuid4().hex}", turns, samples) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    return {
+        "latency": percentiles(samples),
+        "throughput_turns_per_s": len(samples) / elapsed if elapsed else 0.0,
+        "wall_s": elapsed,
+    }
+
+
+WEATHER_CALLS = {
+    "get_current_weather": ("Tokyo",),
+    "get_weather_forecast": ("Paris", 7),
+    "get_weather_alerts": ("Miami",),
+    "compare_weather": ("Tokyo", "London"),
+    "get_current_weather_many": (["Tokyo", "Paris", "New York", "London", "Sydney"],),
+}
+
+
+async def measure_weather_formatting(number: int) -> Dict[str, float]:
+    """Microseconds per direct call of each weather tool coroutine (no MCP round trip, mock provider)"""
+    sys.path.insert(0, str(AGENT_DIR))
+    import weather_server
+
+    results = {}
+    for name, args in WEATHER_CALLS.items():
+        tool = getattr(weather_server, name)
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(number):
+                await tool(*args)
+            timings.append(time.perf_counter() - start)
+        results[f"{name}_us"] = min(timings) / number * 1e6
+    return results
+
+
+def descendant_pids(pid: int) -> List[int]:
+    """Running descendants of `pid`, from the parent links in /proc"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                # The command name may contain spaces; the fields after it do not
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    found, pending = [], [pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            found.append(child)
+            pending.append(child)
+    return found
+
+
+def servers_peak_rss_mb() -> Optional[float]:
+    """
+    Sum of the peak RSS (VmHWM) of the server processes this one is running,
+    or None where /proc is unavailable. Sampled while the servers are up:
+    RUSAGE_CHILDREN only reports the largest reaped child, not a total.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    total_kb = 0
+    for pid in descendant_pids(os.getpid()):
+        try:
+            with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+                total_kb += next((int(line.split()[1]) for line in f if line.startswith("VmHWM:")), 0)
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+def peak_rss_mb(servers_mb: Optional[float]) -> Dict[str, Optional[float]]:
+    """Peak resident set size of this process, plus the servers' total sampled earlier"""
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    return {
+        "self_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "servers_mb": servers_mb,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    set_chat_model_factory(lambda settings: ScriptedChatModel())
+    config = benchmark_mcp_config(args.gateway)
+
+    print("⏱️  Measuring session setup...")
+    setup = await measure_session_setup(config, args.setup_repeats)
+
+    print("🔧 Measuring tool-call latency...")
+    tool_samples = await measure_tool_calls(config, args.tool_calls)
+
+    print(f"💬 Running {args.concurrency} thread(s) × {args.turns} turn(s)...")
+    turns = await measure_turns(config, args.turns, args.concurrency)
+
+    print("🌤️  Timing weather tool formatting...")
+    weather = await measure_weather_formatting(args.micro_calls)
+
+    # While the pooled servers are still running
+    servers_mb = servers_peak_rss_mb()
+    await shutdown_session_pool()
+    set_chat_model_factory(None)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "turns": args.turns,
+            "concurrency": args.concurrency,
+            "gateway": args.gateway,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "session_setup": percentiles(setup),
+        "tool_calls": {name: percentiles(samples) for name, samples in tool_samples.items()},
+        "turns": turns,
+        "weather_formatting": weather,
+        "peak_rss": peak_rss_mb(servers_mb),
+    }
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Return the metrics that regressed by more than REGRESSION_THRESHOLD"""
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    print("\n📊 Comparison with baseline:")
+    for name in sorted(current):
+        if name not in previous or name.endswith(".count") or not previous[name]:
+            continue
+        change = (current[name] - previous[name]) / previous[name]
+        # Throughput regresses when it drops; everything else when it grows
+        worse = -change if "throughput" in name else change
+        marker = "🔴" if worse > REGRESSION_THRESHOLD else "🟢" if worse < -REGRESSION_THRESHOLD else "⚪"
+        print(f"  {marker} {name:<45} {previous[name]:>10.2f} → {current[name]:>10.2f} ({change:+.0%})")
+        if worse > REGRESSION_THRESHOLD:
+            regressions.append(name)
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    def line(label: str, stats: Dict[str, float]) -> None:
+        print(f"  • {label:<26} p50 {stats['p50_ms']:8.2f} ms | p95 {stats['p95_ms']:8.2f} ms | p99 {stats['p99_ms']:8.2f} ms")
+
+    print("\n📋 Results")
+    print("=" * 50)
+    line("Session setup", results["session_setup"])
+    for name, stats in results["tool_calls"].items():
+        line(f"Tool {name}", stats)
+    line("Turn latency", results["turns"]["latency"])
+    print(f"  • {'Throughput':<26} {results['turns']['throughput_turns_per_s']:.1f} turns/s")
+    for name, micros in results["weather_formatting"].items():
+        print(f"  • {name.removesuffix('_us'):<26} {micros:8.2f} µs per call (in-process)")
+    rss = results["peak_rss"]
+    servers = f" | {rss['servers_mb']:.1f} MB servers" if rss["servers_mb"] is not None else ""
+    print(f"  • {'Peak RSS':<26} {rss['self_mb']:.1f} MB agent{servers}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the MCP agent")
+    parser.add_argument("--turns", type=int, default=20, help="turns per conversation thread")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent conversation threads")
+    parser.add_argument("--tool-calls", type=int, default=50, help="calls per tool for tool latency")
+    parser.add_argument("--setup-repeats", type=int, default=3, help="cold session setups to time")
+    parser.add_argument("--micro-calls", type=int, default=2000, help="calls per weather tool in the microbenchmark")
+    parser.add_argument("--gateway", choices=["off", "process", "memory"], default=agent_module.TOOL_GATEWAY,
+                        help="host the tools as separate servers, in one gateway process, or in this process")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare with a saved JSON baseline")
+    args = parser.parse_args()
+
+    print("🏁 MCP Agent Benchmark")
+    print("=" * 50)
+    results = asyncio.run(run_benchmark(args))
+    print_report(results)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Baseline saved to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()))
+        if regressions:
+            print(f"\n❌ {len(regressions)} metric(s) regressed by more than {REGRESSION_THRESHOLD:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the agent graph module
+
+`langgraph dev` reloads, worker cold starts and anything else that imports
+mcp-agent/agent.py pay for its imports. This script profiles the import in
+a fresh interpreter with `python -X importtime` and fails when:
+
+  • the cumulative import time exceeds the budget (best of several runs), or
+  • a module that agent.py is meant to defer until the first turn
+    (langchain_openai, the MCP client stack, langgraph.prebuilt) gets
+    imported eagerly again.
+
+  python check_import_time.py                  # default budget
+  python check_import_time.py --budget-ms 800 --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+AGENT_DIR = Path(__file__).resolve().parent / "mcp-agent"
+DEFAULT_BUDGET_MS = float(os.getenv("AGENT_IMPORT_BUDGET_MS", "1500"))
+# Must stay out of `import agent`; each is loaded on the first turn instead
+DEFERRED_MODULES = ("langchain_openai", "openai", "langchain_mcp_adapters", "mcp", "langgraph.prebuilt", "session_pool")
+
+
+def profile_import(module: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Import `module` in a fresh interpreter; return its cumulative ms and {name: (self µs, cumulative µs)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=AGENT_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "AGENT_PREWARM": "0"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules[module][1] / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the agent module's import time against a budget")
+    parser.add_argument("--module", default="agent", help="module to import from mcp-agent/ (default: agent)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to try; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="list this many modules with the largest self time")
+    args = parser.parse_args()
+
+    print(f"⏱️  Profiling `import {args.module}` ({args.runs} run(s))...")
+    runs = [profile_import(args.module) for _ in range(max(args.runs, 1))]
+    total_ms, modules = min(runs, key=lambda run: run[0])
+
+    heaviest: List[Tuple[str, Tuple[int, int]]] = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)
+    print(f"\n📦 {len(modules)} modules imported; heaviest by self time:")
+    for name, (self_us, cumulative_us) in heaviest[:args.top]:
+        print(f"   {self_us / 1000:8.1f} ms  (cumulative {cumulative_us / 1000:8.1f} ms)  {name}")
+
+    failed = False
+    eager = [name for name in DEFERRED_MODULES if name in modules]
+    if eager:
+        failed = True
+        print(f"\n❌ Imported eagerly but meant to be deferred: {', '.join(eager)}")
+
+    if total_ms > args.budget_ms:
+        failed = True
+        print(f"\n❌ import {args.module}: {total_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    else:
+        print(f"\n✅ import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
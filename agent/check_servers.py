@@ -3,116 +3,127 @@
 Check script for MCP servers
 
 This script checks the status of all MCP servers.
+
+Servers are found through the runtime registry (see server_registry.py)
+rather than by scanning the process table. When `start_servers.py
+--supervise` is running, its control socket also reports each server's
+uptime and restarts, the request count of SSE workers, and the recent log
+lines it keeps in memory.
 """
 
-import subprocess
-import sys
 import os
-from pathlib import Path
+import time
+
+from server_registry import launcher_owned, registered_servers, send_command, tail_lines
+
+EXPECTED_SERVERS = ["math_server.py", "weather_server.py"]
+# Hosts the tools of every expected server (start_servers.py --gateway)
+GATEWAY_SERVER = "gateway_server.py"
+LOG_FILES = ["math_server.log", "weather_server.log", "gateway_server.log"]
+
+
+def format_uptime(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+
 
 def check_server_status():
-    """Check if MCP servers are running"""
-    
-    server_files = ["math_server.py", "weather_server.py"]
-    running_servers = []
-    
-    for server_file in server_files:
-        try:
-            # Find processes containing the server filename
-            result = subprocess.run([
-                "pgrep", "-f", server_file
-            ], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                pids = result.stdout.strip().split('\n')
-                for pid in pids:
-                    if pid:  # Make sure PID is not empty
-                        running_servers.append((server_file, pid))
-            
-        except FileNotFoundError:
-            # pgrep not available, try ps instead
-            try:
-                result = subprocess.run([
-                    "ps", "aux"
-                ], capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    lines = result.stdout.split('\n')
-                    for line in lines:
-                        if server_file in line and 'python' in line:
-                            parts = line.split()
-                            if len(parts) > 1:
-                                running_servers.append((server_file, parts[1]))
-            except:
-                pass
-    
-    return running_servers
+    """Return the supervisor's status (or None if none is running) and the registered server processes"""
+    return send_command({"command": "status"}), registered_servers()
+
 
 def check_log_files():
     """Check for log files and their recent content"""
-    
-    log_files = ["math_server.log", "weather_server.log"]
+
     log_info = []
-    
-    for log_file in log_files:
+
+    for log_file in LOG_FILES:
         if os.path.exists(log_file):
             try:
-                # Get file size
-                size = os.path.getsize(log_file)
-                
-                # Get last few lines
-                with open(log_file, 'r') as f:
-                    lines = f.readlines()
-                    last_lines = lines[-3:] if len(lines) >= 3 else lines
-                
-                log_info.append((log_file, size, last_lines))
-            except:
+                # Only the end of the file is read, however large the log is
+                log_info.append((log_file, os.path.getsize(log_file), tail_lines(log_file, 3)))
+            except OSError:
                 log_info.append((log_file, 0, []))
-    
+
     return log_info
 
+
 def main():
     print("📋 MCP Server Status Check")
     print("=" * 35)
-    
-    # Check running processes
-    running_servers = check_server_status()
-    
-    if running_servers:
+
+    supervisor, running_servers = check_server_status()
+    supervised_pids = set()
+
+    if supervisor and "servers" in supervisor:
+        print(f"🧭 Supervisor (PID: {supervisor['launcher_pid']}, up {format_uptime(supervisor['uptime'])}):")
+        # SSE worker names already carry their port
+        for server in supervisor["servers"]:
+            if server["pid"]:
+                supervised_pids.add(server["pid"])
+                state = "ready" if server["ready"] else "starting"
+                # Only SSE workers report requests; a stdio server's only client is the supervisor's probe
+                requests = f", {server['requests']} request(s)" if server.get("requests") is not None else ""
+                print(f"  • {server['name']} (PID: {server['pid']}, {state}, up {format_uptime(server['uptime'])}, "
+                      f"{server['restarts']} restart(s){requests})")
+                if server["log"]["dropped"]:
+                    print(f"    ⚠️  {server['log']['dropped']} log line(s) dropped while the disk was behind")
+            else:
+                print(f"  • {server['name']} (restarting, {server['restarts']} restart(s))")
+        print()
+
+    others = [record for record in running_servers if record["pid"] not in supervised_pids]
+    if others:
         print("🟢 Running Servers:")
-        for server_file, pid in running_servers:
-            server_name = server_file.replace('.py', '').replace('_', ' ').title()
-            print(f"  • {server_name} (PID: {pid})")
-    else:
+        for record in others:
+            server_name = record["server"].replace('.py', '').replace('_', ' ').title()
+            port = f" :{record['port']}" if record["port"] else ""
+            uptime = format_uptime(max(0.0, time.time() - record["started_at"]))
+            owner = "" if launcher_owned(record) else f", started by PID {record.get('parent_pid', '?')}"
+            print(f"  • {server_name} (PID: {record['pid']}{port}, {record['transport']}, up {uptime}{owner})")
+    elif not supervised_pids:
         print("🔴 No MCP servers are currently running")
-    
+
     print()
-    
-    # Check log files
-    log_info = check_log_files()
-    
-    if log_info:
-        print("📝 Log Files:")
-        for log_file, size, last_lines in log_info:
-            print(f"  • {log_file} ({size} bytes)")
-            if last_lines:
-                print("    Recent entries:")
-                for line in last_lines:
-                    print(f"      {line.strip()}")
-            else:
-                print("    (empty or unreadable)")
-            print()
+
+    # The supervisor keeps each server's recent lines in memory; otherwise read the log files
+    recent = send_command({"command": "logs", "lines": 3}) if supervisor else None
+    if recent and "logs" in recent:
+        print("📝 Recent Log Entries:")
+        for name, lines in recent["logs"].items():
+            print(f"  • {name}")
+            for line in lines or ["(nothing yet)"]:
+                print(f"      {line.strip()}")
+        print()
     else:
-        print("📝 No log files found")
-    
+        log_info = check_log_files()
+
+        if log_info:
+            print("📝 Log Files:")
+            for log_file, size, last_lines in log_info:
+                print(f"  • {log_file} ({size} bytes)")
+                if last_lines:
+                    print("    Recent entries:")
+                    for line in last_lines:
+                        print(f"      {line.strip()}")
+                else:
+                    print("    (empty or unreadable)")
+                print()
+        else:
+            print("📝 No log files found")
+
     # Check if servers should be running
-    expected_servers = ["math_server.py", "weather_server.py"]
-    missing_servers = []
-    
-    for expected in expected_servers:
-        if not any(server == expected for server, _ in running_servers):
-            missing_servers.append(expected)
-    
+    running_files = {record["server"] for record in running_servers}
+    if supervisor and "servers" in supervisor:
+        running_files.update(server["server"] for server in supervisor["servers"] if server["pid"])
+    if GATEWAY_SERVER in running_files:
+        running_files.update(EXPECTED_SERVERS)
+    missing_servers = [expected for expected in EXPECTED_SERVERS if expected not in running_files]
+
     if missing_servers:
         print("⚠️  Expected but not running:")
         for server in missing_servers:
@@ -122,11 +133,11 @@ def main():
         print("  poetry run python start_servers.py")
     else:
         print("✅ All expected servers are running!")
-    
+
     print("\n🔧 Management Commands:")
     print("  Start all:  poetry run python start_servers.py")
     print("  Stop all:   poetry run python stop_servers.py")
     print("  Check:      poetry run python check_servers.py")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+City Index
+
+A compact, memory-mapped index for resolving city names typed by a model or
+a user to a known city. It supports:
+
+  • Unicode/case normalization ("SÃO PAULO", "sao-paulo" → "sao paulo")
+  • aliases ("NYC" → New York) and "Name, CC" country qualifiers
+  • prefix search over a sorted key array
+  • bounded-edit-distance fuzzy matching ("Londn" → London)
+
+The index is a single binary file built from a CSV (or a GeoNames dump) and
+read through mmap, so opening it is O(1) and only the pages a lookup touches
+become resident. Exact and prefix lookups are binary searches; fuzzy lookups
+use a symmetric-delete table (SymSpell style) so they never scan every key.
+
+Usage:
+  python city_index.py build data/cities.csv -o data/cities.idx
+  python city_index.py build cities15000.txt --geonames -o cities.idx
+  python city_index.py lookup data/cities.idx "new yrok"
+"""
+
+import argparse
+import csv
+import heapq
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import unicodedata
+import zlib
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+MAGIC = b"CIDX"
+VERSION = 1
+
+# magic, version, n_cities, n_keys, n_deletes, then offset/length of each section
+HEADER = struct.Struct("<4sI3I10I")
+# name offset, name length, country code, latitude, longitude, population
+CITY_RECORD = struct.Struct("<IH2sffI")
+
+# Fuzzy matching: edits allowed by query length, and how much of each key the delete table covers
+MAX_EDIT_DISTANCE = 2
+DELETE_PREFIX_LENGTH = 7
+# Prefix searches rank at most this many matching keys by population
+PREFIX_SCAN_LIMIT = 5000
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(name: str) -> str:
+    """Fold case, strip accents and collapse punctuation/whitespace"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(_NON_WORD.sub(" ", stripped.casefold()).split())
+
+
+def max_distance_for(key: str) -> int:
+    """Short names tolerate fewer typos before unrelated cities start to match"""
+    if len(key) <= 3:
+        return 0
+    if len(key) <= 6:
+        return 1
+    return MAX_EDIT_DISTANCE
+
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Levenshtein distance between a and b, or limit + 1 once it must exceed limit.
+
+    Only the diagonal band of width 2 * limit + 1 is computed, so the cost is
+    O(limit * len(a)) rather than O(len(a) * len(b)).
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        best = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char_a != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+def _deletes(key: str, distance: int) -> set:
+    """All strings reachable from key's prefix by deleting up to `distance` characters"""
+    prefix = key[:DELETE_PREFIX_LENGTH]
+    variants = {prefix}
+    frontier = {prefix}
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        variants |= frontier
+    return variants
+
+
+def _hash(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class City(NamedTuple):
+    # Ids are assigned in descending population order, so a lower id is a bigger city
+    id: int
+    name: str
+    country: str
+    latitude: float
+    longitude: float
+    population: int
+
+
+class CityRecord(NamedTuple):
+    """A city as read from source data, before indexing"""
+    name: str
+    country: str
+    latitude: float
+    longitude: float
+    population: int
+    aliases: Tuple[str, ...] = ()
+
+
+class CityMatch(NamedTuple):
+    """
+    Outcome of resolving a name.
+
+    status is "exact" (name or alias matched), "fuzzy" (one best candidate
+    within the edit-distance bound) or "not_found"; suggestions lists other
+    plausible cities in either of the last two cases.
+    """
+    status: str
+    city: Optional[City]
+    suggestions: Tuple[City, ...] = ()
+
+
+class CityIndex:
+    """Read-only view over a city index file"""
+
+    def __init__(self, buffer, close=None):
+        self._buffer = buffer
+        self._close = close
+        if len(buffer) < HEADER.size:
+            raise ValueError(f"Not a version {VERSION} city index")
+        fields = HEADER.unpack_from(buffer, 0)
+        magic, version, self.n_cities, self.n_keys, self.n_deletes = fields[:5]
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} city index")
+        (names_off, names_len, cities_off, keys_off, keys_len,
+         key_offsets_off, key_cities_off, delete_hashes_off, delete_keys_off, _) = fields[5:]
+
+        view = memoryview(buffer)
+        self._names = view[names_off:names_off + names_len]
+        self._cities = view[cities_off:cities_off + self.n_cities * CITY_RECORD.size]
+        self._keys = view[keys_off:keys_off + keys_len]
+        # Zero-copy u32 arrays over the mapped file
+        self._key_offsets = view[key_offsets_off:key_offsets_off + (self.n_keys + 1) * 4].cast("I")
+        self._key_cities = view[key_cities_off:key_cities_off + self.n_keys * 4].cast("I")
+        self._delete_hashes = view[delete_hashes_off:delete_hashes_off + self.n_deletes * 4].cast("I")
+        self._delete_keys = view[delete_keys_off:delete_keys_off + self.n_deletes * 4].cast("I")
+        self._key_view = _KeySequence(self)
+
+    @classmethod
+    def open(cls, path: str) -> "CityIndex":
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mapped, close=mapped.close)
+        except ValueError:
+            mapped.close()
+            raise
+
+    def close(self) -> None:
+        for view in (self._names, self._cities, self._keys, self._key_offsets,
+                     self._key_cities, self._delete_hashes, self._delete_keys):
+            view.release()
+        if self._close is not None:
+            self._close()
+
+    def __len__(self) -> int:
+        return self.n_cities
+
+    def city(self, city_id: int) -> City:
+        name_off, name_len, country, latitude, longitude, population = CITY_RECORD.unpack_from(
+            self._cities, city_id * CITY_RECORD.size
+        )
+        name = bytes(self._names[name_off:name_off + name_len]).decode("utf-8")
+        return City(city_id, name, country.decode("ascii").rstrip(), latitude, longitude, population)
+
+    def key(self, position: int) -> bytes:
+        return bytes(self._keys[self._key_offsets[position]:self._key_offsets[position + 1]])
+
+    def _key_range(self, key: bytes) -> Tuple[int, int]:
+        start = bisect_left(self._key_view, key)
+        end = start
+        while end < self.n_keys and self.key(end) == key:
+            end += 1
+        return start, end
+
+    def _by_population(self, city_ids: Iterable[int]) -> List[City]:
+        return [self.city(city_id) for city_id in sorted(set(city_ids))]
+
+    def lookup(self, name: str) -> List[City]:
+        """Cities whose name or alias matches exactly after normalization, most populous first"""
+        country = None
+        if "," in name:
+            # "Paris, FR" narrows to one country
+            name, _, qualifier = name.rpartition(",")
+            if len(qualifier.strip()) == 2:
+                country = qualifier.strip().upper()
+            else:
+                name = f"{name},{qualifier}"
+        start, end = self._key_range(normalize(name).encode("utf-8"))
+        cities = self._by_population(self._key_cities[position] for position in range(start, end))
+        if country is not None:
+            cities = [city for city in cities if city.country == country]
+        return cities
+
+    def prefix(self, text: str, limit: int = 10) -> List[City]:
+        """Cities with a name or alias starting with text, most populous first"""
+        key = normalize(text).encode("utf-8")
+        if not key:
+            return []
+        start = bisect_left(self._key_view, key)
+        # 0xFF never occurs in UTF-8, so this sorts after every key with the prefix
+        end = bisect_left(self._key_view, key + b"\xff", start)
+        city_ids = set(self._key_cities[start:min(end, start + PREFIX_SCAN_LIMIT)])
+        return [self.city(city_id) for city_id in heapq.nsmallest(limit, city_ids)]
+
+    def fuzzy(self, text: str, max_distance: Optional[int] = None, limit: int = 5) -> List[Tuple[City, int]]:
+        """Cities within a bounded edit distance of text, closest then most populous first"""
+        key = normalize(text)
+        if max_distance is None:
+            max_distance = max_distance_for(key)
+        best = {}
+        checked = set()
+        for variant in _deletes(key, max_distance):
+            variant_hash = _hash(variant)
+            position = bisect_left(self._delete_hashes, variant_hash)
+            while position < self.n_deletes and self._delete_hashes[position] == variant_hash:
+                key_position = self._delete_keys[position]
+                position += 1
+                if key_position in checked:
+                    continue
+                checked.add(key_position)
+                # UTF-8 is never shorter than the text, so short byte strings can be skipped undecoded
+                if self._key_offsets[key_position + 1] - self._key_offsets[key_position] < len(key) - max_distance:
+                    continue
+                candidate = self.key(key_position).decode("utf-8")
+                distance = bounded_edit_distance(key, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                # All cities sharing this key (entries for one key are contiguous)
+                start, end = self._key_range(self.key(key_position))
+                for city_position in range(start, end):
+                    city_id = self._key_cities[city_position]
+                    best[city_id] = min(distance, best.get(city_id, distance))
+        ranked = sorted(best.items(), key=lambda item: (item[1], item[0]))
+        return [(self.city(city_id), distance) for city_id, distance in ranked[:limit]]
+
+    def resolve(self, name: str, suggestions: int = 3) -> CityMatch:
+        """Resolve a name to one city: exact/alias match, else a unique closest fuzzy match"""
+        exact = self.lookup(name)
+        if exact:
+            return CityMatch("exact", exact[0], tuple(exact[1:1 + suggestions]))
+        candidates = self.fuzzy(name.rpartition(",")[0] if "," in name else name, limit=suggestions + 1)
+        if candidates:
+            best_city, best_distance = candidates[0]
+            ties = [city for city, distance in candidates[1:] if distance == best_distance]
+            # Two equally close cities are ambiguous, unless one is far more populous
+            if not ties or best_city.population >= 10 * max(city.population for city in ties):
+                return CityMatch("fuzzy", best_city, tuple(city for city, _ in candidates[1:]))
+            return CityMatch("not_found", None, tuple(city for city, _ in candidates[:suggestions]))
+        return CityMatch("not_found", None, tuple(self.prefix(name, suggestions)))
+
+
+class _KeySequence(Sequence):
+    """Lets bisect search the sorted key blob without materializing a list"""
+
+    def __init__(self, index: CityIndex):
+        self._index = index
+
+    def __len__(self) -> int:
+        return self._index.n_keys
+
+    def __getitem__(self, position):
+        return self._index.key(position)
+
+
+def build_index(records: Iterable[CityRecord], path: str) -> int:
+    """Write an index for records to path (atomically); returns the number of cities"""
+    names = bytearray()
+    city_rows = bytearray()
+    entries = []  # (normalized key bytes, city id)
+    ranked = sorted(records, key=lambda record: record.population, reverse=True)
+    for city_id, record in enumerate(ranked):
+        encoded_name = record.name.encode("utf-8")
+        city_rows += CITY_RECORD.pack(
+            len(names), len(encoded_name), record.country.upper().encode("ascii")[:2].ljust(2),
+            record.latitude, record.longitude, min(max(record.population, 0), 2**32 - 1),
+        )
+        names += encoded_name
+        keys = {normalize(alias) for alias in (record.name, *record.aliases)}
+        entries.extend((key.encode("utf-8"), city_id) for key in keys if key)
+    n_cities = len(city_rows) // CITY_RECORD.size
+    entries.sort()
+
+    keys_blob = bytearray()
+    key_offsets = [0]
+    for key, _ in entries:
+        keys_blob += key
+        key_offsets.append(len(keys_blob))
+
+    # Symmetric-delete table over distinct keys, pointing at the first entry of each key.
+    # Keys get deletes for the largest distance any query that could reach them is allowed.
+    deletes = []
+    for position, (key, _) in enumerate(entries):
+        if position and entries[position - 1][0] == key:
+            continue
+        text = key.decode("utf-8")
+        for variant in _deletes(text, max_distance_for("x" * (len(text) + MAX_EDIT_DISTANCE))):
+            deletes.append((_hash(variant), position))
+    deletes.sort()
+
+    def u32_array(values) -> bytes:
+        return struct.pack(f"<{len(values)}I", *values)
+
+    sections = [
+        bytes(names),
+        bytes(city_rows),
+        bytes(keys_blob),
+        u32_array(key_offsets),
+        u32_array([city_id for _, city_id in entries]),
+        u32_array([variant_hash for variant_hash, _ in deletes]),
+        u32_array([position for _, position in deletes]),
+    ]
+    layout = []
+    offset = HEADER.size
+    for section in sections:
+        offset += -offset % 4  # keep u32 arrays aligned for memoryview.cast
+        layout.append((offset, len(section)))
+        offset += len(section)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".cities-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, VERSION, n_cities, len(entries), len(deletes),
+            layout[0][0], layout[0][1], layout[1][0], layout[2][0], layout[2][1],
+            layout[3][0], layout[4][0], layout[5][0], layout[6][0], 0,
+        ))
+        for (section_offset, _), section in zip(layout, sections):
+            f.write(b"\0" * (section_offset - f.tell()))
+            f.write(section)
+    os.replace(tmp_path, path)
+    return n_cities
+
+
+def read_cities_csv(path: str) -> Iterator[CityRecord]:
+    """Rows of name,country,latitude,longitude,population,aliases (aliases separated by |)"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield CityRecord(
+                row["name"],
+                row["country"],
+                float(row["latitude"]),
+                float(row["longitude"]),
+                int(row.get("population") or 0),
+                tuple(alias for alias in (row.get("aliases") or "").split("|") if alias),
+            )
+
+
+def read_geonames(path: str, alternate_names: bool = False) -> Iterator[CityRecord]:
+    """A GeoNames cities*.txt dump (tab separated); ASCII names always become aliases"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 15:
+                continue
+            aliases = [fields[2]]
+            if alternate_names:
+                aliases += [alias for alias in fields[3].split(",") if alias and len(alias) <= 40]
+            yield CityRecord(fields[1], fields[8], float(fields[4]), float(fields[5]), int(fields[14] or 0), tuple(aliases))
+
+
+def load_index(source: str, index_path: Optional[str] = None) -> CityIndex:
+    """
+    Open the index for a CSV source, (re)building it first if it is missing or stale.
+
+    index_path defaults to the source path with an .idx extension.
+    """
+    index_path = index_path or os.path.splitext(source)[0] + ".idx"
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(source):
+        try:
+            return CityIndex.open(index_path)
+        except ValueError:
+            pass  # written by another version of this module; rebuild it
+    build_index(read_cities_csv(source), index_path)
+    return CityIndex.open(index_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query a city index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build an index from a CSV or GeoNames file")
+    build.add_argument("source")
+    build.add_argument("-o", "--output", required=True)
+    build.add_argument("--geonames", action="store_true", help="source is a GeoNames cities*.txt dump")
+    build.add_argument("--alternate-names", action="store_true", help="index GeoNames alternate names as aliases")
+    lookup = commands.add_parser("lookup", help="resolve a name against an index")
+    lookup.add_argument("index")
+    lookup.add_argument("name")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        records = read_geonames(args.source, args.alternate_names) if args.geonames else read_cities_csv(args.source)
+        count = build_index(records, args.output)
+        print(f"✅ Indexed {count} cities into {args.output} ({os.path.getsize(args.output)} bytes)")
+        return
+
+    index = CityIndex.open(args.index)
+    match = index.resolve(args.name)
+    if match.city is not None:
+        print(f"📍 {match.status}: {match.city.name}, {match.city.country} (population {match.city.population})")
+    else:
+        print(f"❓ No city matches {args.name!r}")
+    for city in match.suggestions:
+        print(f"   • {city.name}, {city.country}")
+    index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
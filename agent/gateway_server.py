@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tool Gateway MCP Server
+
+Hosts the tools of math_server.py and weather_server.py in one process
+behind one MCP session, so a client pays for one interpreter, one set of
+imports and one handshake instead of one per server.
+
+Each mounted server's tools keep their namespace as a name prefix
+(`math_add`, `weather_get_current_weather`, ...), so servers with
+overlapping tool names can share the gateway and the agent can still tell
+which server a tool came from.
+
+Synchronous tools (the math ones) are mounted as coroutines that run them
+in a worker thread, so a CPU-bound call never blocks the event loop the
+other tools share, which in memory mode is the agent's own.
+
+Run it like the other servers:
+
+  python gateway_server.py                      # stdio
+  python gateway_server.py --transport sse --port 8400
+
+or let the agent host it in its own process over an in-memory transport
+(MCP_TOOL_GATEWAY=memory, see mcp-agent/agent.py).
+"""
+
+import functools
+import importlib
+import inspect
+import os
+import sys
+from typing import Any, Callable, Dict, List
+
+import anyio
+from mcp.server.fastmcp import FastMCP
+
+# Namespace -> module of the FastMCP server mounted under it
+MOUNTS: Dict[str, str] = {
+    "math": "math_server",
+    "weather": "weather_server",
+}
+
+# The mounted servers are siblings of this file
+_SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SERVER_DIR not in sys.path:
+    sys.path.insert(0, _SERVER_DIR)
+
+
+def in_worker_thread(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """An async version of `fn` that runs it on anyio's thread pool; same signature, so the same schema"""
+    @functools.wraps(fn)
+    async def call(*args: Any, **kwargs: Any) -> Any:
+        return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+
+    return call
+
+
+def mount(gateway: FastMCP, namespace: str, server) -> List[str]:
+    """
+    Register `server`'s tools on `gateway` as `<namespace>_<tool>`; returns the new names.
+
+    Works with FastMCP servers from both the mcp package and the fastmcp
+    package. Only tools are mounted; the bundled servers have no resources
+    or prompts.
+    """
+    names = []
+    for tool in server._tool_manager.list_tools():
+        name = f"{namespace}_{tool.name}"
+        if gateway._tool_manager.get_tool(name) is not None:
+            raise ValueError(f"Tool {name!r} is mounted twice")
+        fn = tool.fn if inspect.iscoroutinefunction(tool.fn) else in_worker_thread(tool.fn)
+        gateway.add_tool(fn, name=name, description=tool.description)
+        names.append(name)
+    return names
+
+
+def build_gateway(mounts: Dict[str, str] = MOUNTS) -> FastMCP:
+    gateway = FastMCP(
+        "Tool Gateway",
+        instructions="Tools of " + ", ".join(f"{module} (prefixed {namespace}_)" for namespace, module in mounts.items()),
+    )
+    for namespace, module in mounts.items():
+        mount(gateway, namespace, importlib.import_module(module).mcp)
+    return gateway
+
+
+mcp = build_gateway()
+
+
+if __name__ == "__main__":
+    # stdout carries the MCP protocol over stdio, so the banner goes to stderr
+    print("🧰 Starting Tool Gateway MCP Server...", file=sys.stderr)
+    print("📡 Mounted servers:", file=sys.stderr)
+    for namespace, module in MOUNTS.items():
+        print(f"   • {module}.py as {namespace}_*", file=sys.stderr)
+
+    from server_transport import serve
+
+    serve(mcp, default_port=8400)
@@ -1,17 +1,213 @@
 # math_server.py
+import ast
+import math
+import operator
+import sys
+from typing import List, Union
+
 from mcp.server.fastmcp import FastMCP
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the batch tools fall back to plain Python
+    np = None
+
 mcp = FastMCP("Math")
 
+Number = Union[int, float]
+
+# Limits that keep a single expression from tying up the server
+MAX_EXPRESSION_LENGTH = 1000
+# Results are sent as JSON numbers, and Python refuses to print integers longer
+# than sys.get_int_max_str_digits() (4300 by default), so the size cap is that
+# many digits; 0 means the interpreter has no limit (as before Python 3.10.7)
+MAX_RESULT_DIGITS = getattr(sys, "get_int_max_str_digits", lambda: 0)() or 30_000
+MAX_INTEGER_BITS = int((MAX_RESULT_DIGITS - 1) * math.log2(10))
+# Below this size NumPy's conversion overhead outweighs its speedup
+NUMPY_MIN_SIZE = 64
+# Integers beyond this may overflow int64 once multiplied, so they stay exact in Python
+NUMPY_INT_LIMIT = 2 ** 31
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+FUNCTIONS = {
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "sqrt": math.sqrt,
+    "exp": math.exp,
+    "log": math.log,
+    "log10": math.log10,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "factorial": math.factorial,
+}
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+
+def _check_size(value: Number) -> Number:
+    if isinstance(value, int):
+        if value.bit_length() > MAX_INTEGER_BITS:
+            raise ValueError(f"Result exceeds {MAX_INTEGER_BITS} bits")
+    elif isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError("Result is too large to represent as a float")
+    else:
+        # e.g. a complex number from (-1) ** 0.5, which JSON cannot carry
+        raise ValueError("Result is not a real number")
+    return value
+
+
+def _power(base: Number, exponent: Number) -> Number:
+    # Estimate the result size before computing huge integer powers
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if exponent * math.log2(abs(base)) > MAX_INTEGER_BITS:
+            raise ValueError(f"Result exceeds {MAX_INTEGER_BITS} bits")
+    return base ** exponent
+
+
+def _eval_node(node: ast.AST) -> Number:
+    if isinstance(node, ast.Expression):
+        return _eval_node(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in CONSTANTS:
+        return CONSTANTS[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        left, right = _eval_node(node.left), _eval_node(node.right)
+        if isinstance(node.op, ast.Pow):
+            return _check_size(_power(left, right))
+        return _check_size(BINARY_OPERATORS[type(node.op)](left, right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        return UNARY_OPERATORS[type(node.op)](_eval_node(node.operand))
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in FUNCTIONS
+        and not node.keywords
+    ):
+        arguments = [_eval_node(argument) for argument in node.args]
+        # log2(n!) = lgamma(n + 1) / ln 2, so oversized factorials are refused before computing them
+        if node.func.id == "factorial" and arguments and arguments[0] > 1 \
+                and math.lgamma(arguments[0] + 1) / math.log(2) > MAX_INTEGER_BITS:
+            raise ValueError(f"Result exceeds {MAX_INTEGER_BITS} bits")
+        return _check_size(FUNCTIONS[node.func.id](*arguments))
+    raise ValueError(f"Unsupported syntax: {ast.dump(node)[:80]}")
+
+
+def safe_evaluate(expression: str) -> Number:
+    """Evaluate an arithmetic expression by walking its AST (never calls eval)"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.replace("^", "**"), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {e.msg}")
+    try:
+        return _eval_node(tree)
+    except ZeroDivisionError:
+        raise ValueError("Division by zero")
+    except OverflowError:
+        raise ValueError("Result is too large to represent as a float")
+    except TypeError as e:
+        raise ValueError(f"Invalid function call: {e}")
+
+
+def _use_numpy(*columns: List[Number]) -> bool:
+    if np is None or len(columns[0]) < NUMPY_MIN_SIZE:
+        return False
+    return all(
+        isinstance(value, float) or abs(value) < NUMPY_INT_LIMIT
+        for column in columns
+        for value in column
+    )
+
+
+def _elementwise(a: List[Number], b: List[Number], op) -> List[Number]:
+    if len(a) != len(b):
+        raise ValueError(f"Lists must have the same length ({len(a)} != {len(b)})")
+    if _use_numpy(a, b):
+        with np.errstate(over="ignore", invalid="ignore"):
+            result = op(np.asarray(a), np.asarray(b))
+        # Same outcome as _check_size on the pure-Python path
+        if not np.isfinite(result).all():
+            raise ValueError("Result is too large to represent as a float")
+        return result.tolist()
+    return [_check_size(op(x, y)) for x, y in zip(a, b)]
+
+
 @mcp.tool()
 def add(a: int, b: int) -> int:
     """Add two numbers"""
-    return a + b
+    return _check_size(a + b)
 
 @mcp.tool()
 def multiply(a: int, b: int) -> int:
     """Multiply two numbers"""
-    return a * b
+    return _check_size(a * b)
+
+@mcp.tool()
+def evaluate(expression: str) -> Number:
+    """
+    Evaluate a whole arithmetic expression in one call, e.g. "(3+4)*(5+6)*7" or "2**100 / 3".
+
+    Supports + - * / // % ** (or ^), parentheses, integers of any size, floats,
+    the constants pi, e and tau, and the functions abs, round, min, max, sqrt,
+    exp, log, log10, sin, cos, tan, floor, ceil and factorial.
+    """
+    return safe_evaluate(expression)
+
+@mcp.tool()
+def evaluate_many(expressions: List[str]) -> List[Number]:
+    """Evaluate several arithmetic expressions at once (same syntax as evaluate)"""
+    return [safe_evaluate(expression) for expression in expressions]
+
+@mcp.tool()
+def add_many(a: List[Number], b: List[Number]) -> List[Number]:
+    """Add two lists of numbers element by element"""
+    return _elementwise(a, b, operator.add)
+
+@mcp.tool()
+def multiply_many(a: List[Number], b: List[Number]) -> List[Number]:
+    """Multiply two lists of numbers element by element"""
+    return _elementwise(a, b, operator.mul)
+
+@mcp.tool()
+def sum_values(values: List[Number]) -> Number:
+    """Sum a list of numbers"""
+    # fsum is exact for floats, which NumPy's pairwise sum is not
+    if any(isinstance(value, float) for value in values):
+        try:
+            return _check_size(math.fsum(values))
+        except OverflowError:
+            raise ValueError("Result is too large to represent as a float")
+    return _check_size(sum(values))
+
+@mcp.tool()
+def product(values: List[Number]) -> Number:
+    """Multiply a list of numbers together"""
+    # Checked as it grows, so an oversized product is refused before it is built
+    result: Number = 1
+    try:
+        for value in values:
+            result = _check_size(result * value)
+    except OverflowError:
+        raise ValueError("Result is too large to represent as a float")
+    return result
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    from server_transport import serve
+
+    serve(mcp, default_port=8100)
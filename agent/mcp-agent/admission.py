@@ -0,0 +1,215 @@
+"""
+Admission control for chat_node turns.
+
+Every turn borrows MCP sessions and makes at least one model call, so an
+unbounded burst of turns turns into a burst of subprocesses, sockets and
+memory. chat_node therefore runs each turn inside `admit()`:
+
+  • at most AGENT_MAX_TURNS turns run at once in the process, and at most
+    AGENT_MAX_TURNS_PER_THREAD per conversation thread (turns of one thread
+    share a checkpoint, so running them side by side gains nothing);
+  • excess turns wait in a queue that is served round-robin across
+    threads, so one busy thread cannot starve the others;
+  • a turn that waits longer than AGENT_ADMISSION_TIMEOUT, or arrives while
+    AGENT_ADMISSION_QUEUE turns are already waiting, is rejected with
+    AdmissionRejected instead of piling on.
+
+Queue depth, turns in flight, admissions, rejections and the time spent
+waiting are exported through telemetry.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+import telemetry
+
+MAX_TURNS = int(os.getenv("AGENT_MAX_TURNS", "16"))
+MAX_TURNS_PER_THREAD = int(os.getenv("AGENT_MAX_TURNS_PER_THREAD", "1"))
+MAX_QUEUE = int(os.getenv("AGENT_ADMISSION_QUEUE", "64"))
+ADMISSION_TIMEOUT = float(os.getenv("AGENT_ADMISSION_TIMEOUT", "30"))
+
+WAIT_SECONDS = telemetry.REGISTRY.histogram("agent_admission_wait_seconds", "Time turns spent queued for admission")
+
+
+class AdmissionRejected(RuntimeError):
+    """The agent is at capacity and this turn was not run; `reason` is "queue_full" or "timeout" """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("thread_id", "loop", "future", "granted")
+
+    def __init__(self, thread_id: str, loop: asyncio.AbstractEventLoop):
+        self.thread_id = thread_id
+        self.loop = loop
+        self.future: asyncio.Future = loop.create_future()
+        self.granted = False
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """
+    Counts running turns and queues the rest.
+
+    Turns may run on several event loops (one per thread serving requests),
+    so the bookkeeping is guarded by a lock and a waiter on another loop is
+    woken with call_soon_threadsafe. A slot is handed to a waiter the moment
+    it is granted; `granted` is the source of truth when a wait times out or
+    is cancelled at the same time.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = MAX_TURNS,
+        max_per_thread: int = MAX_TURNS_PER_THREAD,
+        max_queue: int = MAX_QUEUE,
+        timeout: float = ADMISSION_TIMEOUT,
+    ):
+        self.max_turns = max(max_turns, 1)
+        self.max_per_thread = max(max_per_thread, 1)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._running = 0
+        self._running_by_thread: Dict[str, int] = {}
+        # Waiters per thread; the dict's order is the round-robin order
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._queued = 0
+        self.counts = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "cancelled": 0}
+
+    def _has_room(self, thread_id: str) -> bool:
+        return self._running < self.max_turns and self._running_by_thread.get(thread_id, 0) < self.max_per_thread
+
+    def _start(self, thread_id: str) -> None:
+        self._running += 1
+        self._running_by_thread[thread_id] = self._running_by_thread.get(thread_id, 0) + 1
+        self.counts["admitted"] += 1
+
+    def _dispatch(self) -> None:
+        """Grant free slots to queued turns, one thread at a time in round-robin order"""
+        while self._queues and self._running < self.max_turns:
+            for thread_id in self._queues:
+                if self._running_by_thread.get(thread_id, 0) < self.max_per_thread:
+                    break
+            else:
+                return  # Every queued thread is at its own limit
+            waiters = self._queues[thread_id]
+            waiter = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(thread_id)
+            else:
+                del self._queues[thread_id]
+            self._queued -= 1
+            waiter.granted = True
+            self._start(thread_id)
+            waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+
+    def _withdraw(self, waiter: _Waiter) -> None:
+        waiters = self._queues.get(waiter.thread_id)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self._queued -= 1
+            if not waiters:
+                del self._queues[waiter.thread_id]
+
+    async def acquire(self, thread_id: str, timeout: Optional[float] = None) -> None:
+        """Wait for a slot; raises AdmissionRejected if the queue is full or the wait times out"""
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            # Slots are handed out on every release, so if there is room now, everyone
+            # still queued is waiting on their own thread's limit and nobody is skipped
+            if self._has_room(thread_id):
+                self._start(thread_id)
+                return
+            if self._queued >= self.max_queue:
+                self.counts["rejected_queue_full"] += 1
+                raise AdmissionRejected(
+                    "queue_full",
+                    f"Agent is at capacity: {self._running} turn(s) running and {self._queued} waiting. Try again shortly.",
+                )
+            waiter = _Waiter(thread_id, asyncio.get_running_loop())
+            self._queues.setdefault(thread_id, deque()).append(waiter)
+            self._queued += 1
+            self.counts["queued"] += 1
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if not waiter.granted:
+                    self._withdraw(waiter)
+                    self.counts["rejected_timeout"] += 1
+                    raise AdmissionRejected(
+                        "timeout",
+                        f"Agent is at capacity: no slot became free within {timeout:g}s. Try again shortly.",
+                    ) from None
+            # Granted just as the deadline passed: run the turn
+        except asyncio.CancelledError:
+            with self._lock:
+                self.counts["cancelled"] += 1
+                if waiter.granted:
+                    self._finish(thread_id)
+                else:
+                    self._withdraw(waiter)
+            raise
+        finally:
+            if telemetry.enabled():
+                WAIT_SECONDS.observe(time.perf_counter() - started)
+
+    def _finish(self, thread_id: str) -> None:
+        self._running -= 1
+        remaining = self._running_by_thread[thread_id] - 1
+        if remaining:
+            self._running_by_thread[thread_id] = remaining
+        else:
+            del self._running_by_thread[thread_id]
+        self._dispatch()
+
+    def release(self, thread_id: str) -> None:
+        with self._lock:
+            self._finish(thread_id)
+
+    @asynccontextmanager
+    async def admit(self, thread_id: Optional[str], timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold a turn slot for the duration of the block"""
+        thread_id = thread_id or ""
+        await self.acquire(thread_id, timeout)
+        try:
+            yield
+        finally:
+            self.release(thread_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counts, "running": self._running, "waiting": self._queued}
+
+
+_controller = AdmissionController()
+
+
+def get_admission_controller() -> AdmissionController:
+    return _controller
+
+
+def _admission_metrics():
+    stats = _controller.stats()
+    yield "agent_turns_running", "gauge", "Turns currently running", {}, stats["running"]
+    yield "agent_turns_waiting", "gauge", "Turns queued for admission", {}, stats["waiting"]
+    for event in ("admitted", "queued", "rejected_queue_full", "rejected_timeout", "cancelled"):
+        yield "agent_admission_events_total", "counter", "Admission decisions", {"event": event}, stats[event]
+
+
+telemetry.register_collector(_admission_metrics)
@@ -1,32 +1,68 @@
 """
 This is the main entry point for the agent.
 It defines the workflow graph, state, tools, nodes and edges.
+
+Importing this module only builds the graph. The MCP client stack, the
+OpenAI client and the ReAct agent builder are imported on the first turn.
+Set AGENT_PREWARM=1 to load them, and open the default MCP sessions when a
+loop is running, in the background as soon as the module is imported.
 """
 
-from typing_extensions import Literal, TypedDict, Dict, List, Any, Union, Optional
-from langchain_openai import ChatOpenAI
+from typing_extensions import Literal, TypedDict, NotRequired, Dict, List, Any, Union, Optional
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.types import Command
 from copilotkit import CopilotKitState
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph.prebuilt import create_react_agent
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+import asyncio
+import logging
 import os
+import sys
+import threading
+
+# LangGraph loads this file by path, so make the sibling helper modules importable
+_AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _AGENT_DIR not in sys.path:
+    sys.path.insert(0, _AGENT_DIR)
+
+from admission import get_admission_controller
+from agent_cache import get_react_agent
+from config_registry import MCPConfigRegistry
+from history import new_messages, window_messages
+from prompt_budget import BudgetedPrompt
+from checkpointer import SQLiteCheckpointSaver
+from streaming import run_react_agent
+import telemetry
+
+logger = logging.getLogger(__name__)
 
 # Define the connection type structures
 class StdioConnection(TypedDict):
     command: str
     args: List[str]
     transport: Literal["stdio"]
+    # Optional per-server limits for concurrent tool calls (see tool_dispatch.py)
+    max_concurrency: NotRequired[int]
+    timeout: NotRequired[float]
+    # Optional result caching: seconds for every tool, or per tool name (see tool_cache.py)
+    cache_ttl: NotRequired[Union[float, Dict[str, float]]]
 
 class SSEConnection(TypedDict):
     url: str
     transport: Literal["sse"]
+    max_concurrency: NotRequired[int]
+    timeout: NotRequired[float]
+    cache_ttl: NotRequired[Union[float, Dict[str, float]]]
+
+# A server hosted inside the agent process (see memory_transport.py)
+class MemoryConnection(TypedDict):
+    server: str  # "path/to/module.py:attribute"
+    transport: Literal["memory"]
+    max_concurrency: NotRequired[int]
+    timeout: NotRequired[float]
+    cache_ttl: NotRequired[Union[float, Dict[str, float]]]
 
 # Type for MCP configuration
-MCPConfig = Dict[str, Union[StdioConnection, SSEConnection]]
+MCPConfig = Dict[str, Union[StdioConnection, SSEConnection, MemoryConnection]]
 
 class AgentState(CopilotKitState):
     """
@@ -35,39 +71,78 @@ class AgentState(CopilotKitState):
     In this instance, we're inheriting from CopilotKitState, which will bring in
     the CopilotKitState fields. We're also adding a custom field, `mcp_config`,
     which will be used to configure MCP services for the agent.
+
+    A config sent by the client is only kept until the next turn starts:
+    chat_node interns it (see config_registry.py) and keeps its id in
+    `mcp_config_id` instead, so checkpoints carry 16 characters rather than
+    the whole dictionary.
     """
     # Define mcp_config as an optional field without skipping validation
     mcp_config: Optional[MCPConfig]
+    mcp_config_id: Optional[str]
 
-# Default MCP configuration to use when no configuration is provided in the state
-# Uses relative paths that will work within the project structure
-DEFAULT_MCP_CONFIG: MCPConfig = {
-    "math": {
+def server_connection(name: str, script: str, **options: Any) -> Union[StdioConnection, SSEConnection]:
+    """
+    Connection for one of the bundled servers.
+
+    When MCP_<NAME>_URL is set (e.g. by `start_servers.py --transport sse`),
+    connect to that already-running SSE server instead of spawning a stdio
+    subprocess. A comma-separated list of worker URLs spreads agent processes
+    across the workers; SSE sessions are per worker, so each process sticks
+    to one of them.
+    """
+    urls = [url.strip() for url in os.getenv(f"MCP_{name.upper()}_URL", "").split(",") if url.strip()]
+    if urls:
+        return {"url": urls[os.getpid() % len(urls)], "transport": "sse", **options}
+    return {
         "command": "python",
         # Use a relative path that will be resolved based on the current working directory
-        "args": [os.path.join(os.path.dirname(__file__), "..", "math_server.py")],
-        "transport": "stdio",
-    },
-    "weather": {
-        "command": "python",
-        # Add weather server to default configuration
-        "args": [os.path.join(os.path.dirname(__file__), "..", "weather_server.py")],
+        "args": [os.path.join(os.path.dirname(__file__), "..", script)],
         "transport": "stdio",
-    },
-}
+        **options,
+    }
+
+# How the bundled tools are hosted: "off" runs math and weather as separate servers;
+# "process" runs gateway_server.py, which serves both behind one session; "memory"
+# hosts that gateway inside the agent process, with no subprocess or socket at all
+TOOL_GATEWAY = os.getenv("MCP_TOOL_GATEWAY", "off")
+
+def default_mcp_config(gateway: str = TOOL_GATEWAY) -> MCPConfig:
+    """The bundled servers, either one connection each or one connection to the tool gateway"""
+    if gateway == "off":
+        return {
+            # Arithmetic is pure, so repeated calls are answered locally
+            "math": server_connection("math", "math_server.py", cache_ttl=3600),
+            # Add weather server to default configuration; lookups are read-only, so reuse them for a few minutes
+            "weather": server_connection("weather", "weather_server.py", cache_ttl=300),
+        }
+    # The gateway prefixes each server's tools with its namespace, so the same TTLs apply per namespace
+    options = {"cache_ttl": {"math_*": 3600, "weather_*": 300}}
+    if gateway == "process":
+        return {"gateway": server_connection("gateway", "gateway_server.py", **options)}
+    if gateway == "memory":
+        server = os.path.join(os.path.dirname(__file__), "..", "gateway_server.py") + ":mcp"
+        return {"gateway": {"server": server, "transport": "memory", **options}}
+    raise ValueError(f"MCP_TOOL_GATEWAY must be off, process or memory, not {gateway!r}")
+
+# Default MCP configuration to use when no configuration is provided in the state
+# Uses relative paths that will work within the project structure
+DEFAULT_MCP_CONFIG: MCPConfig = default_mcp_config()
+
+# Settings for the chat model driving the ReAct loop
+MODEL_SETTINGS: Dict[str, Any] = {"model": "gpt-4o"}
 
 # Define a custom ReAct prompt that encourages the use of multiple tools
-MULTI_TOOL_REACT_PROMPT = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """You are an assistant that can use multiple tools to solve problems. 
+MULTI_TOOL_SYSTEM_PROMPT = """You are an assistant that can use multiple tools to solve problems. 
 You should use a step-by-step approach, using as many tools as needed to find the complete answer.
 Don't hesitate to call different tools sequentially if that helps reach a better solution.
+When several tool calls do not depend on each other's results, request them all in the same step so they run in parallel.
+For arithmetic involving more than one operation, pass the whole expression to the evaluate tool (or use the *_many tools for lists) instead of chaining add and multiply calls.
+For weather questions about several cities, make one call to the matching *_many weather tool (it returns compact JSON) instead of one call per city.
 
 You have access to the following tools:
 
-{{tools}}
+{tools}
 
 To use a tool, please use the following format:
 ```
@@ -89,58 +164,142 @@ Final Answer: the final answer to the original input
 
 Begin!
 """
-        ),
-        MessagesPlaceholder(variable_name="messages"),
-    ]
-)
+
+# The system prompt is sent verbatim and never re-rendered, so it stays byte-identical
+# across calls; the history after it is trimmed to the token budget (see prompt_budget.py)
+MULTI_TOOL_REACT_PROMPT = BudgetedPrompt(MULTI_TOOL_SYSTEM_PROMPT)
 
 async def chat_node(state: AgentState, config: RunnableConfig) -> Command[Literal["__end__"]]:
     """
     This is an enhanced agent that uses a modified ReAct pattern to allow multiple tool use.
     It handles both chat responses and sequential tool execution in one node.
     """
-    # Get MCP configuration from state, or use the default config if not provided
-    mcp_config = state.get("mcp_config", DEFAULT_MCP_CONFIG)
-    
-    # Set up the MCP client and tools using the configuration from state
-    async with MultiServerMCPClient(mcp_config) as mcp_client:
-        # Get the tools
-        mcp_tools = mcp_client.get_tools()
-        print(f"mcp_tools: {mcp_tools}")
-        
-        # Create a model instance
-        model = ChatOpenAI(model="gpt-4o")
-        
-        # Create the enhanced multi-tool react agent with our custom prompt
-        react_agent = create_react_agent(
-            model, 
-            mcp_tools, 
-            prompt=MULTI_TOOL_REACT_PROMPT
-        )
-        
-        # Prepare messages for the react agent
-        agent_input = {
-            "messages": state["messages"]
-        }
-        
-        # Run the react agent subgraph with our input
-        agent_response = await react_agent.ainvoke(agent_input)
-
-        print(f"agent_response: {agent_response}")
-        
-        # Update the state with the new messages
-        updated_messages = state["messages"] + agent_response.get("messages", [])
-        
-        # End the graph with the updated messages
-        return Command(
-            goto=END,
-            update={"messages": updated_messages},
-        )
+    # Get MCP configuration from state, or use the default config if not provided.
+    # A newly sent config is validated and interned once and replaced by its id;
+    # after that, resolving it is a dictionary lookup
+    config_update: Dict[str, Any] = {}
+    if state.get("mcp_config") is not None:
+        config_id = MCP_CONFIGS.intern(state["mcp_config"])
+        config_update = {"mcp_config_id": config_id, "mcp_config": None}
+    else:
+        config_id = state.get("mcp_config_id") or default_mcp_config_id()
+    mcp_config = MCP_CONFIGS.get(config_id)
+
+    # Deferred so importing the graph does not load the MCP client stack
+    from session_pool import get_session_pool
+
+    # Wait for a turn slot, or fail fast with AdmissionRejected when the agent is saturated
+    thread_id = config.get("configurable", {}).get("thread_id")
+    async with get_admission_controller().admit(thread_id):
+        with telemetry.span("agent.turn", messages=len(state["messages"])):
+            # Borrow warm MCP sessions for this configuration from the process-wide pool
+            async with get_session_pool().session(mcp_config, key=config_id) as mcp_client:
+                # Get the tools
+                with telemetry.span("mcp.list_tools"):
+                    mcp_tools = mcp_client.get_tools()
+                logger.debug("mcp_tools: %s", [tool.name for tool in mcp_tools])
+            
+                # Reuse the compiled multi-tool react agent for this model and tool set,
+                # only compiling it when the tools or model settings change
+                react_agent = get_react_agent(
+                    mcp_client.key,
+                    MODEL_SETTINGS,
+                    mcp_tools,
+                    prompt=MULTI_TOOL_REACT_PROMPT
+                )
+            
+                # Prepare messages for the react agent, bounded to a recent window of history
+                agent_input = {
+                    "messages": window_messages(state["messages"])
+                }
+            
+                # Run the react agent subgraph with our input, streaming tokens and tool
+                # events to the caller as they happen
+                agent_response = await run_react_agent(react_agent, agent_input, config)
+            
+                # The response echoes the input history; only the messages added this turn
+                # are merged into state (the messages reducer appends them)
+                added_messages = new_messages(agent_input["messages"], agent_response.get("messages", []))
+                logger.debug("agent added %d message(s)", len(added_messages))
+            
+                # End the graph with the new messages
+                return Command(
+                    goto=END,
+                    update={"messages": added_messages, **config_update},
+                )
 
 # Define the workflow graph with only a chat node
 workflow = StateGraph(AgentState)
 workflow.add_node("chat_node", chat_node)
 workflow.set_entry_point("chat_node")
 
+# Checkpoints are persisted to SQLite; set CHECKPOINT_DB=:memory: for a throwaway store
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", os.path.join(_AGENT_DIR, "..", "checkpoints.sqlite"))
+
+# Interned MCP configs are stored alongside the checkpoints that refer to them
+MCP_CONFIGS = MCPConfigRegistry(CHECKPOINT_DB)
+_default_config_id: Optional[str] = None
+
+def default_mcp_config_id() -> str:
+    """Id of DEFAULT_MCP_CONFIG, interned on first use"""
+    global _default_config_id
+    if _default_config_id is None:
+        _default_config_id = MCP_CONFIGS.intern(DEFAULT_MCP_CONFIG)
+    return _default_config_id
+
 # Compile the workflow graph
-graph = workflow.compile(MemorySaver())
\ No newline at end of file
+graph = workflow.compile(SQLiteCheckpointSaver(CHECKPOINT_DB))
+
+
+# Modules the first turn needs that importing the graph deliberately skips
+PREWARM_MODULES = ("session_pool", "langchain_openai", "langgraph.prebuilt")
+
+
+async def prewarm(mcp_config: Optional[MCPConfig] = None) -> None:
+    """
+    Open pooled MCP sessions for a configuration and compile its ReAct agent
+    on the running loop, so the first turn on this loop finds both warm.
+    """
+    from session_pool import get_session_pool
+
+    config_id = MCP_CONFIGS.intern(mcp_config) if mcp_config is not None else default_mcp_config_id()
+    async with get_session_pool().session(MCP_CONFIGS.get(config_id), key=config_id) as mcp_client:
+        get_react_agent(mcp_client.key, MODEL_SETTINGS, mcp_client.get_tools(), prompt=MULTI_TOOL_REACT_PROMPT)
+
+
+def _import_prewarm_modules() -> None:
+    import importlib
+
+    for module in PREWARM_MODULES:
+        importlib.import_module(module)
+
+
+_prewarm_task: Optional[asyncio.Task] = None
+
+
+def start_prewarm(mcp_config: Optional[MCPConfig] = None) -> None:
+    """
+    Warm up in the background without blocking the caller.
+
+    Pooled sessions belong to the loop that opened them, so they are only
+    opened when called with a running loop (the one that will serve turns).
+    Otherwise only the deferred imports run, on a daemon thread.
+    """
+    global _prewarm_task
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        threading.Thread(target=_import_prewarm_modules, name="agent-prewarm", daemon=True).start()
+        return
+
+    async def run() -> None:
+        try:
+            await prewarm(mcp_config)
+        except Exception as e:
+            logger.warning("Agent prewarm failed: %s", e)
+
+    _prewarm_task = loop.create_task(run(), name="agent-prewarm")
+
+
+if os.getenv("AGENT_PREWARM", "").lower() in ("1", "true", "yes"):
+    start_prewarm()
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+Caches for the per-turn model client and compiled ReAct subgraph.
+
+Building ChatOpenAI and calling create_react_agent recompiles a LangGraph
+subgraph and re-binds every tool schema. Both only depend on the model
+settings and the tool set, so they are cached here and steady-state turns
+skip graph compilation entirely. With LLM_CACHE=1 the model also answers
+repeated requests from a response cache (see llm_cache.py).
+
+langchain_openai and langgraph.prebuilt are imported on first use, so
+importing the graph module stays cheap.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.tools import BaseTool
+
+import telemetry
+from llm_cache import get_response_cache
+
+REACT_AGENT_CACHE_SIZE = int(os.getenv("REACT_AGENT_CACHE_SIZE", "32"))
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _tool_schema(tool: BaseTool) -> Any:
+    schema = tool.args_schema
+    if schema is None or isinstance(schema, dict):
+        return schema
+    return schema.model_json_schema()
+
+
+def tools_fingerprint(tools: Sequence[BaseTool]) -> str:
+    """Hash the names, descriptions and argument schemas of a tool set"""
+    described = [
+        {"name": tool.name, "description": tool.description, "schema": _tool_schema(tool)}
+        for tool in tools
+    ]
+    return hashlib.sha256(_canonical(described).encode("utf-8")).hexdigest()[:16]
+
+
+def _default_chat_model_factory(settings: Dict[str, Any]) -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(**settings)
+
+
+_chat_model_factory: Callable[[Dict[str, Any]], BaseChatModel] = _default_chat_model_factory
+
+
+@lru_cache(maxsize=8)
+def _chat_model(settings_json: str) -> BaseChatModel:
+    model = _chat_model_factory(json.loads(settings_json))
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        model.cache = response_cache
+    if telemetry.enabled():
+        model.callbacks = [*(model.callbacks or []), telemetry.MODEL_TIMING]
+    return model
+
+
+def get_chat_model(settings: Dict[str, Any]) -> BaseChatModel:
+    """Return a shared chat model client for these settings"""
+    return _chat_model(_canonical(settings))
+
+
+class ReactAgentCache:
+    """
+    LRU cache of compiled ReAct agents.
+
+    Entries are keyed by scope (usually the MCP session pool key), model
+    settings and tool fingerprint. The compiled agent holds the exact tool
+    objects it was built with, which are bound to live MCP sessions, so an
+    entry is only reused while the caller still hands in those same objects.
+    When a scope reports a new tool fingerprint, all of its old entries are
+    dropped.
+    """
+
+    def __init__(self, max_size: int = REACT_AGENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Tuple[BaseTool, ...], Any]]" = OrderedDict()
+        self._scope_fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_create(
+        self,
+        scope: str,
+        settings: Dict[str, Any],
+        tools: Sequence[BaseTool],
+        factory: Callable[[], Any],
+    ) -> Any:
+        """Return the cached agent for this scope/settings/tool set, building it with `factory` on a miss"""
+        fingerprint = tools_fingerprint(tools)
+        key = (scope, _canonical(settings), fingerprint)
+        tools = tuple(tools)
+
+        with self._lock:
+            if self._scope_fingerprints.get(scope, fingerprint) != fingerprint:
+                self._invalidate_scope(scope)
+            self._scope_fingerprints[scope] = fingerprint
+
+            cached = self._entries.get(key)
+            if cached is not None:
+                cached_tools, agent = cached
+                if len(cached_tools) == len(tools) and all(a is b for a, b in zip(cached_tools, tools)):
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return agent
+                # Same schemas but new tool objects: the session behind them was replaced
+                self.invalidations += 1
+                del self._entries[key]
+            self.misses += 1
+
+        agent = factory()
+        with self._lock:
+            self._entries[key] = (tools, agent)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return agent
+
+    def _invalidate_scope(self, scope: str) -> None:
+        stale = [key for key in self._entries if key[0] == scope]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def invalidate(self, scope: str = None) -> None:
+        """Drop cached agents for one scope, or everything when no scope is given"""
+        with self._lock:
+            if scope is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._scope_fingerprints.clear()
+            else:
+                self._invalidate_scope(scope)
+                self._scope_fingerprints.pop(scope, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+            }
+
+
+_react_agents = ReactAgentCache()
+
+
+def _create_react_agent(model: BaseChatModel, tools: List[BaseTool], prompt: Any) -> Any:
+    from langgraph.prebuilt import create_react_agent
+
+    # The ReAct loop runs to completion inside one chat_node call, so it keeps no
+    # checkpoints of its own; otherwise it would inherit the graph's and write a
+    # namespace of them every turn
+    return create_react_agent(model, tools, prompt=prompt, checkpointer=False)
+
+
+def get_react_agent(scope: str, settings: Dict[str, Any], tools: Sequence[BaseTool], prompt: Any) -> Any:
+    """Return a compiled ReAct agent for the model settings and tools, compiling it only on a miss"""
+    return _react_agents.get_or_create(
+        scope,
+        settings,
+        tools,
+        lambda: _create_react_agent(get_chat_model(settings), list(tools), prompt),
+    )
+
+
+def invalidate_react_agents(scope: str = None) -> None:
+    _react_agents.invalidate(scope)
+
+
+def set_chat_model_factory(factory: Callable[[Dict[str, Any]], BaseChatModel] = None) -> None:
+    """
+    Replace how chat models are built from MODEL_SETTINGS (None restores ChatOpenAI).
+
+    Used by the offline benchmark to run the graph against a scripted model.
+    Cached models and agents built by the previous factory are dropped.
+    """
+    global _chat_model_factory
+    _chat_model_factory = factory or _default_chat_model_factory
+    _chat_model.cache_clear()
+    invalidate_react_agents()
+
+
+def _cache_metrics():
+    for cache, stats in cache_stats().items():
+        for event in ("hits", "misses", "invalidations"):
+            if event in stats:
+                yield "agent_cache_events_total", "counter", "Model/agent cache events", {"cache": cache, "event": event}, stats[event]
+        yield "agent_cache_size", "gauge", "Entries in the model/agent caches", {"cache": cache}, stats["size"]
+
+
+telemetry.register_collector(_cache_metrics)
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the model client and compiled agent caches"""
+    model_info = _chat_model.cache_info()
+    stats = {
+        "react_agents": _react_agents.stats(),
+        "chat_models": {
+            "hits": model_info.hits,
+            "misses": model_info.misses,
+            "size": model_info.currsize,
+        },
+    }
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        stats["responses"] = response_cache.stats()
+    return stats
@@ -0,0 +1,542 @@
+"""
+SQLite checkpointer for the agent graph.
+
+MemorySaver keeps every checkpoint of every thread in process memory and
+forgets them on restart. This saver writes checkpoints to a SQLite file
+instead and only reads a thread back when it is resumed, so memory stays flat
+as the number of conversations grows.
+
+Each checkpoint would normally embed the full message list. Here every
+message is stored once per thread, keyed by a digest of its serialized form,
+and a checkpoint only keeps the ordered list of digests. Only the messages
+added since the previous checkpoint are serialized and reach the disk. A
+configurable number of checkpoints is retained per thread (subgraph
+namespaces older than the oldest retained one are dropped with them), and
+messages that no retained checkpoint references are compacted away
+periodically.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS, ChannelProtocol
+
+# Checkpoints kept per thread and namespace (0 = keep all)
+CHECKPOINT_RETENTION = int(os.getenv("CHECKPOINT_RETENTION", "20"))
+# Compact unreferenced messages after this many checkpoints per thread
+COMPACT_EVERY = int(os.getenv("CHECKPOINT_COMPACT_EVERY", "50"))
+# Threads whose stored message digests are remembered in memory
+KNOWN_THREADS = 256
+
+MESSAGES_CHANNEL = "messages"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    message_refs TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    thread_id TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, digest)
+);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    A file-backed checkpoint saver that stores message deltas.
+
+    Args:
+        path: SQLite database file, or ":memory:" for a throwaway database
+        retention: checkpoints kept per thread and namespace (0 keeps all)
+        compact_every: how many checkpoints a thread writes between compactions
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        retention: int = CHECKPOINT_RETENTION,
+        compact_every: int = COMPACT_EVERY,
+        serde: Optional[SerializerProtocol] = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.path = path
+        self.retention = retention
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts_since_compaction: Dict[str, int] = {}
+        # Per thread: message id -> (message object, digest) of messages already on disk,
+        # so a put only serializes what is new. Updated only after a commit.
+        self._known: "OrderedDict[str, Dict[str, Tuple[Any, str]]]" = OrderedDict()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Opened lazily so importing the graph never touches the disk
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # Message delta storage
+
+    def _known_messages(self, thread_id: str) -> Dict[str, Tuple[Any, str]]:
+        known = self._known.get(thread_id)
+        if known is None:
+            known = self._known[thread_id] = {}
+            while len(self._known) > KNOWN_THREADS:
+                self._known.popitem(last=False)
+        self._known.move_to_end(thread_id)
+        return known
+
+    def _store_messages(self, thread_id: str, messages: Sequence[Any]) -> Tuple[List[str], Dict[str, Tuple[Any, str]]]:
+        """
+        Store the messages not yet on disk; returns the digests of all of them in order,
+        plus the entries to remember once the transaction commits.
+
+        A message already stored under the same id is recognized by identity,
+        so it is not serialized again; a message replaced under its id is a
+        new object and is stored afresh.
+        """
+        known = self._known_messages(thread_id)
+        refs = []
+        rows = []
+        learned: Dict[str, Tuple[Any, str]] = {}
+        for message in messages:
+            message_id = getattr(message, "id", None)
+            cached = known.get(message_id) if message_id else None
+            if cached is not None and cached[0] is message:
+                refs.append(cached[1])
+                continue
+            type_, value = self.serde.dumps_typed(message)
+            digest = hashlib.blake2b(type_.encode("utf-8") + b"\0" + value, digest_size=12).hexdigest()
+            refs.append(digest)
+            rows.append((thread_id, digest, type_, value))
+            if message_id:
+                learned[message_id] = (message, digest)
+        # Identical messages stored under another id are skipped by the primary key
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO messages (thread_id, digest, type, value) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        return refs, learned
+
+    def _load_messages(self, thread_id: str, refs: List[str]) -> List[Any]:
+        loaded: Dict[str, Any] = {}
+        unique = list(dict.fromkeys(refs))
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for digest, type_, value in self.conn.execute(
+                f"SELECT digest, type, value FROM messages WHERE thread_id = ? AND digest IN ({placeholders})",
+                (thread_id, *chunk),
+            ):
+                loaded[digest] = self.serde.loads_typed((type_, value))
+        # The graph resumes with these objects, so its next put need not serialize them again
+        known = self._known_messages(thread_id)
+        for digest, message in loaded.items():
+            if message_id := getattr(message, "id", None):
+                known[message_id] = (message, digest)
+        return [loaded[digest] for digest in refs if digest in loaded]
+
+    # Reading
+
+    def _row_to_tuple(self, row: Tuple[Any, ...]) -> CheckpointTuple:
+        (
+            thread_id,
+            checkpoint_ns,
+            checkpoint_id,
+            parent_checkpoint_id,
+            type_,
+            blob,
+            metadata_type,
+            metadata,
+            refs,
+        ) = row
+        checkpoint = self.serde.loads_typed((type_, blob))
+        if refs is not None:
+            checkpoint["channel_values"] = {
+                **checkpoint["channel_values"],
+                MESSAGES_CHANNEL: self._load_messages(thread_id, json.loads(refs)),
+            }
+
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        if parent_checkpoint_id:
+            sends = self.conn.execute(
+                "SELECT type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND channel = ? "
+                "ORDER BY task_path, task_id, idx",
+                (thread_id, checkpoint_ns, parent_checkpoint_id, TASKS),
+            ).fetchall()
+        else:
+            sends = []
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "pending_sends": [self.serde.loads_typed(send) for send in sends],
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)) if metadata is not None else {},
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((type_, value)))
+                for task_id, channel, type_, value in writes
+            ],
+        )
+
+    _COLUMNS = (
+        "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+        "type, checkpoint, metadata_type, metadata, message_refs"
+    )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Load one checkpoint (the latest for the thread unless an id is given) from disk"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {self._COLUMNS} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {self._COLUMNS} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._row_to_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints, newest first, optionally filtered by thread, namespace, metadata and `before`"""
+        clauses = []
+        params: List[Any] = []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {self._COLUMNS} FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self.serde.loads_typed((row[6], row[7])) if row[7] is not None else {}
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            with self._lock:
+                item = self._row_to_tuple(row)
+            yield item
+
+    # Writing
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, storing only messages this thread has not stored before"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)  # type: ignore[misc]
+        channel_values = dict(c["channel_values"])
+        messages = channel_values.pop(MESSAGES_CHANNEL, None)
+        c["channel_values"] = channel_values
+
+        with self._lock:
+            self.conn.execute("BEGIN")
+            learned: Dict[str, Tuple[Any, str]] = {}
+            try:
+                refs = None
+                if isinstance(messages, list):
+                    refs, learned = self._store_messages(thread_id, messages)
+                if messages is not None and refs is None:
+                    # Not a message list we know how to split; keep it inline
+                    c["channel_values"][MESSAGES_CHANNEL] = messages
+                type_, blob = self.serde.dumps_typed(c)
+                metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints "
+                    f"({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        parent_checkpoint_id,
+                        type_,
+                        blob,
+                        metadata_type,
+                        metadata_blob,
+                        json.dumps(refs) if refs is not None else None,
+                    ),
+                )
+                self._apply_retention(thread_id, checkpoint_ns)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._known_messages(thread_id).update(learned)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save pending writes for a checkpoint"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special channels (errors, interrupts...) overwrite; regular writes keep the
+        # first value stored, matching MemorySaver
+        rows: Dict[str, List[Tuple[Any, ...]]] = {"INSERT OR REPLACE": [], "INSERT OR IGNORE": []}
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            verb = "INSERT OR REPLACE" if write_idx < 0 else "INSERT OR IGNORE"
+            rows[verb].append(
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, blob, task_path)
+            )
+        with self._lock:
+            for verb, verb_rows in rows.items():
+                self.conn.executemany(
+                    f"{verb} INTO writes "
+                    "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    verb_rows,
+                )
+
+    def _apply_retention(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Drop checkpoints beyond the retention limit, compacting messages every so often"""
+        if self.retention > 0:
+            stale = [
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                    (thread_id, checkpoint_ns, self.retention),
+                )
+            ]
+            for checkpoint_id in stale:
+                for table in ("checkpoints", "writes"):
+                    self.conn.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                        (thread_id, checkpoint_ns, checkpoint_id),
+                    )
+            if stale and checkpoint_ns == "":
+                # Subgraph namespaces (e.g. "chat_node:<task id>") belong to turns of the
+                # thread; checkpoint ids sort by time, so those older than the oldest
+                # retained root checkpoint belong to pruned turns
+                oldest = self.conn.execute(
+                    "SELECT MIN(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''",
+                    (thread_id,),
+                ).fetchone()[0]
+                for table in ("checkpoints", "writes"):
+                    self.conn.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns != '' AND checkpoint_id < ?",
+                        (thread_id, oldest),
+                    )
+
+        count = self._puts_since_compaction.get(thread_id, 0) + 1
+        if count >= self.compact_every:
+            self._compact(thread_id)
+            count = 0
+        self._puts_since_compaction[thread_id] = count
+
+    def _compact(self, thread_id: str) -> None:
+        referenced = set()
+        for (refs,) in self.conn.execute(
+            "SELECT message_refs FROM checkpoints WHERE thread_id = ? AND message_refs IS NOT NULL",
+            (thread_id,),
+        ):
+            referenced.update(json.loads(refs))
+        stored = [row[0] for row in self.conn.execute("SELECT digest FROM messages WHERE thread_id = ?", (thread_id,))]
+        self.conn.executemany(
+            "DELETE FROM messages WHERE thread_id = ? AND digest = ?",
+            [(thread_id, digest) for digest in stored if digest not in referenced],
+        )
+        known = self._known.get(thread_id)
+        if known:
+            for message_id in [key for key, (_, digest) in known.items() if digest not in referenced]:
+                del known[message_id]
+
+    def compact(self, thread_id: Optional[str] = None) -> None:
+        """Remove messages no retained checkpoint refers to, for one thread or all of them"""
+        with self._lock:
+            if thread_id is None:
+                thread_ids = [row[0] for row in self.conn.execute("SELECT DISTINCT thread_id FROM messages")]
+            else:
+                thread_ids = [thread_id]
+            for tid in thread_ids:
+                self._compact(tid)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Forget everything stored for a thread"""
+        with self._lock:
+            for table in ("checkpoints", "writes", "messages"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._puts_since_compaction.pop(thread_id, None)
+            self._known.pop(thread_id, None)
+
+    # Async variants run the blocking SQLite calls off the event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    def get_next_version(self, current: Optional[str], channel: ChannelProtocol) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
@@ -0,0 +1,186 @@
+"""
+Interned MCP configurations.
+
+The MCP configuration a client sends is the same dictionary turn after turn,
+yet keeping it in AgentState writes a copy into every checkpoint and makes
+every turn hash it again to find its pooled sessions. Instead, chat_node
+hands a new configuration to the registry once: it is validated, given an
+id derived from its content (the same fingerprint the session pool keys on)
+and only that id is kept in state. Later turns resolve the id with a
+dictionary lookup.
+
+Configurations are also written to an `mcp_configs` table next to the
+checkpoints, so a thread resumed by another process, or after a restart,
+still resolves its id.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+TRANSPORTS = ("stdio", "sse", "memory")
+# Interned configs kept in memory; older ones are read back from SQLite on demand
+REGISTRY_MAX_SIZE = int(os.getenv("MCP_CONFIG_REGISTRY_SIZE", "256"))
+
+
+def _normalize_connection(connection: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop unset fields and canonicalize script paths so equivalent configs hash alike"""
+    normalized = {key: value for key, value in connection.items() if value is not None}
+    if "args" in normalized:
+        normalized["args"] = [
+            os.path.normpath(os.path.abspath(arg)) if isinstance(arg, str) and os.path.isfile(arg) else arg
+            for arg in normalized["args"]
+        ]
+    if isinstance(normalized.get("server"), str):
+        location, _, attribute = normalized["server"].rpartition(":")
+        if os.path.isfile(location):
+            normalized["server"] = f"{os.path.normpath(os.path.abspath(location))}:{attribute}"
+    normalized.setdefault("transport", "stdio")
+    return normalized
+
+
+def config_fingerprint(config: Dict[str, Any]) -> str:
+    """
+    Return a stable hash for an MCP configuration.
+
+    Key order, unset optional fields and different spellings of the same
+    script path do not change the fingerprint.
+    """
+    normalized = {name: _normalize_connection(dict(connection)) for name, connection in config.items()}
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_config(config: Any) -> None:
+    """Raise ValueError describing the first problem with an MCP configuration"""
+    if not isinstance(config, dict):
+        raise ValueError(f"MCP config must be a mapping of server names to connections, got {type(config).__name__}")
+    for name, connection in config.items():
+        where = f"MCP server {name!r}"
+        if not isinstance(connection, dict):
+            raise ValueError(f"{where}: connection must be a mapping, got {type(connection).__name__}")
+        transport = connection.get("transport") or "stdio"
+        if transport not in TRANSPORTS:
+            raise ValueError(f"{where}: unknown transport {transport!r} (expected one of {', '.join(TRANSPORTS)})")
+        if transport == "stdio":
+            if not isinstance(connection.get("command"), str) or not connection["command"]:
+                raise ValueError(f"{where}: stdio connections need a 'command'")
+            args = connection.get("args")
+            if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+                raise ValueError(f"{where}: 'args' must be a list of strings")
+        elif transport == "sse":
+            if not isinstance(connection.get("url"), str) or not connection["url"]:
+                raise ValueError(f"{where}: sse connections need a 'url'")
+        elif not isinstance(connection.get("server"), str) or ":" not in connection["server"]:
+            raise ValueError(f"{where}: memory connections need a 'server' given as 'module.py:attribute'")
+        max_concurrency = connection.get("max_concurrency")
+        if max_concurrency is not None and (not isinstance(max_concurrency, int) or isinstance(max_concurrency, bool)
+                                            or max_concurrency < 1):
+            raise ValueError(f"{where}: 'max_concurrency' must be a positive integer")
+        timeout = connection.get("timeout")
+        if timeout is not None and (not _is_number(timeout) or timeout <= 0):
+            raise ValueError(f"{where}: 'timeout' must be a positive number of seconds")
+        cache_ttl = connection.get("cache_ttl")
+        if cache_ttl is not None and not _is_number(cache_ttl) and not (
+            isinstance(cache_ttl, dict) and all(_is_number(ttl) for ttl in cache_ttl.values())
+        ):
+            raise ValueError(f"{where}: 'cache_ttl' must be seconds, or a mapping of tool names to seconds")
+
+
+class MCPConfigRegistry:
+    """Validated MCP configurations by content id, in memory and optionally in SQLite"""
+
+    def __init__(self, path: Optional[str] = None, max_size: int = REGISTRY_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        # Exact JSON of configs already interned -> id, so a client that resends the
+        # same dictionary every turn skips validation and path normalization
+        self._ids: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.counts = {"interned": 0, "hits": 0, "disk_hits": 0}
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        # Opened on first use, so importing the graph does not touch the database
+        if self._db is None and self.path and self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS mcp_configs (id TEXT PRIMARY KEY, config TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+        return self._db
+
+    def _remember(self, config_id: str, config: Dict[str, Any]) -> None:
+        if len(self._configs) >= self.max_size:
+            # Drop the oldest entry; it can still be read back from disk
+            del self._configs[next(iter(self._configs))]
+        self._configs[config_id] = config
+
+    def intern(self, config: Dict[str, Any]) -> str:
+        """Validate `config` and return its id; raises ValueError if it is malformed"""
+        try:
+            payload = json.dumps(config, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"MCP config is not JSON-serializable: {e}") from None
+        with self._lock:
+            config_id = self._ids.get(payload)
+            if config_id is not None and config_id in self._configs:
+                return config_id
+
+        validate_config(config)
+        config_id = config_fingerprint(config)
+        # A private copy, so later changes to the caller's dictionary cannot leak in
+        stored = json.loads(payload)
+        with self._lock:
+            if len(self._ids) >= self.max_size:
+                self._ids.clear()
+            self._ids[payload] = config_id
+            if config_id not in self._configs:
+                self._remember(config_id, stored)
+                self.counts["interned"] += 1
+                db = self._connect()
+                if db is not None:
+                    db.execute(
+                        "INSERT OR IGNORE INTO mcp_configs (id, config, created_at) VALUES (?, ?, ?)",
+                        (config_id, payload, time.time()),
+                    )
+        return config_id
+
+    def get(self, config_id: str) -> Dict[str, Any]:
+        """The configuration for an interned id; raises KeyError for an unknown id"""
+        config = self._configs.get(config_id)
+        if config is not None:
+            self.counts["hits"] += 1
+            return config
+        with self._lock:
+            config = self._configs.get(config_id)
+            if config is None:
+                db = self._connect()
+                row = db.execute("SELECT config FROM mcp_configs WHERE id = ?", (config_id,)).fetchone() if db else None
+                if row is None:
+                    raise KeyError(f"Unknown MCP config id {config_id!r}; send the full mcp_config again")
+                config = json.loads(row[0])
+                self._remember(config_id, config)
+                self.counts["disk_hits"] += 1
+            self.counts["hits"] += 1
+            return config
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counts, "size": len(self._configs)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
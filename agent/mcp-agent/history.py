@@ -0,0 +1,60 @@
+"""
+Message history helpers for chat_node.
+
+The react agent returns the whole conversation it was given plus whatever it
+added. Writing that back verbatim duplicates the history on every turn, so
+only the delta is merged into graph state, and only a bounded window of the
+history is sent to the model.
+"""
+
+import os
+from typing import List, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+# Maximum number of history messages handed to the model per turn (0 = unlimited)
+MAX_HISTORY_MESSAGES = int(os.getenv("MAX_HISTORY_MESSAGES", "40"))
+
+
+def new_messages(previous: Sequence[BaseMessage], response: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """
+    Return the messages in `response` that are not already in `previous`.
+
+    Messages are matched by id; messages without an id are matched by object
+    identity. A message repeated inside `response` is only returned once.
+    """
+    seen_ids = {message.id for message in previous if message.id}
+    seen_objects = {id(message) for message in previous}
+    delta = []
+    for message in response:
+        if message.id:
+            if message.id in seen_ids:
+                continue
+            seen_ids.add(message.id)
+        elif id(message) in seen_objects:
+            continue
+        delta.append(message)
+    return delta
+
+
+def window_messages(messages: Sequence[BaseMessage], max_messages: int = MAX_HISTORY_MESSAGES) -> List[BaseMessage]:
+    """
+    Keep roughly the last `max_messages` messages.
+
+    The window always starts at a human message so that a tool call is never
+    separated from its result, which the model API would reject. If the
+    latest human turn alone is longer than the window, it is kept whole.
+    """
+    if max_messages <= 0 or len(messages) <= max_messages:
+        return list(messages)
+
+    start = len(messages) - max_messages
+    for index in range(start, len(messages)):
+        if isinstance(messages[index], HumanMessage):
+            return list(messages[index:])
+
+    # No human message inside the window: fall back to the latest human turn
+    for index in range(start - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return list(messages[index:])
+    return list(messages)
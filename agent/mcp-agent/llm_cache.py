@@ -0,0 +1,228 @@
+"""
+Exact-match response cache for the chat model.
+
+Dashboards and regression suites send the same questions over and over.
+With LLM_CACHE=1 the chat model built by agent_cache.get_chat_model gets a
+ResponseCache, and langchain consults it before every model call, so a
+repeated request is answered from the cache without an API call.
+
+The key is a hash of the model's parameters and bound tool schemas (the
+`llm_string` langchain hands in) and of the message list as the model sees
+it. Message ids, response metadata and the provider's random tool call ids
+are left out of the key, so the same conversation asked on another thread,
+or again after the cached answer was replayed, still matches.
+
+Entries live in an in-memory LRU and, when LLM_CACHE_PATH names a file, in
+a SQLite table that other processes share and that survives restarts. They
+expire after LLM_CACHE_TTL seconds (0 = never).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import AIMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "0") not in ("0", "false", "False")
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+
+# Message fields that never reach the model and differ between otherwise identical requests
+_UNSENT_FIELDS = ("id", "response_metadata", "usage_metadata", "invalid_tool_calls")
+
+
+def canonical_prompt(prompt: str) -> str:
+    """
+    The serialized message list without ids and metadata, with tool call ids
+    renumbered in order of appearance.
+    """
+    call_ids: Dict[str, str] = {}
+
+    def call_id(value: str) -> str:
+        return call_ids.setdefault(value, f"call_{len(call_ids)}")
+
+    messages = json.loads(prompt)
+    canonical = []
+    for message in messages:
+        fields = dict(message.get("kwargs", message))
+        for field in _UNSENT_FIELDS:
+            fields.pop(field, None)
+        if fields.get("tool_calls"):
+            fields["tool_calls"] = [{**call, "id": call_id(call["id"])} for call in fields["tool_calls"]]
+        if fields.get("tool_call_id"):
+            fields["tool_call_id"] = call_id(fields["tool_call_id"])
+        extra = fields.get("additional_kwargs")
+        if extra and "tool_calls" in extra:
+            # The provider's raw copy of tool_calls; the parsed field above is what gets sent
+            fields["additional_kwargs"] = {key: value for key, value in extra.items() if key != "tool_calls"}
+        canonical.append(fields)
+    return json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    digest = hashlib.sha256(llm_string.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(canonical_prompt(prompt).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _serialize(generations: RETURN_VAL_TYPE) -> str:
+    return json.dumps([
+        {"message": message_to_dict(generation.message), "info": generation.generation_info}
+        if isinstance(generation, ChatGeneration)
+        else {"text": generation.text, "info": generation.generation_info}
+        for generation in generations
+    ])
+
+
+def _deserialize(value: str) -> RETURN_VAL_TYPE:
+    return [
+        ChatGeneration(message=messages_from_dict([item["message"]])[0], generation_info=item["info"])
+        if "message" in item
+        else Generation(text=item["text"], generation_info=item["info"])
+        for item in json.loads(value)
+    ]
+
+
+def _fresh(generations: RETURN_VAL_TYPE) -> RETURN_VAL_TYPE:
+    """
+    Prepare replayed generations: clear message ids so the messages reducer
+    appends them instead of replacing the original, and give tool calls new
+    ids so they never collide with earlier calls in the same thread.
+    """
+    for generation in generations:
+        message = getattr(generation, "message", None)
+        if not isinstance(message, AIMessage):
+            continue
+        message.id = None
+        renamed = {call["id"]: f"call_{uuid.uuid4().hex[:24]}" for call in message.tool_calls if call.get("id")}
+        if renamed:
+            message.tool_calls = [{**call, "id": renamed.get(call["id"], call["id"])} for call in message.tool_calls]
+            raw_calls = message.additional_kwargs.get("tool_calls")
+            if raw_calls:
+                message.additional_kwargs["tool_calls"] = [
+                    {**call, "id": renamed.get(call.get("id"), call.get("id"))} for call in raw_calls
+                ]
+    return generations
+
+
+class ResponseCache(BaseCache):
+    """
+    LRU of serialized model responses with a TTL, optionally written through
+    to SQLite. Hits are deserialized afresh, so callers never share objects.
+    """
+
+    def __init__(self, max_size: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL, path: Optional[str] = LLM_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+        self.counts = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def _expires_at(self) -> float:
+        return time.time() + self.ttl if self.ttl > 0 else float("inf")
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _cached(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                if cached[0] > now:
+                    self._entries.move_to_end(key)
+                    self.counts["hits"] += 1
+                    return cached[1]
+                del self._entries[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT expires_at, value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] > now:
+                    self._remember(key, row[0], row[1])
+                    self.counts["hits"] += 1
+                    self.counts["disk_hits"] += 1
+                    return row[1]
+            self.counts["misses"] += 1
+            return None
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self._cached(cache_key(prompt, llm_string))
+        if value is None:
+            return None
+        try:
+            return _fresh(_deserialize(value))
+        except Exception as e:
+            logger.warning("Ignoring unreadable cached model response: %s", e)
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = cache_key(prompt, llm_string)
+        value = _serialize(return_val)
+        expires_at = self._expires_at()
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.counts["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                    (key, expires_at, value),
+                )
+                self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+
+    # Lookups are dictionary reads plus, at most, one indexed SQLite query; not worth an executor hop
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+
+    async def aclear(self, **kwargs: Any) -> None:
+        self.clear(**kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.counts, "size": len(self._entries)}
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """The process-wide response cache, or None unless LLM_CACHE is enabled"""
+    global _response_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
@@ -0,0 +1,95 @@
+"""
+In-process MCP transport.
+
+When the tools live in the agent's own process, a subprocess and a pipe (or
+a socket) are pure overhead: the client session and the server can trade
+JSON-RPC messages over anyio memory streams instead (mcp.shared.memory).
+
+A connection with `"transport": "memory"` names the server object as
+`"path/to/module.py:attribute"`. The module is imported once per process
+(its directory is put on sys.path, as for a script run by path) and the
+server runs as a task next to the client session, for exactly as long as
+the session is open.
+
+FastMCP configures the root logger when a server is constructed, which suits
+a server process but not a guest in the agent's; the host's root logging is
+restored after the import.
+"""
+
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+from contextlib import AsyncExitStack
+from typing import Any, Dict
+
+import anyio
+from mcp import ClientSession
+from mcp.shared.memory import create_client_server_memory_streams
+
+_servers: Dict[str, Any] = {}
+_import_lock = threading.Lock()
+
+
+def load_server(spec: str) -> Any:
+    """The low-level MCP server behind `"module.py:attribute"` (or `"module:attribute"`)"""
+    server = _servers.get(spec)
+    if server is not None:
+        return server
+    location, _, attribute = spec.rpartition(":")
+    if not location or not attribute:
+        raise ValueError(f"In-memory MCP server must be given as 'module.py:attribute', got {spec!r}")
+    root = logging.getLogger()
+    with _import_lock:
+        handlers, level = root.handlers[:], root.level
+        try:
+            module = _import(location)
+        finally:
+            root.handlers[:] = handlers
+            root.setLevel(level)
+        server = getattr(module, attribute)
+        # FastMCP wraps the low-level server that speaks the protocol
+        server = getattr(server, "_mcp_server", server)
+        _servers[spec] = server
+    return server
+
+
+def _import(location: str) -> Any:
+    if not location.endswith(".py"):
+        return importlib.import_module(location)
+    path = os.path.abspath(location)
+    directory, filename = os.path.split(path)
+    name = filename[:-3]
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    module = sys.modules.get(name)
+    if module is not None and os.path.abspath(getattr(module, "__file__", "") or "") == path:
+        return module
+    module_spec = importlib.util.spec_from_file_location(name, path)
+    if module_spec is None:
+        raise ValueError(f"Cannot import MCP server from {location!r}")
+    module = importlib.util.module_from_spec(module_spec)
+    sys.modules[name] = module
+    try:
+        module_spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+async def connect_in_memory(exit_stack: AsyncExitStack, spec: str) -> ClientSession:
+    """
+    Start the server named by `spec` and return a client session connected to it.
+
+    Both are torn down when `exit_stack` closes: the session first, then the
+    server task is cancelled and the streams are closed.
+    """
+    server = load_server(spec)
+    client_streams, server_streams = await exit_stack.enter_async_context(create_client_server_memory_streams())
+    task_group = await exit_stack.enter_async_context(anyio.create_task_group())
+    task_group.start_soon(lambda: server.run(*server_streams, server.create_initialization_options()))
+    exit_stack.callback(task_group.cancel_scope.cancel)
+    return await exit_stack.enter_async_context(ClientSession(*client_streams))
@@ -0,0 +1,250 @@
+"""
+Token-budgeted prompt assembly for the ReAct agent.
+
+The ReAct loop calls the model once per iteration with the system prompt
+plus the whole history, and tool results (a 7-day forecast, a batch of
+cities) are large blocks of text. BudgetedPrompt is passed to
+create_react_agent as its `prompt` and decides what the model sees:
+
+  • The system prompt is one SystemMessage built once, so every request
+    starts with the same bytes and provider-side prompt caching can hit.
+  • Earlier turns (everything before the latest human message) are left
+    alone while they fit PROMPT_HISTORY_TOKENS. Past that, their tool
+    outputs are condensed to their first lines, and if that is not enough
+    the oldest turns are dropped whole. This only depends on the earlier
+    turns, so the prompt prefix does not move while the current turn
+    iterates.
+  • If the current turn then pushes the prompt over PROMPT_TOKEN_BUDGET, its
+    older tool outputs are condensed too (never the results the model is
+    about to read), and then more earlier turns are dropped.
+
+Tokens are counted locally with tiktoken when it is installed and its
+encoding file is already in tiktoken's cache, otherwise estimated at four
+characters per token. The encoding is only downloaded when
+PROMPT_TOKENIZER_DOWNLOAD=1, so building a prompt never waits on the network. Graph state is
+never modified; only the model input is trimmed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the tokens sent per model call (0 = no trimming)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "16000"))
+# Share of the budget earlier turns may use before they are condensed
+PROMPT_HISTORY_TOKENS = int(os.getenv("PROMPT_HISTORY_TOKENS", str(PROMPT_TOKEN_BUDGET // 2)))
+# Tokens kept from a condensed tool output
+PROMPT_STALE_TOOL_TOKENS = int(os.getenv("PROMPT_STALE_TOOL_TOKENS", "120"))
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "o200k_base")
+# Fetch the encoding file when it is not cached yet (it is a few MB from openaipublic)
+PROMPT_TOKENIZER_DOWNLOAD = os.getenv("PROMPT_TOKENIZER_DOWNLOAD", "0") in ("1", "true", "True")
+# Where tiktoken publishes its BPE files; the cache names each file by the sha1 of this URL
+TIKTOKEN_BLOB_URL = "https://openaipublic.blob.core.windows.net/encodings/{name}.tiktoken"
+
+# Role markers and separators the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+CHARS_PER_TOKEN = 4
+
+_encoding: Any = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _encoding_cached(name: str) -> bool:
+    """Whether tiktoken can load encoding `name` from its file cache, without downloading it"""
+    # The same lookup as tiktoken.load.read_file_cached
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR", os.environ.get("DATA_GYM_CACHE_DIR"))
+    if cache_dir is None:
+        cache_dir = os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    if not cache_dir:
+        return False
+    cache_key = hashlib.sha1(TIKTOKEN_BLOB_URL.format(name=name).encode()).hexdigest()
+    return os.path.exists(os.path.join(cache_dir, cache_key))
+
+
+def load_tokenizer() -> Any:
+    """The tiktoken encoding, or None when tiktoken or its cached encoding file is unavailable"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                if not PROMPT_TOKENIZER_DOWNLOAD and not _encoding_cached(PROMPT_TOKENIZER):
+                    logger.info("Estimating prompt tokens from length: %s is not in the tiktoken cache "
+                                "(set PROMPT_TOKENIZER_DOWNLOAD=1 to fetch it)", PROMPT_TOKENIZER)
+                else:
+                    try:
+                        import tiktoken
+
+                        _encoding = tiktoken.get_encoding(PROMPT_TOKENIZER)
+                    except Exception as e:
+                        # Missing package, or the encoding cannot be downloaded (offline)
+                        logger.warning("Estimating prompt tokens from length, tiktoken unavailable: %s", e)
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = load_tokenizer()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "\n".join(part if isinstance(part, str) else str(part.get("text", part)) for part in content)
+
+
+# Token counts by (message id, text length); history messages are counted on every iteration
+_token_counts: Dict[Tuple[str, int], int] = {}
+MAX_COUNTED_MESSAGES = 8192
+
+
+def message_tokens(message: BaseMessage) -> int:
+    text = message_text(message)
+    key = (message.id, len(text)) if message.id else None
+    if key is not None and key in _token_counts:
+        return _token_counts[key]
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(text)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        for call in message.tool_calls:
+            tokens += count_tokens(call["name"]) + count_tokens(json.dumps(call["args"], ensure_ascii=False))
+    if key is not None:
+        if len(_token_counts) >= MAX_COUNTED_MESSAGES:
+            _token_counts.clear()
+        _token_counts[key] = tokens
+    return tokens
+
+
+def condense_tool_message(message: ToolMessage, max_tokens: int) -> ToolMessage:
+    """Keep the first lines of a tool output, noting how much was left out"""
+    text = message_text(message)
+    tokens = count_tokens(text)
+    if max_tokens <= 0 or tokens <= max_tokens:
+        return message
+    kept = text[:max_tokens * CHARS_PER_TOKEN]
+    if "\n" in kept:
+        kept = kept[:kept.rindex("\n")]
+    omitted = tokens - count_tokens(kept)
+    return message.model_copy(update={"content": f"{kept.rstrip()}\n… [{omitted} more tokens of this earlier tool output omitted]"})
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Split history into turns, each starting at a human message (the first may not)"""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _turn_tokens(turn: Sequence[BaseMessage]) -> int:
+    return sum(message_tokens(message) for message in turn)
+
+
+class BudgetedPrompt:
+    """
+    `prompt` callable for create_react_agent: a fixed system message followed
+    by the state's messages, trimmed to the token budget.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        budget: int = PROMPT_TOKEN_BUDGET,
+        history_tokens: int = PROMPT_HISTORY_TOKENS,
+        stale_tool_tokens: int = PROMPT_STALE_TOOL_TOKENS,
+    ):
+        self.system_message = SystemMessage(content=system_prompt)
+        self.budget = budget
+        self.history_tokens = history_tokens
+        self.stale_tool_tokens = stale_tool_tokens
+        self._system_tokens: Optional[int] = None
+
+    @property
+    def system_tokens(self) -> int:
+        if self._system_tokens is None:
+            self._system_tokens = message_tokens(self.system_message)
+        return self._system_tokens
+
+    def __call__(self, state: Dict[str, Any]) -> List[BaseMessage]:
+        return [self.system_message] + self.trim(state["messages"])
+
+    def _condense(self, turn: List[BaseMessage], keep_from: int) -> List[BaseMessage]:
+        return [
+            condense_tool_message(message, self.stale_tool_tokens)
+            if isinstance(message, ToolMessage) and index < keep_from
+            else message
+            for index, message in enumerate(turn)
+        ]
+
+    def trim(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """The messages to send after the system prompt"""
+        if self.budget <= 0 or not messages:
+            return list(messages)
+        turns = split_turns(messages)
+        history, current = turns[:-1], turns[-1]
+        input_tokens = sum(_turn_tokens(turn) for turn in turns)
+
+        # Earlier turns: condense, then drop the oldest, until they fit their allowance
+        condensed = 0
+        history_tokens = [_turn_tokens(turn) for turn in history]
+        if sum(history_tokens) > self.history_tokens:
+            history = [self._condense(turn, len(turn)) for turn in history]
+            history_tokens = [_turn_tokens(turn) for turn in history]
+            condensed += 1
+        kept_tokens = sum(history_tokens)
+        dropped = 0
+        while dropped < len(history) and kept_tokens > self.history_tokens:
+            kept_tokens -= history_tokens[dropped]
+            dropped += 1
+
+        # Current turn: condense tool outputs the model has already acted on
+        current_tokens = _turn_tokens(current)
+        if current_tokens > self.budget - self.system_tokens - kept_tokens:
+            latest = len(current)
+            while latest > 0 and isinstance(current[latest - 1], ToolMessage):
+                latest -= 1
+            current = self._condense(current, latest)
+            current_tokens = _turn_tokens(current)
+            condensed += 1
+        while dropped < len(history) and current_tokens > self.budget - self.system_tokens - kept_tokens:
+            kept_tokens -= history_tokens[dropped]
+            dropped += 1
+
+        trimmed = [message for turn in history[dropped:] for message in turn] + current
+        _stats["input_tokens"] += self.system_tokens + input_tokens
+        _stats["sent_tokens"] += self.system_tokens + kept_tokens + current_tokens
+        _stats["condensed"] += condensed
+        _stats["dropped_turns"] += dropped
+        return trimmed
+
+
+_stats = {"input_tokens": 0, "sent_tokens": 0, "condensed": 0, "dropped_turns": 0}
+
+
+def prompt_stats() -> Dict[str, int]:
+    return dict(_stats)
+
+
+def _prompt_metrics():
+    for kind in ("input", "sent"):
+        yield "agent_prompt_tokens_total", "counter", "Prompt tokens before and after budgeting", {"kind": kind}, _stats[f"{kind}_tokens"]
+    for event in ("condensed", "dropped_turns"):
+        yield "agent_prompt_trim_events_total", "counter", "Prompt budgeting actions", {"event": event}, _stats[event]
+
+
+telemetry.register_collector(_prompt_metrics)
@@ -0,0 +1,457 @@
+"""
+Process-wide pool of warm MCP sessions.
+
+Opening a MultiServerMCPClient spawns every stdio server and repeats the MCP
+handshake, so doing it on every chat turn dominates turn latency. The pool
+keeps one client open per distinct MCP configuration and hands it out to
+subsequent turns (and threads) until it goes idle, fails a health check, or
+the pool is shut down. When an entry is reopened, its servers' tool lists
+come from tool_schema_cache.py and the previous tool objects are reused.
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import anyio
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp.types import ServerNotification, ToolListChangedNotification
+
+import telemetry
+from config_registry import config_fingerprint
+from tool_dispatch import limit_server_tools, split_dispatch_options
+from tool_schema_cache import CachedToolsMCPClient, ServerTools, get_schema_cache
+
+# Pool tuning, overridable through the environment
+POOL_MAX_SIZE = int(os.getenv("MCP_POOL_MAX_SIZE", "8"))
+POOL_IDLE_TTL = float(os.getenv("MCP_POOL_IDLE_TTL", "300"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL", "30"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("MCP_POOL_HEALTH_CHECK_TIMEOUT", "5"))
+# How long the exit hook waits for each loop's sessions to close
+SHUTDOWN_TIMEOUT = float(os.getenv("MCP_POOL_SHUTDOWN_TIMEOUT", "10"))
+CONNECT_TIMEOUT = float(os.getenv("MCP_POOL_CONNECT_TIMEOUT", "30"))
+
+
+class PooledMCPClient:
+    """
+    A MultiServerMCPClient kept open by a background task.
+
+    The MCP transports are built on anyio task groups, which must be entered
+    and exited from the same task, so a dedicated owner task holds the client
+    open until the pool asks it to close.
+    """
+
+    def __init__(self, key: str, config: Dict[str, Any], server_tools: Optional[Dict[str, ServerTools]] = None):
+        self.key = key
+        self.config = config
+        # Per-server tool sets that outlive this client, so a reopened entry reuses them
+        self.server_tools = server_tools if server_tools is not None else {}
+        self.client: Optional[MultiServerMCPClient] = None
+        self.tools: List[BaseTool] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.in_use = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        # Set when a server reports that its tool list changed; the pool then reopens the entry
+        self.stale = False
+
+    async def start(self, timeout: float = CONNECT_TIMEOUT) -> None:
+        """Spawn the owner task and wait until every server has completed its handshake"""
+        self.loop = asyncio.get_running_loop()
+        self._task = self.loop.create_task(self._run(), name=f"mcp-session-{self.key}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            await self.aclose()
+            raise
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self) -> None:
+        connections = {}
+        dispatch_options = {}
+        for server_name, connection in self.config.items():
+            connections[server_name], dispatch_options[server_name] = split_dispatch_options(connection)
+            if server_name not in self.server_tools:
+                self.server_tools[server_name] = ServerTools(config_fingerprint({server_name: connections[server_name]}))
+        watchers = []
+        try:
+            async with CachedToolsMCPClient(connections, self.server_tools, get_schema_cache()) as client:
+                self.client = client
+                # Wrap each server's tools once so every turn, and the next client, sees the same objects
+                for server_name, bound in self.server_tools.items():
+                    if bound.wrapped is None:
+                        bound.wrapped = limit_server_tools(
+                            server_name, bound.tools, cache_scope=self.key, **dispatch_options[server_name]
+                        )
+                self.tools = [tool for bound in self.server_tools.values() for tool in bound.wrapped]
+                watchers = [
+                    asyncio.create_task(self._watch(server_name, session))
+                    for server_name, session in client.sessions.items()
+                ]
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            for watcher in watchers:
+                watcher.cancel()
+            sessions = self.sessions
+            for server_name, bound in self.server_tools.items():
+                # A replacement entry may already have bound its own session
+                if bound.session is not None and bound.session is sessions.get(server_name):
+                    bound.session = None
+            self.client = None
+            self.tools = []
+            self._ready.set()
+
+    async def _watch(self, server_name: str, session: Any) -> None:
+        """
+        Consume a session's incoming notifications.
+
+        mcp's ClientSession queues every notification on an unbuffered
+        stream that nothing else reads, so an unread one would stall the
+        session. A tool list change drops the cached schemas and marks this
+        entry stale.
+        """
+        try:
+            async for message in session.incoming_messages:
+                if isinstance(message, ServerNotification) and isinstance(message.root, ToolListChangedNotification):
+                    get_schema_cache().invalidate(self.server_tools[server_name].key)
+                    self.stale = True
+        except (anyio.ClosedResourceError, anyio.EndOfStream):
+            pass
+
+    @property
+    def sessions(self) -> Dict[str, Any]:
+        return self.client.sessions if self.client is not None else {}
+
+    @property
+    def is_alive(self) -> bool:
+        return (
+            not self.stale
+            and self.client is not None
+            and self._task is not None
+            and not self._task.done()
+            and self.loop is not None
+            and not self.loop.is_closed()
+        )
+
+    def get_tools(self) -> List[BaseTool]:
+        """Get the tools loaded from all servers when the session was opened"""
+        return list(self.tools)
+
+    async def check_health(self, timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+        """Ping every server; any failure or timeout marks the client unhealthy"""
+        if not self.is_alive:
+            return False
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(session.send_ping() for session in self.sessions.values())),
+                timeout,
+            )
+        except Exception:
+            return False
+        self.last_checked = time.monotonic()
+        return True
+
+    async def aclose(self, timeout: float = 10.0) -> None:
+        """Ask the owner task to exit its context and wait for the servers to shut down"""
+        if self._task is None or self._task.done():
+            return
+        if self.loop is not asyncio.get_running_loop():
+            # Owned by another thread's loop: signal it and let that loop finish the teardown
+            if not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(self._closing.set)
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except (asyncio.TimeoutError, Exception):
+            self._task.cancel()
+
+
+class MCPSessionPool:
+    """
+    Keeps warm MCP clients keyed by a normalized hash of their MCPConfig.
+
+    Entries are bound to the event loop that opened them; a turn running on a
+    different loop gets its own entry. Idle entries are evicted after
+    `idle_ttl` seconds, least-recently-used idle entries make room once
+    `max_size` is reached, and entries are pinged before reuse if they have
+    not been checked within `health_check_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        max_size: int = POOL_MAX_SIZE,
+        idle_ttl: float = POOL_IDLE_TTL,
+        health_check_interval: float = HEALTH_CHECK_INTERVAL,
+        health_check_timeout: float = HEALTH_CHECK_TIMEOUT,
+        connect_timeout: float = CONNECT_TIMEOUT,
+    ):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.connect_timeout = connect_timeout
+        self._entries: "OrderedDict[Tuple[int, str], PooledMCPClient]" = OrderedDict()
+        # Per loop object, not id(loop): a closed loop's id can be reused by a new
+        # loop, which must not get locks bound to the old one
+        self._key_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # Tool sets per slot, kept across reopened entries so their tool objects stay stable
+        self._server_tools: Dict[Tuple[int, str], Dict[str, ServerTools]] = {}
+        self._reapers: Dict[int, asyncio.Task] = {}
+        # Guards the dictionaries above, which may be touched from several loops/threads
+        self._guard = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "health_failures": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lock_for(self, loop: asyncio.AbstractEventLoop, key: str) -> asyncio.Lock:
+        with self._guard:
+            locks = self._key_locks.get(loop)
+            if locks is None:
+                locks = self._key_locks[loop] = {}
+            lock = locks.get(key)
+            if lock is None:
+                lock = locks[key] = asyncio.Lock()
+            return lock
+
+    def _prune_locks(self) -> None:
+        """
+        Drop the locks and finished reapers of closed loops. A lock that was ever
+        contended references its loop, so the weak keys alone would not free them.
+        """
+        with self._guard:
+            for loop in [loop for loop in self._key_locks if loop.is_closed()]:
+                del self._key_locks[loop]
+            for loop_id in [loop_id for loop_id, reaper in self._reapers.items() if reaper.done()]:
+                del self._reapers[loop_id]
+
+    async def acquire(self, config: Dict[str, Any], key: Optional[str] = None) -> PooledMCPClient:
+        """
+        Return a warm client for `config`, opening a new one if needed.
+
+        `key` is the config's fingerprint when the caller already has it (an
+        interned config id, see config_registry.py); otherwise it is computed.
+        """
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key or config_fingerprint(config))
+        self._ensure_reaper(loop)
+        await self.evict_idle()
+
+        async with self._lock_for(loop, slot[1]):
+            entry = self._entries.get(slot)
+            if entry is not None and not await self._is_healthy(entry):
+                self.stats["health_failures"] += 1
+                await self._discard(slot, entry)
+                entry = None
+
+            if entry is None:
+                self.stats["misses"] += 1
+                await self._make_room()
+                with self._guard:
+                    server_tools = self._server_tools.setdefault(slot, {})
+                entry = PooledMCPClient(slot[1], config, server_tools)
+                with telemetry.span("mcp.session_setup", servers=len(config)):
+                    await entry.start(self.connect_timeout)
+                with self._guard:
+                    self._entries[slot] = entry
+            else:
+                self.stats["hits"] += 1
+
+            entry.in_use += 1
+            entry.last_used = time.monotonic()
+            with self._guard:
+                self._entries.move_to_end(slot)
+            return entry
+
+    def release(self, entry: PooledMCPClient, failed: bool = False) -> None:
+        """Return a client to the pool; a failed turn forces a health check on next use"""
+        entry.in_use = max(entry.in_use - 1, 0)
+        entry.last_used = time.monotonic()
+        if failed:
+            entry.last_checked = 0.0
+
+    @asynccontextmanager
+    async def session(self, config: Dict[str, Any], key: Optional[str] = None) -> AsyncIterator[PooledMCPClient]:
+        """Borrow a warm client for the duration of a turn"""
+        entry = await self.acquire(config, key)
+        failed = False
+        try:
+            yield entry
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(entry, failed=failed)
+
+    async def _is_healthy(self, entry: PooledMCPClient) -> bool:
+        if not entry.is_alive:
+            return False
+        if time.monotonic() - entry.last_checked < self.health_check_interval:
+            return True
+        # Another turn is using the client right now, which is proof enough of life
+        if entry.in_use:
+            return True
+        return await entry.check_health(self.health_check_timeout)
+
+    async def _discard(self, slot: Tuple[int, str], entry: PooledMCPClient) -> None:
+        with self._guard:
+            if self._entries.get(slot) is entry:
+                del self._entries[slot]
+        await entry.aclose()
+
+    async def _make_room(self) -> None:
+        """Evict least-recently-used idle entries until there is space for one more"""
+        while len(self._entries) >= self.max_size:
+            with self._guard:
+                victim = next(((slot, e) for slot, e in self._entries.items() if e.in_use == 0), None)
+            if victim is None:
+                # Every entry is busy; allow a temporary overflow rather than stall the turn
+                return
+            self.stats["evictions"] += 1
+            await self._discard(*victim)
+
+    async def evict_idle(self) -> int:
+        """Close entries that have been idle longer than `idle_ttl`, or whose loop is gone"""
+        now = time.monotonic()
+        with self._guard:
+            stale = [
+                (slot, entry)
+                for slot, entry in self._entries.items()
+                if (entry.in_use == 0 and now - entry.last_used > self.idle_ttl)
+                or (entry.loop is not None and entry.loop.is_closed())
+            ]
+        for slot, entry in stale:
+            self.stats["evictions"] += 1
+            await self._discard(slot, entry)
+        with self._guard:
+            # Tool sets of closed loops can never be reused
+            for slot, entry in stale:
+                if entry.loop is not None and entry.loop.is_closed():
+                    self._server_tools.pop(slot, None)
+        self._prune_locks()
+        return len(stale)
+
+    def _ensure_reaper(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start a background task on this loop that periodically evicts idle entries"""
+        with self._guard:
+            reaper = self._reapers.get(id(loop))
+            if reaper is not None and not reaper.done():
+                return
+            self._reapers[id(loop)] = loop.create_task(self._reap(), name="mcp-session-pool-reaper")
+
+    async def _reap(self) -> None:
+        interval = max(min(self.idle_ttl, self.health_check_interval), 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            await self.evict_idle()
+
+    async def aclose(self) -> None:
+        """Shut down every pooled session and stop the reapers"""
+        with self._guard:
+            entries = list(self._entries.items())
+            reapers = list(self._reapers.values())
+            self._entries.clear()
+            self._reapers.clear()
+            self._server_tools.clear()
+            self._key_locks.clear()
+        for reaper in reapers:
+            reaper.cancel()
+        await asyncio.gather(*(entry.aclose() for _, entry in entries), return_exceptions=True)
+
+
+_pool: Optional[MCPSessionPool] = None
+_pool_guard = threading.Lock()
+
+
+def get_session_pool() -> MCPSessionPool:
+    """Return the process-wide session pool, creating it on first use"""
+    global _pool
+    with _pool_guard:
+        if _pool is None:
+            _pool = MCPSessionPool()
+            atexit.register(_close_pool_at_exit)
+        return _pool
+
+
+def _pool_metrics():
+    if _pool is None:
+        return
+    help_text = "MCP session pool events"
+    for event, value in _pool.stats.items():
+        yield "mcp_session_pool_events_total", "counter", help_text, {"event": event}, value
+    yield "mcp_session_pool_size", "gauge", "Open MCP session pool entries", {}, len(_pool)
+    in_use = sum(entry.in_use for entry in list(_pool._entries.values()))
+    yield "mcp_session_pool_in_use", "gauge", "Turns currently borrowing a pooled session", {}, in_use
+
+
+telemetry.register_collector(_pool_metrics)
+
+
+async def shutdown_session_pool() -> None:
+    """Close every pooled MCP session; call on worker shutdown"""
+    global _pool
+    with _pool_guard:
+        pool, _pool = _pool, None
+    if pool is not None:
+        await pool.aclose()
+
+
+def _close_pool_at_exit(timeout: float = SHUTDOWN_TIMEOUT) -> None:
+    """
+    Close whatever is still pooled when the interpreter exits.
+
+    The graph is loaded by path with no lifespan of its own, so nothing else
+    tells the pool the process is ending. Each session must be closed on the
+    loop that owns it: a loop still running in another thread is handed the
+    work, a stopped loop is run once more here. Sessions of closed loops were
+    already cancelled with them.
+    """
+    global _pool
+    with _pool_guard:
+        pool, _pool = _pool, None
+    if pool is None:
+        return
+    with pool._guard:
+        entries = list(pool._entries.values())
+        reapers = list(pool._reapers.values())
+        pool._entries.clear()
+        pool._reapers.clear()
+    by_loop: Dict[asyncio.AbstractEventLoop, List[PooledMCPClient]] = {}
+    for entry in entries:
+        if entry.loop is not None and not entry.loop.is_closed():
+            by_loop.setdefault(entry.loop, []).append(entry)
+    for reaper in reapers:
+        loop = reaper.get_loop()
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(reaper.cancel)
+
+    for loop, loop_entries in by_loop.items():
+        async def close_all(entries: List[PooledMCPClient] = loop_entries) -> None:
+            await asyncio.gather(*(entry.aclose() for entry in entries), return_exceptions=True)
+
+        try:
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(close_all(), loop).result(timeout)
+            else:
+                loop.run_until_complete(asyncio.wait_for(close_all(), timeout))
+        except Exception:
+            pass  # Exiting anyway; never turn shutdown into a traceback
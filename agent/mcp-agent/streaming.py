@@ -0,0 +1,150 @@
+"""
+Streams the ReAct agent's progress out of chat_node while it runs.
+
+Awaiting react_agent.ainvoke() hides everything until the final answer.
+Instead the agent is driven with astream(), and LLM tokens and tool
+start/finish events are forwarded to the outer graph's stream writer, so
+`graph.astream(..., stream_mode="custom")` consumers see them as they happen.
+The node's callbacks are passed through, so astream_events consumers such as
+CopilotKit also get the nested model and tool events.
+
+Events reach the writer through a bounded asyncio.Queue drained by a
+separate task. When it is full, tool events wait for room (the agent is
+held back rather than memory growing), while tokens are merged into one
+pending event per message so the model stream itself is never stalled.
+What happens after the writer is up to LangGraph's own stream buffering.
+"""
+
+import asyncio
+import os
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.constants import CONFIG_KEY_STREAM_WRITER
+
+STREAM_AGENT_OUTPUT = os.getenv("STREAM_AGENT_OUTPUT", "1") not in ("0", "false", "False")
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "256"))
+
+
+class EventBuffer:
+    """Bounded queue of stream events; producers wait when it is full, except for tokens, which merge"""
+
+    def __init__(self, max_events: int = STREAM_BUFFER_SIZE):
+        self.coalesced = 0
+        self._queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(max(max_events, 1))
+        # Token held back while the queue is full; later tokens of its message merge into it
+        self._pending: Optional[Dict[str, Any]] = None
+        self._stopped = False
+
+    async def push(self, event: Dict[str, Any]) -> None:
+        if self._stopped:
+            return
+        if self._pending is not None:
+            if event["event"] == "token" and event["message_id"] == self._pending["message_id"]:
+                self._pending["content"] += event["content"]
+                self.coalesced += 1
+                if not self._queue.full():
+                    self._queue.put_nowait(self._pending)
+                    self._pending = None
+                return
+            await self._queue.put(self._pending)
+            self._pending = None
+        if event["event"] == "token" and self._queue.full():
+            self._pending = event
+            return
+        # Tool events are never dropped or merged; there are only a handful per turn
+        await self._queue.put(event)
+
+    async def close(self) -> None:
+        """Flush the pending token and tell drain() to finish"""
+        if self._stopped:
+            return
+        if self._pending is not None:
+            await self._queue.put(self._pending)
+            self._pending = None
+        await self._queue.put(None)
+
+    async def drain(self, writer: Callable[[Any], None]) -> None:
+        """Forward queued events to `writer` until the buffer is closed"""
+        try:
+            while (event := await self._queue.get()) is not None:
+                writer(event)
+                # Let the producer and other turns run between events
+                await asyncio.sleep(0)
+        except BaseException:
+            # Nobody reads any more: release a producer waiting for room
+            self._stopped = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            raise
+
+
+def _detached_config(config: RunnableConfig) -> RunnableConfig:
+    """
+    Copy the node's config without LangGraph's internal keys.
+
+    A graph invoked with its parent's task config is treated as a subgraph and
+    only yields "values", so the agent gets the callbacks, tags and user
+    configurable keys but not the parent's Pregel internals.
+    """
+    configurable = {
+        key: value
+        for key, value in config.get("configurable", {}).items()
+        if not key.startswith("__pregel_") and not key.startswith("checkpoint_")
+    }
+    return {**config, "configurable": configurable}
+
+
+async def _forward_updates(buffer: EventBuffer, update: Dict[str, Any]) -> None:
+    for node_update in update.values():
+        for message in (node_update or {}).get("messages", []):
+            if isinstance(message, AIMessage):
+                for tool_call in message.tool_calls:
+                    await buffer.push({
+                        "event": "tool_start",
+                        "tool_call_id": tool_call["id"],
+                        "name": tool_call["name"],
+                        "args": tool_call["args"],
+                    })
+            elif isinstance(message, ToolMessage):
+                await buffer.push({
+                    "event": "tool_end",
+                    "tool_call_id": message.tool_call_id,
+                    "name": message.name,
+                    "status": message.status,
+                    "content": message.content,
+                })
+
+
+async def run_react_agent(react_agent: Any, agent_input: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Run the react agent and return its final state, streaming progress when possible.
+
+    Falls back to a plain ainvoke when streaming is disabled or the graph is
+    not being streamed (there is no stream writer to forward to).
+    """
+    writer: Optional[Callable[[Any], None]] = config.get("configurable", {}).get(CONFIG_KEY_STREAM_WRITER)
+    if not STREAM_AGENT_OUTPUT or writer is None:
+        return await react_agent.ainvoke(agent_input, config)
+
+    buffer = EventBuffer()
+    drain_task = asyncio.create_task(buffer.drain(writer))
+    final_state: Dict[str, Any] = {}
+    try:
+        async for mode, chunk in react_agent.astream(
+            agent_input, _detached_config(config), stream_mode=["messages", "updates", "values"]
+        ):
+            if mode == "messages":
+                message, _ = chunk
+                # A reply that was not streamed (e.g. served from the response cache) arrives whole
+                if isinstance(message, AIMessage) and isinstance(message.content, str) and message.content:
+                    await buffer.push({"event": "token", "message_id": message.id, "content": message.content})
+            elif mode == "updates":
+                await _forward_updates(buffer, chunk)
+            else:
+                final_state = chunk
+    finally:
+        await buffer.close()
+        await drain_task
+    return final_state
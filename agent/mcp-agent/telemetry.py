@@ -0,0 +1,368 @@
+"""
+Lightweight tracing and metrics for the agent's hot path.
+
+Spans time MCP session setup, tool listing, model calls and tool
+invocations. Every finished span feeds a duration histogram, and sampled
+traces can be appended to a JSON-lines file. Metrics are exported in the
+Prometheus text format, either through render_prometheus() or a small HTTP
+endpoint.
+
+Instrumentation is off unless TELEMETRY_ENABLED is set. When it is off,
+span() returns a shared no-op object and counters are not touched, so the
+instrumented code pays roughly one function call per span.
+
+Environment:
+  TELEMETRY_ENABLED          "1" to record spans and metrics
+  TELEMETRY_SAMPLE_RATE      fraction of root spans whose trace is written (default 1.0)
+  TELEMETRY_TRACE_FILE       JSON-lines file to append sampled spans to
+  TELEMETRY_PROMETHEUS_PORT  serve /metrics on this port
+"""
+
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+ENABLED = _env_flag("TELEMETRY_ENABLED")
+SAMPLE_RATE = float(os.getenv("TELEMETRY_SAMPLE_RATE", "1.0"))
+TRACE_FILE = os.getenv("TELEMETRY_TRACE_FILE")
+PROMETHEUS_PORT = os.getenv("TELEMETRY_PROMETHEUS_PORT")
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+# A collector returns (name, type, help, labels, value) samples computed at scrape time
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """A monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+
+
+class Histogram:
+    """Bucketed observations (count, sum and cumulative buckets) per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # One slot per bucket, then +Inf, sum
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in self._values.items():
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    """Holds the process's metrics and the collectors that report other modules' stats"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, help: str, **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get_or_create(Counter, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, buckets=buckets)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render_prometheus(self) -> str:
+        """Render every metric and collector sample in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        # Group collector samples by metric name; the exposition format wants each family contiguous
+        families: Dict[str, Tuple[str, str, List[str]]] = {}
+        for collector in collectors:
+            for name, kind, help, labels, value in collector():
+                family = families.setdefault(name, (kind, help, []))
+                family[2].append(f"{name}{_format_labels(_label_key(labels))} {value}")
+        for name, (kind, help, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SPAN_SECONDS = REGISTRY.histogram("agent_span_duration_seconds", "Duration of instrumented operations")
+SPAN_ERRORS = REGISTRY.counter("agent_span_errors_total", "Instrumented operations that raised")
+
+
+class TraceWriter:
+    """Appends finished spans to a JSON-lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", buffering=1, encoding="utf-8")
+            self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_trace_writer: Optional[TraceWriter] = TraceWriter(TRACE_FILE) if TRACE_FILE else None
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("agent_current_span", default=None)
+
+
+class Span:
+    """A timed operation; use as a context manager (works inside async code too)"""
+
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id", "sampled", "start", "_wall_start", "_token")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.name = name
+        self.attributes = attributes
+        self.span_id = uuid.uuid4().hex[:16]
+        if parent is None:
+            self.trace_id = uuid.uuid4().hex
+            self.parent_id = None
+            self.sampled = _trace_writer is not None and random.random() < SAMPLE_RATE
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.sampled = parent.sampled
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def begin(self) -> "Span":
+        self._wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def finish(self, exc_type: Optional[type] = None) -> None:
+        """Record the duration (and trace record, if sampled) of a started span"""
+        duration = time.perf_counter() - self.start
+        status = "ok" if exc_type is None else "error"
+        SPAN_SECONDS.observe(duration, span=self.name)
+        if exc_type is not None:
+            SPAN_ERRORS.inc(span=self.name, error=exc_type.__name__)
+        if self.sampled:
+            _trace_writer.write({
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "name": self.name,
+                "start": self._wall_start,
+                "duration_ms": duration * 1000,
+                "status": status,
+                "attributes": self.attributes,
+            })
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self.begin()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_span.reset(self._token)
+        self.finish(exc_type)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes: Any) -> Any:
+    """Start a span; returns a shared no-op when telemetry is disabled"""
+    if not ENABLED:
+        return NOOP_SPAN
+    return Span(name, attributes)
+
+
+def inc(counter: Counter, amount: float = 1.0, **labels: Any) -> None:
+    """Increment a counter only when telemetry is enabled"""
+    if ENABLED:
+        counter.inc(amount, **labels)
+
+
+def enabled() -> bool:
+    return ENABLED
+
+
+def enable(trace_file: Optional[str] = None, sample_rate: Optional[float] = None) -> None:
+    """Turn instrumentation on at runtime, optionally writing traces to `trace_file`"""
+    global ENABLED, SAMPLE_RATE, _trace_writer
+    if sample_rate is not None:
+        SAMPLE_RATE = sample_rate
+    if trace_file is not None:
+        if _trace_writer is not None:
+            _trace_writer.close()
+        _trace_writer = TraceWriter(trace_file)
+    ENABLED = True
+
+
+def disable() -> None:
+    global ENABLED
+    ENABLED = False
+
+
+class ModelTimingHandler(BaseCallbackHandler):
+    """Records a span for every chat model call made with this handler attached"""
+
+    # Run in the caller's context so model spans nest under the current turn
+    run_inline = True
+
+    def __init__(self):
+        self._spans: Dict[Any, Span] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        if ENABLED:
+            self._spans[run_id] = Span("model.call", {"messages": sum(len(batch) for batch in messages)}).begin()
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        if (model_span := self._spans.pop(run_id, None)) is not None:
+            model_span.finish()
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        if (model_span := self._spans.pop(run_id, None)) is not None:
+            model_span.finish(type(error))
+
+
+MODEL_TIMING = ModelTimingHandler()
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render_prometheus()
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]) -> None:
+    REGISTRY.register_collector(collector)
+
+
+_http_server = None
+
+
+def serve_prometheus(port: int, host: str = "127.0.0.1") -> None:
+    """Serve GET /metrics from a daemon thread"""
+    global _http_server
+    if _http_server is not None:
+        return
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    _http_server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=_http_server.serve_forever, name="prometheus-metrics", daemon=True).start()
+
+
+if ENABLED and PROMETHEUS_PORT:
+    serve_prometheus(int(PROMETHEUS_PORT))
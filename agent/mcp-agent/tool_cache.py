@@ -0,0 +1,151 @@
+"""
+Client-side cache for the results of pure and idempotent MCP tool calls.
+
+Models often repeat a call such as `add(2, 3)` or a weather lookup for the
+same city, within a step and across turns. For tools that opt in, the result
+of a successful call is kept for a per-tool TTL and returned without another
+JSON-RPC round trip.
+
+A tool opts in either through its connection config:
+
+    "math": {..., "cache_ttl": 3600}                        # every tool of the server
+    "weather": {..., "cache_ttl": {"get_current_weather": 300}}
+    "gateway": {..., "cache_ttl": {"math_*": 3600, "weather_*": 300}}
+
+or through MCP tool annotations (readOnlyHint) when the adapter exposes them
+as tool metadata, in which case MCP_TOOL_CACHE_DEFAULT_TTL applies. Failed
+calls (ToolException, timeouts) are never cached.
+"""
+
+import json
+import os
+from fnmatch import fnmatchcase
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+from langchain_core.tools import BaseTool
+
+import telemetry
+
+TOOL_CACHE_SIZE = int(os.getenv("MCP_TOOL_CACHE_SIZE", "1024"))
+TOOL_CACHE_DEFAULT_TTL = float(os.getenv("MCP_TOOL_CACHE_DEFAULT_TTL", "60"))
+
+CacheTTL = Union[float, Dict[str, float], None]
+CacheKey = Tuple[str, str, str]
+
+
+def canonical_arguments(arguments: Dict[str, Any]) -> str:
+    """Serialize call arguments so equal argument sets produce the same key"""
+    return json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def tool_ttl(tool: BaseTool, cache_ttl: CacheTTL = None) -> Optional[float]:
+    """
+    Resolve how long a tool's results may be cached, or None when it has not opted in.
+
+    In a mapping, an explicit per-tool entry wins over the first matching
+    pattern (such as "math_*" for a namespace of the tool gateway), which
+    wins over "*". A mapping or a server-wide number wins over annotations.
+    A TTL of 0 disables caching for that tool.
+    """
+    ttl = None
+    if isinstance(cache_ttl, dict):
+        ttl = cache_ttl.get(tool.name)
+        if ttl is None:
+            ttl = next(
+                (value for pattern, value in cache_ttl.items() if pattern != "*" and fnmatchcase(tool.name, pattern)),
+                cache_ttl.get("*"),
+            )
+    elif cache_ttl is not None:
+        ttl = cache_ttl
+    if ttl is None:
+        annotations = (tool.metadata or {}).get("annotations", tool.metadata or {})
+        if annotations.get("readOnlyHint"):
+            ttl = TOOL_CACHE_DEFAULT_TTL
+    return float(ttl) if ttl else None
+
+
+class ToolResultCache:
+    """Size-bounded LRU of tool results, each entry expiring after its tool's TTL"""
+
+    def __init__(self, max_size: int = TOOL_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-tool counters: tool name -> {"hits": n, "misses": n}
+        self._tool_stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+        self.expirations = 0
+
+    def _count(self, tool_name: str, event: str) -> None:
+        stats = self._tool_stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+        stats[event] += 1
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        """Return (found, result) for a key, dropping it if it has expired"""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._count(key[1], "hits")
+                    return True, result
+                del self._entries[key]
+                self.expirations += 1
+            self._count(key[1], "misses")
+            return False, None
+
+    def put(self, key: CacheKey, result: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, scope: str = None) -> None:
+        """Drop cached results for one scope (MCP pool key), or everything"""
+        with self._lock:
+            if scope is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == scope]:
+                    del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = sum(stats["hits"] for stats in self._tool_stats.values())
+            misses = sum(stats["misses"] for stats in self._tool_stats.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+                "tools": {name: dict(stats) for name, stats in self._tool_stats.items()},
+            }
+
+
+_tool_results = ToolResultCache()
+
+
+def get_tool_cache() -> ToolResultCache:
+    return _tool_results
+
+
+def _tool_cache_metrics():
+    stats = _tool_results.stats()
+    for tool_name, tool_stats in stats["tools"].items():
+        for event, value in tool_stats.items():
+            yield "mcp_tool_cache_lookups_total", "counter", "MCP tool result cache lookups", {"tool": tool_name, "result": event}, value
+    for event in ("evictions", "expirations"):
+        yield "mcp_tool_cache_removals_total", "counter", "MCP tool results dropped from the cache", {"reason": event}, stats[event]
+    yield "mcp_tool_cache_size", "gauge", "Cached MCP tool results", {}, stats["size"]
+    yield "mcp_tool_cache_hit_ratio", "gauge", "Share of cacheable tool calls served from the cache", {}, stats["hit_rate"]
+
+
+telemetry.register_collector(_tool_cache_metrics)
@@ -0,0 +1,85 @@
+"""
+Per-server limits for concurrent MCP tool calls.
+
+The ReAct agent's ToolNode already runs every tool call from one model
+response with asyncio.gather and returns the results in call order. These
+wrappers bound how many of those calls hit the same server at once and how
+long any one call may take, so a slow or stuck server cannot hold up the
+whole step. Tools that opt in to result caching (see tool_cache.py) are
+answered from the cache before they take a concurrency slot.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Sequence
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+
+import telemetry
+from tool_cache import CacheTTL, canonical_arguments, get_tool_cache, tool_ttl
+
+# Defaults applied to every server unless its connection config overrides them
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("MCP_TOOL_MAX_CONCURRENCY", "4"))
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "30"))
+
+# Connection keys consumed here rather than by MultiServerMCPClient
+DISPATCH_KEYS = ("max_concurrency", "timeout", "cache_ttl")
+
+
+def split_dispatch_options(connection: Dict[str, Any]) -> tuple:
+    """Separate the dispatch options from the keyword arguments the MCP client understands"""
+    options = {key: connection[key] for key in DISPATCH_KEYS if key in connection}
+    client_kwargs = {key: value for key, value in connection.items() if key not in DISPATCH_KEYS}
+    return client_kwargs, options
+
+
+def limit_server_tools(
+    server_name: str,
+    tools: Sequence[BaseTool],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: float = DEFAULT_TOOL_TIMEOUT,
+    cache_ttl: CacheTTL = None,
+    cache_scope: str = "",
+) -> List[BaseTool]:
+    """
+    Wrap one server's tools so they share a concurrency limit and a per-call timeout.
+
+    A call that times out raises ToolException, which ToolNode turns into an
+    error ToolMessage for the model instead of failing the turn. Results of
+    cacheable tools are stored under `cache_scope` (the pool key) so servers
+    of different configurations never share entries.
+    """
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+    cache = get_tool_cache()
+
+    def wrap(tool: BaseTool) -> BaseTool:
+        call = tool.coroutine
+        ttl = tool_ttl(tool, cache_ttl)
+
+        async def bounded_call(**arguments: Any) -> Any:
+            async with semaphore:
+                with telemetry.span("mcp.tool_call", server=server_name, tool=tool.name):
+                    try:
+                        return await asyncio.wait_for(call(**arguments), timeout)
+                    except asyncio.TimeoutError:
+                        raise ToolException(f"{server_name}/{tool.name} timed out after {timeout:g}s")
+
+        async def cached_call(**arguments: Any) -> Any:
+            key = (cache_scope, f"{server_name}/{tool.name}", canonical_arguments(arguments))
+            found, result = cache.get(key)
+            if found:
+                return result
+            result = await bounded_call(**arguments)
+            cache.put(key, result, ttl)
+            return result
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=cached_call if ttl else bounded_call,
+            response_format=tool.response_format,
+            metadata={**(tool.metadata or {}), "mcp_server": server_name},
+        )
+
+    return [wrap(tool) if getattr(tool, "coroutine", None) else tool for tool in tools]
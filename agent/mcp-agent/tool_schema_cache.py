@@ -0,0 +1,280 @@
+"""
+Cache of MCP tool definitions and their LangChain wrappers across sessions.
+
+Opening a session normally costs an `initialize` round trip plus a
+`tools/list` round trip per server, and the freshly converted tool objects
+force the compiled ReAct agent (see agent_cache.py) to be rebuilt. Tool
+lists rarely change, so this module keeps them:
+
+  • ToolSchemaCache holds each server's tool definitions in memory and,
+    when MCP_TOOL_SCHEMA_CACHE names a file, on disk in a versioned JSON
+    document, so even a fresh process skips `tools/list`.
+  • ServerTools holds one server's converted LangChain tools for a pool
+    slot. The tools call whichever session is currently bound, so after a
+    session restart the same objects are rebound instead of rebuilt, and
+    the compiled agent stays valid.
+
+An entry is reused only while the server's fingerprint (its initialize
+result plus, for stdio servers, the size and mtime of the script files it
+runs and of the Python modules next to them, which is where the bundled
+servers, and the gateway hosting them, import their code from) is
+unchanged and the entry is younger than MCP_TOOL_SCHEMA_MAX_AGE.
+A `notifications/tools/list_changed` from the server drops the entry.
+In-process servers (the "memory" transport, see memory_transport.py) are
+always listed, since that costs no round trip and cannot go stale.
+
+Sessions are opened here with the mcp client API rather than through
+langchain-mcp-adapters' internals, so only MultiServerMCPClient's public
+surface (get_tools, the async context manager and its session and tool
+maps) is relied on.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.types import CallToolResult, InitializeResult, TextContent, Tool as MCPTool
+
+import telemetry
+from memory_transport import connect_in_memory
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the on-disk layout changes; files of other versions are ignored
+SCHEMA_CACHE_VERSION = 1
+SCHEMA_CACHE_PATH = os.getenv("MCP_TOOL_SCHEMA_CACHE")
+# Servers whose code the fingerprint cannot see (SSE) are re-listed at least this often
+SCHEMA_MAX_AGE = float(os.getenv("MCP_TOOL_SCHEMA_MAX_AGE", "3600"))
+
+
+def _source_files(connection: Dict[str, Any]) -> List[str]:
+    """The script files a stdio server runs, plus the Python modules beside them that it may import"""
+    files = set()
+    for arg in connection.get("args") or ():
+        if isinstance(arg, str) and os.path.isfile(arg):
+            path = os.path.abspath(arg)
+            files.add(path)
+            files.update(glob.glob(os.path.join(os.path.dirname(path), "*.py")))
+    return sorted(files)
+
+
+def server_fingerprint(connection: Dict[str, Any], initialize_result: InitializeResult) -> str:
+    """Hash what a server announced about itself plus, for stdio, the source files it runs"""
+    files = []
+    for path in _source_files(connection):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append([path, stat.st_size, stat.st_mtime_ns])
+    payload = json.dumps(
+        {"initialize": initialize_result.model_dump(mode="json", exclude_none=True), "files": files},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ToolSchemaCache:
+    """Tool definitions per server key, in memory and optionally in one JSON file"""
+
+    def __init__(self, path: Optional[str] = SCHEMA_CACHE_PATH, max_age: float = SCHEMA_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path and os.path.exists(self.path):
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        document = json.load(f)
+                    if document.get("version") == SCHEMA_CACHE_VERSION:
+                        self._entries = document.get("servers", {})
+                except (OSError, ValueError) as e:
+                    logger.warning("Ignoring unreadable tool schema cache %s: %s", self.path, e)
+        return self._entries
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": SCHEMA_CACHE_VERSION, "servers": self._entries}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not write tool schema cache %s: %s", self.path, e)
+
+    def get(self, key: str, fingerprint: str) -> Optional[List[MCPTool]]:
+        """Cached tool definitions for a server, or None if missing, changed or too old"""
+        with self._lock:
+            entry = self._load().get(key)
+            if (
+                entry is None
+                or entry["fingerprint"] != fingerprint
+                or time.time() - entry["saved_at"] > self.max_age
+            ):
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return [MCPTool.model_validate(tool) for tool in entry["tools"]]
+
+    def put(self, key: str, fingerprint: str, tools: Sequence[MCPTool]) -> None:
+        with self._lock:
+            self._load()[key] = {
+                "fingerprint": fingerprint,
+                "saved_at": time.time(),
+                "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+            }
+            self._save()
+
+    def invalidate(self, key: str = None) -> None:
+        """Forget one server's tools, or every server's"""
+        with self._lock:
+            entries = self._load()
+            if key is None:
+                self.stats["invalidations"] += len(entries)
+                entries.clear()
+            elif entries.pop(key, None) is not None:
+                self.stats["invalidations"] += 1
+            self._save()
+
+
+def _tool_result(result: CallToolResult) -> Tuple[Union[str, List[str]], Optional[List[Any]]]:
+    """Content and artifact of a tool call, as langchain-mcp-adapters returns them"""
+    texts = [content.text for content in result.content if isinstance(content, TextContent)]
+    others = [content for content in result.content if not isinstance(content, TextContent)]
+    content: Union[str, List[str]] = texts[0] if len(texts) == 1 else texts
+    if result.isError:
+        raise ToolException(content)
+    return content, others or None
+
+
+class ServerTools:
+    """
+    One server's LangChain tools, bound to whichever session currently serves it.
+
+    `tools` are the converted MCP tools; `wrapped` is whatever the caller
+    layers on top (dispatch limits), kept until the tools are rebuilt.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.session: Optional[ClientSession] = None
+        self.definitions: List[MCPTool] = []
+        self.tools: List[BaseTool] = []
+        self.wrapped: Optional[List[BaseTool]] = None
+
+    def update(self, definitions: Sequence[MCPTool]) -> bool:
+        """Convert the definitions unless they are the ones already converted; True if rebuilt"""
+        definitions = list(definitions)
+        if self.tools and definitions == self.definitions:
+            return False
+        self.definitions = definitions
+        self.tools = [self._convert(definition) for definition in definitions]
+        self.wrapped = None
+        return True
+
+    def _convert(self, definition: MCPTool) -> BaseTool:
+        # Same conversion as langchain_mcp_adapters, but the session is looked up per call
+        async def call_tool(**arguments: Any) -> Any:
+            if self.session is None:
+                raise RuntimeError(f"No open MCP session for {definition.name}")
+            return _tool_result(await self.session.call_tool(definition.name, arguments))
+
+        return StructuredTool(
+            name=definition.name,
+            description=definition.description or "",
+            args_schema=definition.inputSchema,
+            coroutine=call_tool,
+            response_format="content_and_artifact",
+        )
+
+
+class CachedToolsMCPClient(MultiServerMCPClient):
+    """
+    MultiServerMCPClient that takes tool lists from the schema cache when the
+    server is unchanged, and that also connects to in-process servers
+    """
+
+    def __init__(self, connections: Dict[str, Any], server_tools: Dict[str, ServerTools], cache: "ToolSchemaCache"):
+        super().__init__(connections)
+        self.server_tools = server_tools
+        self.cache = cache
+
+    async def __aenter__(self) -> "CachedToolsMCPClient":
+        try:
+            for server_name, connection in (self.connections or {}).items():
+                session = await self._connect(connection)
+                await self._load_tools(server_name, session)
+            return self
+        except BaseException:
+            await self.exit_stack.aclose()
+            raise
+
+    async def _connect(self, connection: Dict[str, Any]) -> ClientSession:
+        transport = connection.get("transport", "stdio")
+        if transport == "memory":
+            return await connect_in_memory(self.exit_stack, connection["server"])
+        if transport == "sse":
+            read_stream, write_stream = await self.exit_stack.enter_async_context(sse_client(connection["url"]))
+        elif transport == "stdio":
+            parameters = StdioServerParameters(
+                command=connection["command"],
+                args=connection["args"],
+                env=connection.get("env"),
+                encoding=connection.get("encoding", "utf-8"),
+                encoding_error_handler=connection.get("encoding_error_handler", "strict"),
+            )
+            read_stream, write_stream = await self.exit_stack.enter_async_context(stdio_client(parameters))
+        else:
+            raise ValueError(f"Unsupported transport: {transport}")
+        return await self.exit_stack.enter_async_context(ClientSession(read_stream, write_stream))
+
+    async def _load_tools(self, server_name: str, session: ClientSession) -> None:
+        initialize_result = await session.initialize()
+        self.sessions[server_name] = session
+        bound = self.server_tools[server_name]
+        bound.session = session
+        if self.connections[server_name].get("transport") == "memory":
+            definitions = (await session.list_tools()).tools
+        else:
+            fingerprint = server_fingerprint(self.connections[server_name], initialize_result)
+            definitions = self.cache.get(bound.key, fingerprint)
+            if definitions is None:
+                definitions = (await session.list_tools()).tools
+                self.cache.put(bound.key, fingerprint, definitions)
+        bound.update(definitions)
+        self.server_name_to_tools[server_name] = bound.tools
+
+
+_schema_cache = ToolSchemaCache()
+
+
+def get_schema_cache() -> ToolSchemaCache:
+    return _schema_cache
+
+
+def _schema_cache_metrics():
+    for event, value in _schema_cache.stats.items():
+        yield "mcp_tool_schema_cache_events_total", "counter", "MCP tool list cache events", {"event": event}, value
+
+
+telemetry.register_collector(_schema_cache_metrics)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Server log capture for the launcher
+
+Server output goes through a pipe that is drained continuously, so a server
+never blocks on a write, and into a LogSink:
+
+  • the last lines are kept in an in-memory ring buffer (what
+    check_servers.py shows while the supervisor runs);
+  • everything else is handed to a QueueListener thread through a bounded
+    queue and written to a log file that rotates by size and by age, with
+    old files optionally gzipped. If the disk falls behind and the queue
+    fills up, lines are dropped and counted rather than applying
+    backpressure to the server.
+
+Disk use per server is bounded by roughly (backups + 1) × max bytes.
+
+`start_servers.py --supervise` pumps its servers' pipes on its own event
+loop. Detached servers outlive the launcher, so each gets a small pump
+process instead, which is this script:
+
+  server ... | python server_logs.py math_server.log --max-bytes 1000000
+"""
+
+import argparse
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+LOG_MAX_BYTES = int(os.getenv("MCP_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("MCP_LOG_BACKUPS", "5"))
+# Seconds before a log is rotated regardless of size (0 = size only)
+LOG_MAX_AGE = float(os.getenv("MCP_LOG_MAX_AGE", "86400"))
+LOG_COMPRESS = os.getenv("MCP_LOG_COMPRESS", "1") not in ("0", "false", "False")
+RECENT_LINES = 200
+QUEUE_SIZE = 10000
+# Longer lines are cut, so one runaway write cannot grow the reader's buffer without bound
+MAX_LINE_BYTES = 16 * 1024
+
+
+class RotatingLogFile(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that also rotates by age and can gzip the rotated files"""
+
+    def __init__(self, path: str, max_bytes: int = LOG_MAX_BYTES, backups: int = LOG_BACKUPS,
+                 max_age: float = LOG_MAX_AGE, compress: bool = LOG_COMPRESS):
+        super().__init__(path, maxBytes=max_bytes, backupCount=max(backups, 1), encoding="utf-8", delay=True)
+        self.max_age = max_age
+        self.rollover_at = time.time() + max_age
+        self.setFormatter(logging.Formatter("%(message)s"))
+        if compress:
+            self.namer = lambda name: name + ".gz"
+            self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        # Runs on the listener thread, never on the launcher's event loop
+        with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if self.max_age > 0 and time.time() >= self.rollover_at:
+            return 1
+        return super().shouldRollover(record)
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.max_age
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a bounded queue: a full queue drops the record instead of raising"""
+
+    def __init__(self, log_queue: "queue.Queue[Any]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records are plain lines with nothing to format; skip QueueHandler's copy
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogSink:
+    """One server's log: a ring buffer of recent lines plus a rotating file written off-thread"""
+
+    def __init__(self, path: str, recent_lines: int = RECENT_LINES, queue_size: int = QUEUE_SIZE, **file_options: Any):
+        self.path = path
+        self.recent: Deque[str] = deque(maxlen=recent_lines)
+        self.lines = 0
+        self.file = RotatingLogFile(path, **file_options)
+        self._handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self._listener = logging.handlers.QueueListener(self._handler.queue, self.file)
+        self._listener.start()
+
+    @property
+    def dropped(self) -> int:
+        return self._handler.dropped
+
+    def roll_over(self) -> None:
+        """Start a fresh file, keeping the current one as the first backup (call before writing)"""
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self.file.doRollover()
+
+    def write_line(self, line: str) -> None:
+        self.recent.append(line)
+        self.lines += 1
+        self._handler.handle(logging.makeLogRecord({"msg": line, "levelno": logging.INFO, "levelname": "INFO"}))
+
+    def feed(self, buffer: bytes, data: bytes) -> bytes:
+        """Write the complete lines in buffer + data; returns the unfinished rest"""
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            self.write_line(line[:MAX_LINE_BYTES].decode("utf-8", errors="replace").rstrip("\r"))
+        if len(buffer) > MAX_LINE_BYTES:
+            self.write_line(buffer[:MAX_LINE_BYTES].decode("utf-8", errors="replace") + " …")
+            buffer = b""
+        return buffer
+
+    def finish(self, buffer: bytes) -> None:
+        if buffer:
+            self.write_line(buffer.decode("utf-8", errors="replace"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "lines": self.lines, "dropped": self.dropped}
+
+    def tail(self, count: int) -> List[str]:
+        return list(self.recent)[-count:] if count > 0 else []
+
+    def close(self) -> None:
+        """Write out everything queued, then close the file"""
+        self._listener.stop()
+        self.file.close()
+
+
+async def pump(stream: Any, sink: LogSink) -> None:
+    """Drain an anyio byte stream (a child's stdout or stderr) into `sink` until EOF"""
+    import anyio
+
+    buffer = b""
+    try:
+        async for data in stream:
+            buffer = sink.feed(buffer, data)
+    except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+        pass
+    sink.finish(buffer)
+
+
+def file_options(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "max_bytes": args.log_max_bytes,
+        "backups": args.log_backups,
+        "max_age": args.log_max_age,
+        "compress": args.compress_logs,
+    }
+
+
+def add_log_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--log-max-bytes", type=int, default=LOG_MAX_BYTES, help="rotate a server log at this size")
+    parser.add_argument("--log-backups", type=int, default=LOG_BACKUPS, help="rotated logs to keep per server")
+    parser.add_argument("--log-max-age", type=float, default=LOG_MAX_AGE,
+                        help="also rotate a log after this many seconds (0 = size only)")
+    parser.add_argument("--compress-logs", action=argparse.BooleanOptionalAction, default=LOG_COMPRESS,
+                        help="gzip rotated logs")
+
+
+def pump_args(args: argparse.Namespace) -> List[str]:
+    """The command line options that reproduce `args`' log settings for the pump process"""
+    return [
+        "--log-max-bytes", str(args.log_max_bytes),
+        "--log-backups", str(args.log_backups),
+        "--log-max-age", str(args.log_max_age),
+        "--compress-logs" if args.compress_logs else "--no-compress-logs",
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy stdin into a rotating log file")
+    parser.add_argument("log_file")
+    add_log_arguments(parser)
+    args = parser.parse_args()
+
+    sink = LogSink(args.log_file, **file_options(args))
+    sink.roll_over()
+    buffer = b""
+    stdin = sys.stdin.buffer.raw
+    try:
+        # This process exists only to drain the pipe, so a blocking read is fine here
+        while data := stdin.read(65536):
+            buffer = sink.feed(buffer, data)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.finish(buffer)
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Runtime registry for the MCP servers
+
+Finding servers with `pgrep -f` or a scan of `ps aux` costs a walk over
+every process on the host and can match unrelated command lines. Instead:
+
+  • Every server registers itself when it starts (server_transport.serve):
+    one small JSON PID file per process in MCP_RUNTIME_DIR, removed again
+    when it exits. Readers check that each PID is still alive and still
+    running the same script, and delete the files of servers that died.
+  • Each record names its owner. start_servers.py sets MCP_SERVER_OWNER to
+    "launcher" for the servers it starts; anything else (a stdio server an
+    MCP client such as the agent spawned, or a server run by hand) is
+    "external" and belongs to whoever started it.
+  • `start_servers.py --supervise` also listens on a Unix control socket in
+    the same directory and answers status (PIDs, uptime, restarts, SSE
+    request counts) and stop commands from memory.
+  • tail_lines() reads the end of a log by seeking backwards, so showing
+    the last lines costs the same however large the log has grown.
+
+check_servers.py and stop_servers.py are built on these.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+RUNTIME_DIR = Path(os.getenv("MCP_RUNTIME_DIR", Path(__file__).resolve().parent / ".run"))
+CONTROL_SOCKET = RUNTIME_DIR / "control.sock"
+CONTROL_TIMEOUT = 2.0
+OWNER_ENV = "MCP_SERVER_OWNER"
+LAUNCHER_OWNER = "launcher"
+
+
+def pid_file(stem: str, pid: int) -> Path:
+    return RUNTIME_DIR / f"{stem}.{pid}.pid"
+
+
+def register(script: str, transport: str, port: Optional[int] = None) -> Path:
+    """Write this process's PID file; returns its path"""
+    RUNTIME_DIR.mkdir(parents=True, exist_ok=True)
+    script_path = Path(script).resolve()
+    path = pid_file(script_path.stem, os.getpid())
+    record = {
+        "pid": os.getpid(),
+        "script": str(script_path),
+        "server": script_path.name,
+        "transport": transport,
+        "port": port,
+        "owner": os.getenv(OWNER_ENV) or "external",
+        "parent_pid": os.getppid(),
+        "started_at": time.time(),
+    }
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(record))
+    os.replace(tmp_path, path)
+    return path
+
+
+def unregister(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def is_running(record: Dict[str, Any]) -> bool:
+    """Whether the PID is alive and, where /proc can tell, still running the registered script"""
+    pid = record["pid"]
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Alive, but owned by another user
+    cmdline = Path(f"/proc/{pid}/cmdline")
+    if cmdline.exists():
+        try:
+            # Guards against the PID having been reused by another process
+            return record["server"].encode() in cmdline.read_bytes()
+        except OSError:
+            return False
+    return True
+
+
+def registered_servers(prune: bool = True) -> List[Dict[str, Any]]:
+    """Records of the servers that are running, oldest first; stale PID files are deleted"""
+    if not RUNTIME_DIR.is_dir():
+        return []
+    records = []
+    for path in RUNTIME_DIR.glob("*.pid"):
+        try:
+            record = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if is_running(record):
+            records.append(record)
+        elif prune:
+            unregister(path)
+    return sorted(records, key=lambda record: record["started_at"])
+
+
+def launcher_owned(record: Dict[str, Any]) -> bool:
+    """Whether start_servers.py started this server (and so may stop it)"""
+    return record.get("owner") == LAUNCHER_OWNER
+
+
+def tail_lines(path: str, count: int = 3, block_size: int = 4096) -> List[str]:
+    """The last `count` lines of a file, read backwards from the end in blocks"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        # One extra newline: the file usually ends with one
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return lines[-count:] if count else []
+
+
+# --- Control socket -------------------------------------------------------
+
+def control_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+async def start_control_server(handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]) -> Optional[asyncio.AbstractServer]:
+    """
+    Answer one JSON command per connection on CONTROL_SOCKET with `handler`.
+
+    Returns None when Unix sockets are unavailable or another launcher
+    already owns the socket.
+    """
+    if not control_supported():
+        return None
+    RUNTIME_DIR.mkdir(parents=True, exist_ok=True)
+    if CONTROL_SOCKET.exists():
+        if send_command({"command": "ping"}) is not None:
+            print(f"⚠️  Another launcher already owns {CONTROL_SOCKET}; not serving control commands", file=sys.stderr)
+            return None
+        CONTROL_SOCKET.unlink()
+
+    async def serve_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = json.loads(await reader.readline())
+            response = await handler(request)
+        except Exception as e:
+            response = {"error": repr(e)}
+        writer.write(json.dumps(response).encode() + b"\n")
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(serve_client, path=str(CONTROL_SOCKET))
+    os.chmod(CONTROL_SOCKET, 0o600)
+    return server
+
+
+async def stop_control_server(server: Optional[asyncio.AbstractServer]) -> None:
+    if server is None:
+        return
+    server.close()
+    await server.wait_closed()
+    try:
+        CONTROL_SOCKET.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def send_command(request: Dict[str, Any], timeout: float = CONTROL_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """Send a command to the launcher's control socket; None if no launcher is listening"""
+    if not control_supported() or not CONTROL_SOCKET.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(str(CONTROL_SOCKET))
+            client.sendall(json.dumps(request).encode() + b"\n")
+            response = b""
+            while not response.endswith(b"\n"):
+                chunk = client.recv(65536)
+                if not chunk:
+                    break
+                response += chunk
+        return json.loads(response)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Command-line transport selection shared by the MCP servers
+
+By default a server speaks MCP over stdio, bound to the one client process
+that spawned it. With `--transport sse` it instead serves MCP over HTTP/SSE
+on a local port, so any number of agent processes can connect to one warm
+server:
+
+  python math_server.py --transport sse --port 8100
+  python weather_server.py --transport sse --port 8200 --keep-alive 120
+
+Each SSE session lives in the memory of the process that accepted it, so a
+server cannot be scaled by forking workers behind one port. Run several
+processes on consecutive ports instead (start_servers.py --workers N).
+
+Either way the server registers its PID with server_registry while it runs,
+and an SSE server also answers GET /status with its request count.
+"""
+
+import argparse
+import atexit
+import logging
+import os
+import sys
+import time
+
+DEFAULT_HOST = os.getenv("MCP_SERVER_HOST", "127.0.0.1")
+# Idle HTTP keep-alive; longer than uvicorn's 5s so pooled agent clients reuse connections between turns
+DEFAULT_KEEP_ALIVE = float(os.getenv("MCP_SERVER_KEEP_ALIVE", "75"))
+# Open SSE streams never finish on their own, so shutdown only waits this long for them
+SHUTDOWN_GRACE = 2.0
+
+
+def build_sse_app(mcp):
+    """
+    The Starlette app FastMCP itself builds for SSE: GET /sse plus POST /messages/,
+    and GET /status for the launcher
+    """
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Mount, Route
+
+    server = mcp._mcp_server
+    sse = SseServerTransport("/messages/")
+    stats = {"started_at": time.time(), "sessions": 0, "requests": 0}
+
+    async def handle_sse(request):
+        stats["sessions"] += 1
+        async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+
+    async def handle_message(scope, receive, send):
+        # Every JSON-RPC message from a client arrives as one POST
+        stats["requests"] += 1
+        await sse.handle_post_message(scope, receive, send)
+
+    async def status(request):
+        return JSONResponse({"pid": os.getpid(), "uptime": time.time() - stats["started_at"], **stats})
+
+    return Starlette(routes=[
+        Route("/sse", endpoint=handle_sse),
+        Route("/status", endpoint=status),
+        Mount("/messages/", app=handle_message),
+    ])
+
+
+class _SkipStatusRequests(logging.Filter):
+    """Keep the launcher's periodic GET /status out of the access log"""
+
+    def filter(self, record):
+        args = record.args
+        return not (isinstance(args, tuple) and len(args) > 2 and args[2] == "/status")
+
+
+def register_process(transport, port=None):
+    """Record this server in the runtime registry until the process exits"""
+    from server_registry import register, unregister
+
+    try:
+        path = register(sys.argv[0], transport, port)
+    except OSError as e:
+        # Never fatal: the server works without it, it just won't be listed
+        print(f"⚠️  Could not register {sys.argv[0]}: {e}", file=sys.stderr)
+        return
+    atexit.register(unregister, path)
+
+
+def serve(mcp, default_port):
+    """Run `mcp` over the transport selected on the command line"""
+    parser = argparse.ArgumentParser(description=f"Run the {mcp.name} MCP server")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default=os.getenv("MCP_TRANSPORT", "stdio"))
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--keep-alive", type=float, default=DEFAULT_KEEP_ALIVE,
+                        help="seconds to keep idle HTTP connections open (sse only)")
+    args = parser.parse_args()
+
+    register_process(args.transport, None if args.transport == "stdio" else args.port)
+
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+        return
+
+    import uvicorn
+
+    logging.getLogger("uvicorn.access").addFilter(_SkipStatusRequests())
+    uvicorn.run(
+        build_sse_app(mcp),
+        host=args.host,
+        port=args.port,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=SHUTDOWN_GRACE,
+        log_level=mcp.settings.log_level.lower(),
+    )
@@ -4,86 +4,539 @@ Startup script for MCP servers
 
 This script starts all MCP servers in the background properly,
 avoiding terminal suspension issues.
+
+With --supervise it instead stays in the foreground as a supervisor: all
+servers start in parallel, each is probed with a real MCP initialize and
+tools/list handshake over its stdio pipes (which the supervisor holds), and
+servers that crash are restarted with exponential backoff.
+
+With --transport sse each server is served over HTTP/SSE instead, as
+--workers processes on consecutive ports starting at its base port, and the
+script prints the MCP_*_URL settings that point the agent at that fleet.
+
+With --gateway a single gateway_server.py process, which hosts the tools
+of all the servers, runs in place of one process per server.
+
+Server output is drained through pipes into size- and age-rotated,
+optionally gzipped logs (see server_logs.py); --log-max-bytes,
+--log-backups, --log-max-age and --no-compress-logs control them.
+
+The supervisor also answers status and stop commands on a Unix control
+socket (see server_registry.py), which check_servers.py and stop_servers.py
+use.
 """
 
+import argparse
+import asyncio
+import shutil
 import subprocess
 import sys
 import time
 import os
 import signal
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-def start_server(server_file, server_name):
+import server_logs
+import server_registry
+
+# (script, display name, first SSE port)
+SERVERS = [
+    ("math_server.py", "Math MCP Server", 8100),
+    ("weather_server.py", "Weather MCP Server", 8200)
+]
+GATEWAY = ("gateway_server.py", "Tool Gateway MCP Server", 8400)
+SSE_HOST = "127.0.0.1"
+
+# Detached mode: how long a freshly started server must stay up to count as started
+STARTUP_GRACE = 0.5
+
+# Supervisor mode
+PROBE_TIMEOUT = 15.0
+RESTART_BACKOFF_INITIAL = 1.0
+RESTART_BACKOFF_MAX = 30.0
+# A server that stayed up this long gets its backoff reset when it next crashes
+STABLE_AFTER = 60.0
+STOP_TIMEOUT = 5.0
+# How often the supervisor refreshes SSE workers' request counts from their /status
+STATUS_POLL_INTERVAL = 5.0
+
+
+def find_interpreter():
+    """
+    Find the project's Python interpreter once.
+
+    Inside the project's virtualenv (e.g. under `poetry run`) that is simply
+    this interpreter; otherwise ask Poetry for its environment a single time
+    rather than wrapping every server start in `poetry run`.
+    """
+    if sys.prefix != sys.base_prefix or os.environ.get("VIRTUAL_ENV"):
+        return sys.executable
+    if shutil.which("poetry"):
+        result = subprocess.run(
+            ["poetry", "env", "info", "--executable"],
+            capture_output=True, text=True
+        )
+        executable = result.stdout.strip()
+        if result.returncode == 0 and executable and os.path.exists(executable):
+            return executable
+    return sys.executable
+
+
+def server_command(python, server_file, port=None, host=SSE_HOST):
+    """The command line for a server; a port selects the SSE transport"""
+    command = [python, str(server_file)]
+    if port is not None:
+        command += ["--transport", "sse", "--host", host, "--port", str(port)]
+    return command
+
+
+def server_log_file(server_file, port=None):
+    return f"{server_file.stem}.log" if port is None else f"{server_file.stem}.{port}.log"
+
+
+def server_url_variable(server_file):
+    """The environment variable agent.py reads a server's SSE URLs from, e.g. MCP_MATH_URL"""
+    return f"MCP_{Path(server_file).stem.replace('_server', '').upper()}_URL"
+
+
+def expand_workers(servers, transport, workers):
+    """One (path, name, port) entry per process to run; stdio servers get no port"""
+    if transport == "stdio":
+        return [(server_path, server_name, None) for server_path, server_name, _ in servers]
+    return [
+        (server_path, f"{server_name} :{base_port + index}", base_port + index)
+        for server_path, server_name, base_port in servers
+        for index in range(workers)
+    ]
+
+
+def print_sse_settings(instances):
+    """Show how to point agent.py's DEFAULT_MCP_CONFIG at the SSE fleet"""
+    urls = {}
+    for server_path, _, port in instances:
+        if port is not None:
+            urls.setdefault(server_url_variable(server_path), []).append(f"http://{SSE_HOST}:{port}/sse")
+    if urls:
+        print("\n🔗 To use these servers from the agent:")
+        for variable, server_urls in urls.items():
+            print(f"  export {variable}={','.join(server_urls)}")
+        if server_url_variable(GATEWAY[0]) in urls:
+            print("  export MCP_TOOL_GATEWAY=process")
+
+
+def start_server(server_file, server_name, python, port=None, log_args=()):
     """Start a server in the background with proper output redirection"""
-    log_file = f"{server_file.stem}.log"
-    
+    log_file = server_log_file(server_file, port)
+
     print(f"🚀 Starting {server_name}...")
     print(f"📝 Logs will be written to: {log_file}")
-    
-    # Start the server with output redirected to log file
-    process = subprocess.Popen([
-        "poetry", "run", "python", str(server_file)
-    ], 
-    stdout=open(log_file, 'w'),
-    stderr=subprocess.STDOUT,
-    preexec_fn=os.setsid  # Create new process group
+
+    # The server outlives this script, so a small pump process of its own drains
+    # its output into the rotating log; it exits when the server closes the pipe
+    log_pump = subprocess.Popen(
+        [python, "server_logs.py", log_file, *log_args],
+        stdin=subprocess.PIPE,
+        # Nothing of the launcher's: a caller reading its output must see EOF when it exits
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+    # Start the server with output redirected to the log pump
+    process = subprocess.Popen(
+        server_command(python, server_file, port),
+        stdout=log_pump.stdin,
+        stderr=subprocess.STDOUT,
+        preexec_fn=os.setsid  # Create new process group
     )
-    
-    # Give it a moment to start
-    time.sleep(2)
-    
-    # Check if process is still running
-    if process.poll() is None:
-        print(f"✅ {server_name} started successfully (PID: {process.pid})")
-        return process
-    else:
-        print(f"❌ {server_name} failed to start")
-        return None
+    # The server now holds the only write end, so the pump sees EOF when it exits
+    log_pump.stdin.close()
+
+    return process
+
+
+def start_detached(servers, python, log_args=()):
+    """Start every server at once, then check them all after one shared grace period"""
+    started = [
+        (start_server(server_path, server_name, python, port, log_args), server_name)
+        for server_path, server_name, port in servers
+    ]
+
+    # Poll instead of sleeping a fixed time per server; a crash shows up right away
+    deadline = time.monotonic() + STARTUP_GRACE
+    while time.monotonic() < deadline and all(process.poll() is None for process, _ in started):
+        time.sleep(0.05)
+
+    processes = []
+    for process, server_name in started:
+        if process.poll() is None:
+            print(f"✅ {server_name} started successfully (PID: {process.pid})")
+            processes.append((process, server_name))
+        else:
+            print(f"❌ {server_name} failed to start")
+    return processes
+
+
+@asynccontextmanager
+async def process_transport(process):
+    """Speak MCP's newline-delimited JSON-RPC over a child process's stdin/stdout"""
+    import anyio
+    from anyio.streams.text import TextReceiveStream
+    from mcp import types
+
+    read_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_reader = anyio.create_memory_object_stream(0)
+
+    async def stdout_reader():
+        try:
+            async with read_writer:
+                buffer = ""
+                async for chunk in TextReceiveStream(process.stdout):
+                    lines = (buffer + chunk).split("\n")
+                    buffer = lines.pop()
+                    for line in lines:
+                        try:
+                            message = types.JSONRPCMessage.model_validate_json(line)
+                        except Exception:
+                            # Stray output (e.g. a print() banner) is not part of the protocol
+                            continue
+                        await read_writer.send(message)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await anyio.lowlevel.checkpoint()
+
+    async def stdin_writer():
+        try:
+            async with write_reader:
+                async for message in write_reader:
+                    payload = message.model_dump_json(by_alias=True, exclude_none=True)
+                    await process.stdin.send((payload + "\n").encode())
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await anyio.lowlevel.checkpoint()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(stdout_reader)
+        tg.start_soon(stdin_writer)
+        try:
+            yield read_stream, write_stream
+        finally:
+            tg.cancel_scope.cancel()
+
+
+class SupervisedServer:
+    """One MCP server (or one SSE worker of it) kept running by the supervisor"""
+
+    def __init__(self, server_file, server_name, python, probe_timeout=PROBE_TIMEOUT, port=None, host=SSE_HOST,
+                 log_options=None):
+        self.server_file = server_file
+        self.server_name = server_name
+        self.python = python
+        self.probe_timeout = probe_timeout
+        self.port = port
+        self.host = host
+        self.log_file = server_log_file(server_file, port)
+        # One sink for the server's whole life, so restarts append to the same rotating log
+        self.log = server_logs.LogSink(self.log_file, **(log_options or {}))
+        self.log.roll_over()
+        self.ready = asyncio.Event()
+        self.process = None
+        self.restarts = 0
+        self.tools = []
+        self.started_at = None
+        # Requests an SSE worker has answered, polled from its /status. A stdio
+        # server's only client is our own probe session, so it has no count.
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/sse"
+
+    async def run_once(self):
+        """Start the server, probe it, and hold it until the process exits"""
+        import anyio
+
+        self.process = await anyio.open_process(
+            server_command(self.python, self.server_file, self.port, self.host),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,  # Ctrl-C goes to the supervisor, which stops servers cleanly
+        )
+        self.started_at = time.time()
+        # Drained continuously, so the server never blocks writing its logs;
+        # a stdio server's stdout is the MCP channel instead
+        log_pumps = [asyncio.create_task(server_logs.pump(self.process.stderr, self.log))]
+        if self.port:
+            log_pumps.append(asyncio.create_task(server_logs.pump(self.process.stdout, self.log)))
+        try:
+            if self.port:
+                if await self.probe(self.probe_sse):
+                    self.mark_ready()
+                return await self.process.wait()
+            # A stdio server is only reachable through the pipes we hold, so the
+            # probe's session stays open for as long as the server runs
+            async with process_transport(self.process) as (read_stream, write_stream):
+                from mcp import ClientSession
+
+                async with ClientSession(read_stream, write_stream) as session:
+                    if await self.probe(lambda: self.list_tools(session)):
+                        self.mark_ready()
+                    return await self.process.wait()
+        finally:
+            await self.stop_process()
+            # Pick up the last lines the server wrote before it exited
+            await asyncio.wait(log_pumps, timeout=STOP_TIMEOUT)
+            for task in log_pumps:
+                task.cancel()
+
+    async def probe(self, handshake):
+        """Run the MCP handshake within the probe timeout; False if the process died first"""
+        import anyio
+
+        exited = False
+        async with anyio.create_task_group() as probe:
+            # A server that dies mid-handshake fails the probe right away
+            async def watch_exit():
+                nonlocal exited
+                await self.process.wait()
+                exited = True
+                probe.cancel_scope.cancel()
+
+            probe.start_soon(watch_exit)
+            with anyio.fail_after(self.probe_timeout):
+                await handshake()
+            probe.cancel_scope.cancel()
+        return not exited
+
+    async def list_tools(self, session):
+        await session.initialize()
+        self.tools = [tool.name for tool in (await session.list_tools()).tools]
+
+    async def probe_sse(self):
+        """Connect over SSE until the server accepts, then do the MCP handshake"""
+        from mcp import ClientSession
+        from mcp.client.sse import sse_client
+
+        while True:
+            try:
+                async with sse_client(self.url, timeout=2) as (read_stream, write_stream):
+                    async with ClientSession(read_stream, write_stream) as session:
+                        await self.list_tools(session)
+                        return
+            except Exception:
+                # Not listening yet
+                await asyncio.sleep(0.1)
+
+    async def poll_status(self):
+        """Keep an SSE worker's request count current, so status answers never wait on it"""
+        import httpx
+
+        async with httpx.AsyncClient(timeout=2) as client:
+            while True:
+                await self.ready.wait()
+                try:
+                    response = await client.get(f"http://{self.host}:{self.port}/status")
+                    self.requests = response.json()["requests"]
+                except (httpx.HTTPError, ValueError, KeyError):
+                    pass
+                await asyncio.sleep(STATUS_POLL_INTERVAL)
+
+    def status(self):
+        running = self.process is not None and self.process.returncode is None
+        return {
+            "name": self.server_name,
+            "server": self.server_file.name,
+            "port": self.port,
+            "pid": self.process.pid if running else None,
+            "ready": self.ready.is_set(),
+            "uptime": time.time() - self.started_at if running and self.started_at else 0.0,
+            "restarts": self.restarts,
+            "requests": self.requests if self.port else None,
+            "tools": self.tools,
+            "log": self.log.stats(),
+        }
+
+    def mark_ready(self):
+        self.ready.set()
+        if self.restarts:
+            print(f"✅ {self.server_name} is back up (PID: {self.process.pid})")
+
+    async def stop_process(self):
+        import anyio
+
+        process, self.process = self.process, None
+        if process is None or process.returncode is not None:
+            return
+        with anyio.CancelScope(shield=True):
+            if self.port:
+                process.terminate()
+            else:
+                # Closing stdin asks a stdio server to exit
+                try:
+                    await process.stdin.aclose()
+                except Exception:
+                    pass
+            with anyio.move_on_after(STOP_TIMEOUT):
+                await process.wait()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    async def supervise(self):
+        """Keep the server running, restarting it with exponential backoff when it dies"""
+        backoff = RESTART_BACKOFF_INITIAL
+        while True:
+            started = time.monotonic()
+            try:
+                returncode = await self.run_once()
+                reason = f"exited with code {returncode}"
+            except TimeoutError:
+                reason = f"did not answer the MCP handshake within {self.probe_timeout:g}s"
+            except Exception as e:
+                reason = f"failed: {e!r}"
+            self.ready.clear()
+
+            if time.monotonic() - started > STABLE_AFTER:
+                backoff = RESTART_BACKOFF_INITIAL
+            print(f"⚠️  {self.server_name} {reason}; restarting in {backoff:g}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+            self.restarts += 1
+            print(f"🔄 Restarting {self.server_name} (restart #{self.restarts})...")
+
+
+async def run_supervisor(servers, python, probe_timeout, log_options=None):
+    supervised = [
+        SupervisedServer(server_path, server_name, python, probe_timeout, port, log_options=log_options)
+        for server_path, server_name, port in servers
+    ]
+
+    print(f"🐍 Using interpreter: {python}")
+    for server in supervised:
+        print(f"🚀 Starting {server.server_name} (logs: {server.log_file})...")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    launched_at = time.time()
+
+    async def handle_command(request):
+        command = request.get("command")
+        if command == "ping":
+            return {"ok": True}
+        if command == "status":
+            return {
+                "launcher_pid": os.getpid(),
+                "uptime": time.time() - launched_at,
+                "servers": [server.status() for server in supervised],
+            }
+        if command == "logs":
+            # Recent lines from memory, so reading them never touches the log files
+            lines = int(request.get("lines", 3))
+            return {"logs": {server.server_name: server.log.tail(lines) for server in supervised}}
+        if command == "stop":
+            stop.set()
+            return {"stopping": True}
+        return {"error": f"unknown command {command!r}"}
+
+    control = await server_registry.start_control_server(handle_command)
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(server.supervise()) for server in supervised]
+    tasks += [asyncio.create_task(server.poll_status()) for server in supervised if server.port]
+
+    async def announce(server):
+        await server.ready.wait()
+        print(f"✅ {server.server_name} ready in {time.perf_counter() - started:.2f}s "
+              f"(PID: {server.process.pid}, tools: {', '.join(server.tools)})")
+
+    async def announce_all():
+        await asyncio.gather(*(announce(server) for server in supervised))
+        print(f"\n🎉 All servers ready in {time.perf_counter() - started:.2f}s")
+        print_sse_settings(servers)
+        print("🛑 Press Ctrl-C to stop the supervisor and its servers")
+
+    tasks.append(asyncio.create_task(announce_all()))
+    await stop.wait()
+
+    print("\n🛑 Stopping servers...")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await server_registry.stop_control_server(control)
+    for server in supervised:
+        server.log.close()
+    print("✅ All servers stopped")
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Start the MCP servers")
+    parser.add_argument("--supervise", action="store_true",
+                        help="stay in the foreground, probe readiness over MCP and restart crashed servers")
+    parser.add_argument("--probe-timeout", type=float, default=PROBE_TIMEOUT,
+                        help="seconds to wait for each server's MCP handshake (supervisor mode)")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio",
+                        help="serve over stdio pipes, or over HTTP/SSE on local ports")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="SSE worker processes per server, on consecutive ports")
+    parser.add_argument("--gateway", action="store_true",
+                        help="run one gateway_server.py hosting every server's tools instead of one process per server")
+    server_logs.add_log_arguments(parser)
+    args = parser.parse_args()
+
     print("🌟 Starting MCP Servers")
     print("=" * 50)
-    
+
     # Make sure we're in the right directory
     script_dir = Path(__file__).parent
     os.chdir(script_dir)
-    
-    servers = [
-        ("math_server.py", "Math MCP Server"),
-        ("weather_server.py", "Weather MCP Server")
-    ]
-    
+    # Inherited by every server started below, so they register as ours
+    os.environ[server_registry.OWNER_ENV] = server_registry.LAUNCHER_OWNER
+
+    servers = []
+    for server_file, server_name, base_port in [GATEWAY] if args.gateway else SERVERS:
+        server_path = Path(server_file)
+        if server_path.exists():
+            servers.append((server_path, server_name, base_port))
+        else:
+            print(f"⚠️  {server_file} not found, skipping...")
+
+    if not servers:
+        print("❌ No servers were started successfully")
+        sys.exit(1)
+
+    python = find_interpreter()
+    servers = expand_workers(servers, args.transport, max(args.workers, 1))
+
+    if args.supervise:
+        asyncio.run(run_supervisor(servers, python, args.probe_timeout, server_logs.file_options(args)))
+        return
+
     processes = []
-    
+
     try:
-        for server_file, server_name in servers:
-            server_path = Path(server_file)
-            if server_path.exists():
-                process = start_server(server_path, server_name)
-                if process:
-                    processes.append((process, server_name))
-            else:
-                print(f"⚠️  {server_file} not found, skipping...")
-        
+        processes = start_detached(servers, python, server_logs.pump_args(args))
+
         if processes:
             print("\n🎉 All servers started!")
             print("\nRunning servers:")
             for process, name in processes:
                 print(f"  • {name} (PID: {process.pid})")
-            
+
             print("\n📋 To check status:")
             print("  poetry run python check_servers.py")
             print("\n🛑 To stop all servers:")
             print("  poetry run python stop_servers.py")
             print("\n📝 To view logs:")
-            for server_file, _ in servers:
-                log_file = Path(server_file).stem + ".log"
-                print(f"  tail -f {log_file}")
-        
+            for server_path, _, port in servers:
+                print(f"  tail -f {server_log_file(server_path, port)}")
+            print_sse_settings(servers)
+
         else:
             print("❌ No servers were started successfully")
             sys.exit(1)
-            
+
     except KeyboardInterrupt:
         print("\n🛑 Interrupted by user")
         # Clean up processes
@@ -93,4 +546,4 @@ def main():
         sys.exit(0)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
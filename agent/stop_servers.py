@@ -3,78 +3,81 @@
 Stop script for MCP servers
 
 This script stops all running MCP servers cleanly.
+
+A running `start_servers.py --supervise` is asked to shut down over its
+control socket (otherwise it would restart what we stop); every other
+server start_servers.py started is found in the runtime registry (see
+server_registry.py) and sent SIGTERM.
+
+Servers the launcher did not start, such as the stdio servers the agent
+spawns and talks to over pipes, belong to their client and are left
+alone; --all stops them too.
 """
 
-import subprocess
-import sys
-import signal
+import argparse
 import os
+import signal
+import time
+
+import server_registry
+
+# How long to wait for the supervisor to stop its servers and exit
+SUPERVISOR_STOP_TIMEOUT = 15.0
+
+
+def stop_supervisor():
+    """Ask the supervisor to stop; returns how many servers it was running"""
+    status = server_registry.send_command({"command": "status"})
+    if not status or "servers" not in status:
+        return 0
+    print(f"🛑 Stopping supervisor (PID: {status['launcher_pid']}) and its servers")
+    server_registry.send_command({"command": "stop"})
+    deadline = time.monotonic() + SUPERVISOR_STOP_TIMEOUT
+    while server_registry.CONTROL_SOCKET.exists() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    if server_registry.CONTROL_SOCKET.exists():
+        print("⚠️  Supervisor did not exit in time; stopping its servers directly")
+    return sum(1 for server in status["servers"] if server["pid"])
 
-def find_and_kill_servers():
+
+def find_and_kill_servers(include_external=False):
     """Find and kill MCP server processes"""
-    
-    # Find processes running our servers
-    server_files = ["math_server.py", "weather_server.py"]
+
     killed_count = 0
-    
-    for server_file in server_files:
+
+    for record in server_registry.registered_servers():
+        if not include_external and not server_registry.launcher_owned(record):
+            print(f"⏭️  Leaving {record['server']} (PID: {record['pid']}) to its client "
+                  f"(PID: {record.get('parent_pid', '?')}); use --all to stop it")
+            continue
         try:
-            # Find processes containing the server filename
-            result = subprocess.run([
-                "pgrep", "-f", server_file
-            ], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                pids = result.stdout.strip().split('\n')
-                for pid in pids:
-                    if pid:  # Make sure PID is not empty
-                        try:
-                            pid_int = int(pid)
-                            print(f"🛑 Stopping {server_file} (PID: {pid_int})")
-                            os.kill(pid_int, signal.SIGTERM)
-                            killed_count += 1
-                        except (ValueError, ProcessLookupError):
-                            pass
-            else:
-                print(f"✅ {server_file} not running")
-                
-        except FileNotFoundError:
-            # pgrep not available, try ps instead
-            try:
-                result = subprocess.run([
-                    "ps", "aux"
-                ], capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    lines = result.stdout.split('\n')
-                    for line in lines:
-                        if server_file in line and 'python' in line:
-                            parts = line.split()
-                            if len(parts) > 1:
-                                try:
-                                    pid = int(parts[1])
-                                    print(f"🛑 Stopping {server_file} (PID: {pid})")
-                                    os.kill(pid, signal.SIGTERM)
-                                    killed_count += 1
-                                except (ValueError, ProcessLookupError):
-                                    pass
-            except:
-                pass
-    
+            print(f"🛑 Stopping {record['server']} (PID: {record['pid']})")
+            os.kill(record["pid"], signal.SIGTERM)
+            killed_count += 1
+        except ProcessLookupError:
+            pass
+        # A server killed by a signal cannot remove its own PID file
+        server_registry.unregister(server_registry.pid_file(os.path.splitext(record["server"])[0], record["pid"]))
+
     return killed_count
 
 def main():
+    parser = argparse.ArgumentParser(description="Stop the MCP servers")
+    parser.add_argument("--all", action="store_true",
+                        help="also stop servers start_servers.py did not start, e.g. ones the agent spawned")
+    args = parser.parse_args()
+
     print("🛑 Stopping MCP Servers")
     print("=" * 30)
     
-    killed_count = find_and_kill_servers()
+    killed_count = stop_supervisor() + find_and_kill_servers(args.all)
     
     if killed_count > 0:
         print(f"\n✅ Stopped {killed_count} server process(es)")
         print("\n🧹 Cleaning up log files...")
         
         # Optionally clean up log files
-        log_files = ["math_server.log", "weather_server.log"]
+        log_files = ["math_server.log", "weather_server.log", "gateway_server.log"]
         for log_file in log_files:
             if os.path.exists(log_file):
                 print(f"  📄 {log_file} (keeping for reference)")
@@ -84,4 +87,4 @@ def main():
     print("\n🏁 Done!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,154 @@
+import os
+
+import pytest
+
+from city_index import CityIndex, bounded_edit_distance, load_index, normalize
+
+CITIES_CSV = """name,country,latitude,longitude,population,aliases
+Paris,FR,48.8566,2.3522,2148000,Paree
+Paris,US,33.6609,-95.5555,25000,
+New York,US,40.7128,-74.0060,8336000,New York City|NYC
+São Paulo,BR,-23.5505,-46.6333,12330000,Sampa
+London,GB,51.5074,-0.1278,8982000,
+Amsterdam,NL,52.3676,4.9041,872000,
+Lyon,FR,45.7640,4.8357,516000,
+Lyons,US,43.0620,-76.9902,100000,
+"""
+
+
+def write_csv(path, text=CITIES_CSV):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path):
+    opened = load_index(write_csv(tmp_path / "cities.csv"))
+    yield opened
+    opened.close()
+
+
+def levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [("london", "londn"), ("amsterdam", "amstredam"), ("paris", "pairs"), ("kitten", "sitting"),
+     ("abc", "xyz"), ("", "ab"), ("new york", "newyork"), ("sao paulo", "sao polo")],
+)
+@pytest.mark.parametrize("limit", [0, 1, 2, 3])
+def test_bounded_edit_distance_matches_levenshtein_within_the_limit(a, b, limit):
+    exact = levenshtein(a, b)
+    expected = exact if exact <= limit else limit + 1
+    assert bounded_edit_distance(a, b, limit) == expected
+    assert bounded_edit_distance(b, a, limit) == expected
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize("SÃO PAULO") == "sao paulo"
+    assert normalize("  sao-paulo ") == "sao paulo"
+    assert normalize("New_York!") == "new york"
+
+
+def test_exact_and_alias_lookup(index):
+    match = index.resolve("London")
+    assert (match.status, match.city.name) == ("exact", "London")
+    match = index.resolve("NYC")
+    assert (match.status, match.city.name) == ("exact", "New York")
+    assert index.resolve("new york city").city.name == "New York"
+
+
+def test_same_name_is_ordered_by_population(index):
+    match = index.resolve("Paris")
+    assert (match.city.name, match.city.country) == ("Paris", "FR")
+    assert [(city.name, city.country) for city in match.suggestions] == [("Paris", "US")]
+
+
+def test_country_qualifier(index):
+    match = index.resolve("Paris, US")
+    assert (match.status, match.city.country) == ("exact", "US")
+    assert index.resolve("Paris, FR").city.country == "FR"
+    assert index.lookup("Paris, DE") == []
+
+
+def test_accent_and_case_folding(index):
+    for name in ("sao paulo", "SÃO PAULO", "Sao-Paulo"):
+        match = index.resolve(name)
+        assert (match.status, match.city.name) == ("exact", "São Paulo")
+
+
+def test_fuzzy_match_at_distance_one(index):
+    assert [(city.name, distance) for city, distance in index.fuzzy("Londn")] == [("London", 1)]
+    match = index.resolve("Londn")
+    assert (match.status, match.city.name) == ("fuzzy", "London")
+
+
+def test_fuzzy_match_at_distance_two(index):
+    assert index.fuzzy("Amstredam")[0][1] == 2
+    match = index.resolve("Amstredam")
+    assert (match.status, match.city.name) == ("fuzzy", "Amsterdam")
+
+
+def test_short_names_get_a_smaller_distance_bound(index):
+    # "Lindn" would be 2 edits from London, but a 5-letter name only tolerates 1
+    assert index.fuzzy("Lindn") == []
+
+
+def test_tie_is_broken_by_a_much_larger_population(index):
+    # Both Parises are one edit away; the French one is 85 times larger
+    match = index.resolve("Parus")
+    assert (match.status, match.city.country) == ("fuzzy", "FR")
+
+
+def test_ambiguous_tie_is_not_found(index):
+    # Lyon and Lyons are both one edit away and of comparable size
+    match = index.resolve("Lyonx")
+    assert match.status == "not_found"
+    assert match.city is None
+    assert {city.name for city in match.suggestions} == {"Lyon", "Lyons"}
+
+
+def test_unknown_name_suggests_prefix_matches(index):
+    match = index.resolve("Amsterdamned Island")
+    assert match.status == "not_found"
+    assert index.prefix("Ams")[0].name == "Amsterdam"
+
+
+def test_load_index_rebuilds_a_stale_index(tmp_path):
+    source = write_csv(tmp_path / "cities.csv")
+    index = load_index(source)
+    assert index.lookup("Berlin") == []
+    index.close()
+
+    write_csv(tmp_path / "cities.csv", CITIES_CSV + "Berlin,DE,52.5200,13.4050,3645000,\n")
+    # Make the source strictly newer than the index, whatever the filesystem's mtime resolution
+    index_mtime = os.path.getmtime(tmp_path / "cities.idx")
+    os.utime(source, (index_mtime + 10, index_mtime + 10))
+
+    index = load_index(source)
+    try:
+        assert [city.name for city in index.lookup("Berlin")] == ["Berlin"]
+    finally:
+        index.close()
+
+
+def test_load_index_rebuilds_an_unreadable_index(tmp_path):
+    source = write_csv(tmp_path / "cities.csv")
+    index_path = tmp_path / "cities.idx"
+    index_path.write_bytes(b"not an index")
+    source_mtime = os.path.getmtime(source)
+    os.utime(index_path, (source_mtime + 10, source_mtime + 10))
+
+    index = load_index(source)
+    try:
+        assert isinstance(index, CityIndex)
+        assert index.resolve("London").status == "exact"
+    finally:
+        index.close()
@@ -0,0 +1,70 @@
+import pytest
+
+from math_server import MAX_INTEGER_BITS, safe_evaluate
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("(3+4)*(5+6)*7", 539),
+        ("2^10", 1024),
+        ("7 // 2 + 7 % 2", 4),
+        ("sqrt(16) + abs(-2)", 6.0),
+        ("factorial(10)", 3628800),
+        ("2**100", 2**100),
+    ],
+)
+def test_evaluates_arithmetic(expression, expected):
+    assert safe_evaluate(expression) == expected
+
+
+@pytest.mark.parametrize("expression", ["(-1)**0.5", "(-8)**(1/3)"])
+def test_rejects_complex_results(expression):
+    with pytest.raises(ValueError, match="not a real number"):
+        safe_evaluate(expression)
+
+
+@pytest.mark.parametrize("expression", ["2**20000", "10**5000", "3**(10**9)", "(2**7000)*(2**7000)*(2**300)"])
+def test_rejects_huge_powers(expression):
+    with pytest.raises(ValueError, match=f"exceeds {MAX_INTEGER_BITS} bits"):
+        safe_evaluate(expression)
+
+
+def test_rejects_huge_factorials_before_computing_them():
+    with pytest.raises(ValueError, match=f"exceeds {MAX_INTEGER_BITS} bits"):
+        safe_evaluate("factorial(2000)")
+    with pytest.raises(ValueError, match=f"exceeds {MAX_INTEGER_BITS} bits"):
+        safe_evaluate("factorial(10**12)")
+
+
+def test_results_within_the_cap_can_be_printed():
+    # The cap follows the int-to-str limit, so what passes can be serialized
+    assert len(str(safe_evaluate("factorial(1500)"))) < 4300
+    assert str(safe_evaluate("10**4000")).startswith("1")
+
+
+@pytest.mark.parametrize("expression", ["1/0", "5 // 0", "3 % 0"])
+def test_rejects_division_by_zero(expression):
+    with pytest.raises(ValueError, match="Division by zero"):
+        safe_evaluate(expression)
+
+
+def test_rejects_float_overflow():
+    with pytest.raises(ValueError, match="too large to represent as a float"):
+        safe_evaluate("1e308 * 10")
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["__import__('os')", "x + 1", "[1, 2]", "abs(x=1)", "'a' * 3", "(lambda: 1)()"],
+)
+def test_rejects_unsupported_syntax(expression):
+    with pytest.raises(ValueError, match="Unsupported syntax"):
+        safe_evaluate(expression)
+
+
+def test_rejects_invalid_input():
+    with pytest.raises(ValueError, match="Invalid expression"):
+        safe_evaluate("2 +")
+    with pytest.raises(ValueError, match="longer than"):
+        safe_evaluate("1+" * 600 + "1")
@@ -0,0 +1,359 @@
+"""
+Weather Providers
+
+The weather tools read conditions through a WeatherProvider, so the data
+source can be swapped without touching the tools:
+
+  • MockWeatherProvider – the built-in tables, no network (the default)
+  • OpenMeteoProvider   – async HTTP against the Open-Meteo forecast API, or
+                          anything that speaks its API, such as the local stub
+                          in weather_stub_server.py
+  • CachingProvider     – wraps another provider with a TTL cache, optionally
+                          persisted to SQLite so that several server workers
+                          share it, and coalesces concurrent requests for one
+                          city into a single upstream call
+
+A provider may be used from several event loops at once, e.g. when the
+agent hosts the tool gateway in-process and runs turns on more than one
+loop. Anything bound to a loop (HTTP connection pools, in-flight futures)
+is therefore kept per loop; the answer cache is shared.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Mapping, NamedTuple, Optional, Tuple, TypeVar
+
+from city_index import City
+
+
+class CityWeather(NamedTuple):
+    temp: int  # °C
+    condition: str
+    humidity: int  # %
+    wind: int  # km/h
+
+
+class ForecastDay(NamedTuple):
+    high: int  # °C
+    low: int  # °C
+    condition: str
+    rain_chance: int  # %
+
+
+class WeatherProviderError(Exception):
+    """The provider could not answer, e.g. the upstream API failed or timed out"""
+
+
+T = TypeVar("T")
+
+
+def _for_running_loop(per_loop: Dict[asyncio.AbstractEventLoop, T], create: Callable[[], T]) -> T:
+    """The running loop's value in `per_loop`, created on first use; entries of closed loops are dropped"""
+    loop = asyncio.get_running_loop()
+    value = per_loop.get(loop)
+    if value is None:
+        for closed in [other for other in per_loop if other.is_closed()]:
+            del per_loop[closed]
+        value = per_loop[loop] = create()
+    return value
+
+
+class WeatherProvider(ABC):
+    """Source of current conditions and daily forecasts for resolved cities"""
+
+    @abstractmethod
+    async def current(self, city: City) -> CityWeather:
+        ...
+
+    @abstractmethod
+    async def forecast(self, city: City, days: int) -> Tuple[ForecastDay, ...]:
+        """Up to `days` days starting today"""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class MockWeatherProvider(WeatherProvider):
+    """
+    Hand-set conditions for the cities in `cities`, deterministic synthetic
+    conditions for any other city with coordinates, and the same forecast
+    everywhere.
+    """
+
+    SYNTHETIC_CONDITIONS = ("Sunny", "Partly Cloudy", "Overcast", "Light Rain", "Clear", "Scattered Showers")
+
+    def __init__(self, cities: Mapping[str, CityWeather], forecast: Tuple[ForecastDay, ...], default: CityWeather):
+        self.cities = cities
+        self.forecast_days = forecast
+        self.default = default
+
+    def synthetic(self, city: City) -> CityWeather:
+        if not math.isfinite(city.latitude):
+            return self.default
+        # Warmer towards the equator, the rest seeded from the name
+        seed = zlib.crc32(f"{city.name},{city.country}".encode("utf-8"))
+        temp = round(30 - abs(city.latitude) * 0.4) + seed % 7 - 3
+        return CityWeather(temp, self.SYNTHETIC_CONDITIONS[seed % len(self.SYNTHETIC_CONDITIONS)], 40 + seed % 50, 5 + seed % 25)
+
+    async def current(self, city: City) -> CityWeather:
+        weather = self.cities.get(city.name)
+        return weather if weather is not None else self.synthetic(city)
+
+    async def forecast(self, city: City, days: int) -> Tuple[ForecastDay, ...]:
+        return self.forecast_days[:days]
+
+
+# WMO weather interpretation codes, as returned by Open-Meteo
+WMO_CONDITIONS = {
+    0: "Clear", 1: "Sunny", 2: "Partly Cloudy", 3: "Overcast",
+    45: "Fog", 48: "Fog",
+    51: "Drizzle", 53: "Drizzle", 55: "Drizzle", 56: "Freezing Drizzle", 57: "Freezing Drizzle",
+    61: "Light Rain", 63: "Rain", 65: "Heavy Rain", 66: "Freezing Rain", 67: "Freezing Rain",
+    71: "Light Snow", 73: "Snow", 75: "Heavy Snow", 77: "Snow Grains",
+    80: "Scattered Showers", 81: "Showers", 82: "Heavy Showers", 85: "Snow Showers", 86: "Snow Showers",
+    95: "Thunderstorm", 96: "Thunderstorm with Hail", 99: "Thunderstorm with Hail",
+}
+
+
+def _condition(code: Any) -> str:
+    return WMO_CONDITIONS.get(code, "Unknown")
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """
+    Conditions from an Open-Meteo compatible /v1/forecast endpoint.
+
+    One pooled httpx.AsyncClient per event loop is shared by every call on
+    it, so concurrent tool calls reuse keep-alive connections instead of
+    opening one per request, and no loop touches another loop's connections.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 5.0, max_connections: int = 20):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._clients: Dict[asyncio.AbstractEventLoop, Any] = {}
+        self._clients_lock = threading.Lock()
+
+    def _new_client(self):
+        import httpx
+
+        # httpx logs every request at INFO, which would flood the server's stderr
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            headers={"User-Agent": "mcp-agent-weather-server"},
+        )
+
+    def client(self):
+        """The running loop's client"""
+        with self._clients_lock:
+            return _for_running_loop(self._clients, self._new_client)
+
+    async def _get(self, city: City, **params) -> Dict[str, Any]:
+        import httpx
+
+        if not math.isfinite(city.latitude):
+            raise WeatherProviderError(f"No coordinates known for {city.name}")
+        try:
+            response = await self.client().get("/v1/forecast", params={
+                "latitude": f"{city.latitude:.4f}",
+                "longitude": f"{city.longitude:.4f}",
+                "timezone": "auto",
+                **params,
+            })
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise WeatherProviderError(f"Weather service request for {city.name} failed: {e}") from e
+
+    async def current(self, city: City) -> CityWeather:
+        body = await self._get(city, current="temperature_2m,relative_humidity_2m,wind_speed_10m,weather_code")
+        try:
+            data = body["current"]
+            return CityWeather(
+                round(data["temperature_2m"]),
+                _condition(data["weather_code"]),
+                round(data["relative_humidity_2m"]),
+                round(data["wind_speed_10m"]),
+            )
+        except (KeyError, TypeError) as e:
+            raise WeatherProviderError(f"Unexpected weather service response for {city.name}: {e!r}") from e
+
+    async def forecast(self, city: City, days: int) -> Tuple[ForecastDay, ...]:
+        body = await self._get(
+            city,
+            daily="temperature_2m_max,temperature_2m_min,precipitation_probability_max,weather_code",
+            forecast_days=days,
+        )
+        try:
+            data = body["daily"]
+            return tuple(
+                ForecastDay(round(high), round(low), _condition(code), round(rain or 0))
+                for high, low, rain, code in zip(
+                    data["temperature_2m_max"],
+                    data["temperature_2m_min"],
+                    data["precipitation_probability_max"],
+                    data["weather_code"],
+                )
+            )
+        except (KeyError, TypeError) as e:
+            raise WeatherProviderError(f"Unexpected weather service response for {city.name}: {e!r}") from e
+
+    async def aclose(self) -> None:
+        """Close this loop's client; the clients of other loops that still run are closed on them"""
+        current = asyncio.get_running_loop()
+        with self._clients_lock:
+            clients, self._clients = self._clients, {}
+        for loop, client in clients.items():
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+
+class CachingProvider(WeatherProvider):
+    """
+    TTL cache and request coalescing in front of another provider.
+
+    While a request for a city is in flight, further requests for the same
+    city await it instead of going upstream. Successful answers are kept for
+    `ttl` seconds in an in-memory LRU and, when `path` is set, in a SQLite
+    file that any number of server processes can share. Failures are never
+    cached. Forecasts are always fetched for `forecast_days` days, so one
+    upstream call serves every day count.
+    """
+
+    def __init__(
+        self,
+        provider: WeatherProvider,
+        ttl: float,
+        path: Optional[str] = None,
+        max_size: int = 4096,
+        forecast_days: int = 7,
+    ):
+        self.provider = provider
+        self.ttl = ttl
+        self.max_size = max_size
+        self.forecast_days = forecast_days
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._entries_lock = threading.Lock()
+        # Requests in flight, per event loop: a future can only be awaited on its own loop
+        self._inflight: Dict[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]] = {}
+        self._inflight_lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS weather_cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "upstream_calls": 0, "errors": 0}
+
+    @staticmethod
+    def _key(kind: str, city: City) -> str:
+        return f"{kind}:{city.name},{city.country}:{city.latitude:.2f},{city.longitude:.2f}"
+
+    def _cached(self, key: str) -> Optional[Any]:
+        # Wall-clock expiry, so entries written by another process compare correctly
+        now = time.time()
+        with self._entries_lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                if cached[0] > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return cached[1]
+                del self._entries[key]
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute("SELECT expires_at, value FROM weather_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] > now:
+                value = json.loads(row[1])
+                self._remember(key, row[0], value)
+                self.stats["disk_hits"] += 1
+                return value
+        return None
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        with self._entries_lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _store(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO weather_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                    (key, expires_at, json.dumps(value)),
+                )
+                self._db.execute("DELETE FROM weather_cache WHERE expires_at <= ?", (time.time(),))
+
+    async def _fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        self.stats["upstream_calls"] += 1
+        try:
+            value = await fetch()
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        self._store(key, value)
+        return value
+
+    async def _get(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        with self._inflight_lock:
+            inflight = _for_running_loop(self._inflight, dict)
+        task = inflight.get(key)
+        if task is None:
+            self.stats["misses"] += 1
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(inflight, key, done))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: one caller giving up must not cancel the request the others wait on
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _finish(inflight: Dict[str, asyncio.Future], key: str, task: asyncio.Future) -> None:
+        inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark a failure as retrieved even if every waiter was cancelled
+
+    async def current(self, city: City) -> CityWeather:
+        async def fetch():
+            return list(await self.provider.current(city))
+
+        return CityWeather(*await self._get(self._key("current", city), fetch))
+
+    async def forecast(self, city: City, days: int) -> Tuple[ForecastDay, ...]:
+        async def fetch():
+            return [list(day) for day in await self.provider.forecast(city, self.forecast_days)]
+
+        cached = await self._get(self._key("forecast", city), fetch)
+        return tuple(ForecastDay(*day) for day in cached[:days])
+
+    async def aclose(self) -> None:
+        await self.provider.aclose()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
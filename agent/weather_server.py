@@ -8,141 +8,388 @@ This demonstrates how to create extensible functionality for the MCP agent.
 
 import json
 import asyncio
-from typing import Any, Dict
+import math
+import os
+import sys
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
 from fastmcp import FastMCP
 
+from city_index import City, CityIndex, CityMatch, load_index
+from weather_providers import (
+    CachingProvider,
+    CityWeather,
+    ForecastDay,
+    MockWeatherProvider,
+    OpenMeteoProvider,
+    WeatherProvider,
+)
+
 # Initialize the MCP server
 mcp = FastMCP("Weather Server")
 
 
+# Mock data, built once at import. WEATHER_PROVIDER=open-meteo switches the
+# tools to a real weather API (see weather_providers.py).
+CITIES: Mapping[str, CityWeather] = MappingProxyType({
+    "Tokyo": CityWeather(22, "Partly Cloudy", 65, 12),
+    "Paris": CityWeather(18, "Light Rain", 80, 8),
+    "New York": CityWeather(25, "Sunny", 55, 15),
+    "London": CityWeather(16, "Overcast", 75, 10),
+    "Sydney": CityWeather(28, "Clear", 60, 20),
+})
+DEFAULT_WEATHER = CityWeather(20, "Unknown", 60, 10)
+
+# Cities the tools know about; WEATHER_CITY_INDEX points at a prebuilt index
+# (see city_index.py) for large datasets, otherwise the bundled CSV is indexed
+CITY_DATA = os.getenv("WEATHER_CITY_DATA", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.csv"))
+CITY_INDEX_PATH = os.getenv("WEATHER_CITY_INDEX")
+
+# Where conditions come from: "mock" (the tables here) or "open-meteo" (any
+# Open-Meteo compatible API, e.g. WEATHER_API_URL=http://127.0.0.1:8300 for
+# weather_stub_server.py). API answers are cached for WEATHER_CACHE_TTL
+# seconds, and also in the SQLite file WEATHER_CACHE_PATH when set.
+WEATHER_PROVIDER = os.getenv("WEATHER_PROVIDER", "mock")
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.open-meteo.com")
+WEATHER_API_TIMEOUT = float(os.getenv("WEATHER_API_TIMEOUT", "5"))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_PATH = os.getenv("WEATHER_CACHE_PATH")
+
+FORECAST: Tuple[ForecastDay, ...] = (
+    ForecastDay(24, 18, "Sunny", 10),
+    ForecastDay(22, 16, "Partly Cloudy", 25),
+    ForecastDay(20, 14, "Light Rain", 70),
+    ForecastDay(26, 20, "Clear", 5),
+    ForecastDay(19, 13, "Overcast", 40),
+    ForecastDay(23, 17, "Scattered Showers", 60),
+    ForecastDay(25, 19, "Sunny", 15),
+)
+DAY_NAMES = ("Today", "Tomorrow", "Day 3", "Day 4", "Day 5", "Day 6", "Day 7")
+MAX_FORECAST_DAYS = 7
+
+# Tool output formats, and the most cities one batch call may ask about
+OUTPUT_FORMATS = ("text", "json")
+MAX_BATCH_CITIES = 50
+
+ALERTS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "Miami": ("🌀 Tropical Storm Watch in effect", "🌊 Coastal Flood Advisory"),
+    "Phoenix": ("🔥 Excessive Heat Warning", "💨 Dust Storm Advisory"),
+    "Denver": ("❄️ Winter Weather Advisory", "🌨️ Heavy Snow Warning"),
+    "San Francisco": ("🌫️ Dense Fog Advisory",),
+})
+
+CURRENT_RULE = "━" * 32
+FORECAST_RULE = "━" * 47
+ALERTS_RULE = "━" * 39
+COMPARE_RULE = "━" * 62
+FORECAST_DAY_SEPARATOR = "   " + "─" * 40 + "\n"
+
+
+# Rendered response bodies are cached by value; per call only the city name is filled in
+@lru_cache(maxsize=4096)
+def current_body(weather: CityWeather) -> str:
+    return "\n".join((
+        CURRENT_RULE,
+        f"🌡️  Temperature: {weather.temp}°C",
+        f"☁️  Condition: {weather.condition}",
+        f"💧 Humidity: {weather.humidity}%",
+        f"💨 Wind Speed: {weather.wind} km/h",
+        CURRENT_RULE,
+        "",
+    ))
+
+
+def _render_forecast_day(index: int, day: ForecastDay) -> str:
+    return (
+        f"📆 {DAY_NAMES[index]}:\n"
+        f"   🌡️  High: {day.high}°C | Low: {day.low}°C\n"
+        f"   ☁️  {day.condition}\n"
+        f"   🌧️  Rain Chance: {day.rain_chance}%\n"
+    )
+
+
+@lru_cache(maxsize=1024)
+def forecast_body(forecast: Tuple[ForecastDay, ...]) -> str:
+    return FORECAST_DAY_SEPARATOR.join(_render_forecast_day(index, day) for index, day in enumerate(forecast)) + FORECAST_RULE
+
+
+def _render_alerts(alerts: Tuple[str, ...]) -> str:
+    lines = [ALERTS_RULE]
+    lines.extend(f"{number}. {alert}" for number, alert in enumerate(alerts, 1))
+    lines.append(ALERTS_RULE)
+    lines.append("🔔 Stay informed and follow local authorities' guidance.")
+    return "\n".join(lines)
+
+
+ALERT_BODIES: Mapping[str, str] = MappingProxyType({city: _render_alerts(alerts) for city, alerts in ALERTS.items()})
+
+def _open_city_index() -> Optional[CityIndex]:
+    try:
+        if CITY_INDEX_PATH:
+            return CityIndex.open(CITY_INDEX_PATH)
+        return load_index(CITY_DATA)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  City index unavailable, using the built-in cities only: {e}", file=sys.stderr)
+        return None
+
+
+CITY_INDEX = _open_city_index()
+
+
+def _create_provider() -> WeatherProvider:
+    if WEATHER_PROVIDER == "mock":
+        return MockWeatherProvider(CITIES, FORECAST, DEFAULT_WEATHER)
+    if WEATHER_PROVIDER == "open-meteo":
+        upstream = OpenMeteoProvider(WEATHER_API_URL, timeout=WEATHER_API_TIMEOUT)
+        return CachingProvider(upstream, WEATHER_CACHE_TTL, WEATHER_CACHE_PATH, forecast_days=MAX_FORECAST_DAYS)
+    raise ValueError(f"Unknown WEATHER_PROVIDER {WEATHER_PROVIDER!r} (expected mock or open-meteo)")
+
+
+PROVIDER = _create_provider()
+
+
+class UnknownCity(Exception):
+    """Raised when a city name matches no known city; the message lists suggestions"""
+
+    def __init__(self, city: str, suggestions: Tuple[City, ...] = ()):
+        self.city = city
+        self.suggestions = suggestions
+        message = f"❓ Unknown city '{city}'."
+        if suggestions:
+            labels = [f"{suggestion.name}, {suggestion.country}" for suggestion in suggestions]
+            # Same-named cities in one country are told apart by their coordinates
+            labels = [
+                f"{label} ({suggestion.latitude:.2f}, {suggestion.longitude:.2f})" if labels.count(label) > 1 else label
+                for label, suggestion in zip(labels, suggestions)
+            ]
+            message += " Did you mean: " + "; ".join(labels) + "?"
+        super().__init__(message)
+
+    def to_data(self) -> Dict[str, Any]:
+        return {
+            "city": self.city,
+            "error": "unknown city",
+            "suggestions": [
+                {"name": city.name, "country": city.country, "latitude": round(city.latitude, 2), "longitude": round(city.longitude, 2)}
+                for city in self.suggestions
+            ],
+        }
+
+
+@lru_cache(maxsize=4096)
+def _match_city(city: str) -> CityMatch:
+    # The index is immutable, so repeated spellings skip the lookup
+    return CITY_INDEX.resolve(city)
+
+
+def resolve_city(city: str) -> City:
+    """The city meant by a name as typed, e.g. "nyc" → New York"""
+    if CITY_INDEX is None:
+        return City(-1, city.title(), "", math.nan, math.nan, 0)
+    match = _match_city(city)
+    if match.city is None:
+        raise UnknownCity(city, match.suggestions)
+    return match.city
+
+
+def _current_text(name: str, weather: CityWeather) -> str:
+    return f"🌤️ Current Weather in {name}:\n{current_body(weather)}"
+
+
+def _current_data(name: str, weather: CityWeather) -> Dict[str, Any]:
+    return {
+        "city": name,
+        "temp_c": weather.temp,
+        "condition": weather.condition,
+        "humidity_pct": weather.humidity,
+        "wind_kmh": weather.wind,
+    }
+
+
+def _forecast_data(name: str, forecast: Tuple[ForecastDay, ...]) -> Dict[str, Any]:
+    return {
+        "city": name,
+        "days": [
+            {"day": DAY_NAMES[index], "high_c": day.high, "low_c": day.low, "condition": day.condition, "rain_chance_pct": day.rain_chance}
+            for index, day in enumerate(forecast)
+        ],
+    }
+
+
+async def _city_alerts(city: City) -> Tuple[str, ...]:
+    # Alerts stay a local table; the weather APIs supported here do not publish them
+    return ALERTS.get(city.name, ())
+
+
+def _alerts_text(name: str, alerts: Tuple[str, ...]) -> str:
+    body = ALERT_BODIES.get(name)
+    if body is None:
+        return f"✅ No weather alerts for {name} at this time."
+    return f"⚠️  Weather Alerts for {name}:\n{body}"
+
+
+def _alerts_data(name: str, alerts: Tuple[str, ...]) -> Dict[str, Any]:
+    return {"city": name, "alerts": list(alerts)}
+
+
+async def _answer(
+    city: str,
+    output_format: str,
+    fetch: Callable[[City], Awaitable[Any]],
+    render_text: Callable[[str, Any], str],
+    build_data: Callable[[str, Any], Dict[str, Any]],
+) -> Any:
+    """
+    One city's answer: display text, or a JSON-ready dict (an error entry for unknown cities).
+
+    A WeatherProviderError is not an answer: it propagates, so the call
+    fails as a tool error the client can retry instead of a result it caches.
+    """
+    try:
+        place = resolve_city(city)
+    except UnknownCity as e:
+        return str(e) if output_format == "text" else e.to_data()
+    value = await fetch(place)
+    if output_format == "text":
+        return render_text(place.name, value)
+    return build_data(place.name, value)
+
+
+async def _respond(cities: Sequence[str], output_format: str, fetch, render_text, build_data) -> str:
+    """Answer a batch of cities in one response, in request order, fetching them concurrently"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+    if len(cities) > MAX_BATCH_CITIES:
+        raise ValueError(f"At most {MAX_BATCH_CITIES} cities per call")
+    answers = await asyncio.gather(*(_answer(city, output_format, fetch, render_text, build_data) for city in cities))
+    if output_format == "text":
+        return "\n\n".join(answers)
+    return _to_json(answers)
+
+
+async def _respond_one(city: str, output_format: str, fetch, render_text, build_data) -> str:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+    answer = await _answer(city, output_format, fetch, render_text, build_data)
+    return answer if output_format == "text" else _to_json(answer)
+
+
+def _to_json(payload: Any) -> str:
+    # Compact separators and raw UTF-8 keep the reply small in tokens
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def _clamp_days(days: int) -> int:
+    # Limit days to reasonable range
+    return min(max(days, 1), MAX_FORECAST_DAYS)
+
+
+def _forecast_answer(days: int):
+    """fetch/render_text/build_data for a forecast of `days` days"""
+    async def fetch(city: City) -> Tuple[ForecastDay, ...]:
+        return await PROVIDER.forecast(city, days)
+
+    def render_text(name: str, forecast: Tuple[ForecastDay, ...]) -> str:
+        return f"📅 {days}-Day Weather Forecast for {name}:\n{FORECAST_RULE}\n{forecast_body(forecast)}"
+
+    return fetch, render_text, _forecast_data
+
+
 @mcp.tool()
-def get_current_weather(city: str) -> str:
+async def get_current_weather(city: str, output_format: str = "text") -> str:
     """
     Get the current weather for a specified city.
     
     Args:
         city: The name of the city to get weather for
+        output_format: "text" for a formatted report, "json" for a compact JSON object
         
     Returns:
         A formatted string with current weather information
     """
-    # In a real implementation, you'd call a weather API like OpenWeatherMap
-    # For now, we'll return mock data with realistic-looking information
-    
-    weather_data = {
-        "Tokyo": {"temp": "22°C", "condition": "Partly Cloudy", "humidity": "65%", "wind": "12 km/h"},
-        "Paris": {"temp": "18°C", "condition": "Light Rain", "humidity": "80%", "wind": "8 km/h"},
-        "New York": {"temp": "25°C", "condition": "Sunny", "humidity": "55%", "wind": "15 km/h"},
-        "London": {"temp": "16°C", "condition": "Overcast", "humidity": "75%", "wind": "10 km/h"},
-        "Sydney": {"temp": "28°C", "condition": "Clear", "humidity": "60%", "wind": "20 km/h"},
-    }
-    
-    # Get weather for the city or provide default
-    city_title = city.title()
-    weather = weather_data.get(city_title, {
-        "temp": "20°C", 
-        "condition": "Unknown", 
-        "humidity": "60%", 
-        "wind": "10 km/h"
-    })
-    
-    return f"""🌤️ Current Weather in {city_title}:
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-🌡️  Temperature: {weather['temp']}
-☁️  Condition: {weather['condition']}
-💧 Humidity: {weather['humidity']}
-💨 Wind Speed: {weather['wind']}
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-"""
+    return await _respond_one(city, output_format, PROVIDER.current, _current_text, _current_data)
 
 
 @mcp.tool()
-def get_weather_forecast(city: str, days: int = 3) -> str:
+async def get_weather_forecast(city: str, days: int = 3, output_format: str = "text") -> str:
     """
     Get a multi-day weather forecast for a specified city.
     
     Args:
         city: The name of the city to get forecast for
         days: Number of days to forecast (default: 3, max: 7)
+        output_format: "text" for a formatted report, "json" for a compact JSON object
         
     Returns:
         A formatted string with weather forecast information
     """
-    # Limit days to reasonable range
-    days = min(max(days, 1), 7)
-    
-    # Mock forecast data
-    forecast_templates = [
-        {"temp_high": "24°C", "temp_low": "18°C", "condition": "Sunny", "chance_rain": "10%"},
-        {"temp_high": "22°C", "temp_low": "16°C", "condition": "Partly Cloudy", "chance_rain": "25%"},
-        {"temp_high": "20°C", "temp_low": "14°C", "condition": "Light Rain", "chance_rain": "70%"},
-        {"temp_high": "26°C", "temp_low": "20°C", "condition": "Clear", "chance_rain": "5%"},
-        {"temp_high": "19°C", "temp_low": "13°C", "condition": "Overcast", "chance_rain": "40%"},
-        {"temp_high": "23°C", "temp_low": "17°C", "condition": "Scattered Showers", "chance_rain": "60%"},
-        {"temp_high": "25°C", "temp_low": "19°C", "condition": "Sunny", "chance_rain": "15%"},
-    ]
-    
-    city_title = city.title()
-    forecast_text = f"📅 {days}-Day Weather Forecast for {city_title}:\n"
-    forecast_text += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    
-    day_names = ["Today", "Tomorrow", "Day 3", "Day 4", "Day 5", "Day 6", "Day 7"]
-    
-    for i in range(days):
-        day = day_names[i] if i < len(day_names) else f"Day {i+1}"
-        forecast = forecast_templates[i % len(forecast_templates)]
-        
-        forecast_text += f"📆 {day}:\n"
-        forecast_text += f"   🌡️  High: {forecast['temp_high']} | Low: {forecast['temp_low']}\n"
-        forecast_text += f"   ☁️  {forecast['condition']}\n"
-        forecast_text += f"   🌧️  Rain Chance: {forecast['chance_rain']}\n"
-        
-        if i < days - 1:  # Don't add separator after last day
-            forecast_text += "   ────────────────────────────────────────\n"
-    
-    forecast_text += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-    return forecast_text
+    return await _respond_one(city, output_format, *_forecast_answer(_clamp_days(days)))
 
 
 @mcp.tool()
-def get_weather_alerts(city: str) -> str:
+async def get_weather_alerts(city: str, output_format: str = "text") -> str:
     """
     Get weather alerts and warnings for a specified city.
     
     Args:
         city: The name of the city to check for alerts
+        output_format: "text" for a formatted report, "json" for a compact JSON object
         
     Returns:
         A formatted string with weather alerts or "No alerts" message
     """
-    # Mock alert data - in real implementation, this would come from weather service
-    alerts_data = {
-        "Miami": ["🌀 Tropical Storm Watch in effect", "🌊 Coastal Flood Advisory"],
-        "Phoenix": ["🔥 Excessive Heat Warning", "💨 Dust Storm Advisory"],
-        "Denver": ["❄️ Winter Weather Advisory", "🌨️ Heavy Snow Warning"],
-        "San Francisco": ["🌫️ Dense Fog Advisory"],
-    }
-    
-    city_title = city.title()
-    alerts = alerts_data.get(city_title, [])
-    
-    if not alerts:
-        return f"✅ No weather alerts for {city_title} at this time."
-    
-    alert_text = f"⚠️  Weather Alerts for {city_title}:\n"
-    alert_text += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
+    return await _respond_one(city, output_format, _city_alerts, _alerts_text, _alerts_data)
+
+
+@mcp.tool()
+async def get_current_weather_many(cities: List[str], output_format: str = "json") -> str:
+    """
+    Get the current weather for several cities in one call.
     
-    for i, alert in enumerate(alerts, 1):
-        alert_text += f"{i}. {alert}\n"
+    Args:
+        cities: The names of the cities to get weather for (at most 50)
+        output_format: "json" (default) for a compact JSON array, "text" for formatted reports
+        
+    Returns:
+        One entry per city, in the order given; unknown cities get an error entry with suggestions
+    """
+    return await _respond(cities, output_format, PROVIDER.current, _current_text, _current_data)
+
+
+@mcp.tool()
+async def get_weather_forecast_many(cities: List[str], days: int = 3, output_format: str = "json") -> str:
+    """
+    Get a multi-day weather forecast for several cities in one call.
     
-    alert_text += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    alert_text += "🔔 Stay informed and follow local authorities' guidance."
+    Args:
+        cities: The names of the cities to get forecasts for (at most 50)
+        days: Number of days to forecast (default: 3, max: 7)
+        output_format: "json" (default) for a compact JSON array, "text" for formatted reports
+        
+    Returns:
+        One entry per city, in the order given; unknown cities get an error entry with suggestions
+    """
+    return await _respond(cities, output_format, *_forecast_answer(_clamp_days(days)))
+
+
+@mcp.tool()
+async def get_weather_alerts_many(cities: List[str], output_format: str = "json") -> str:
+    """
+    Get weather alerts and warnings for several cities in one call.
     
-    return alert_text
+    Args:
+        cities: The names of the cities to check for alerts (at most 50)
+        output_format: "json" (default) for a compact JSON array, "text" for formatted reports
+        
+    Returns:
+        One entry per city, in the order given; unknown cities get an error entry with suggestions
+    """
+    return await _respond(cities, output_format, _city_alerts, _alerts_text, _alerts_data)
 
 
 @mcp.tool()
-def compare_weather(city1: str, city2: str) -> str:
+async def compare_weather(city1: str, city2: str) -> str:
     """
     Compare current weather between two cities.
     
@@ -153,57 +400,60 @@ def compare_weather(city1: str, city2: str) -> str:
     Returns:
         A formatted comparison of weather between the two cities
     """
-    # Get weather for both cities (reusing our mock data)
-    weather_data = {
-        "Tokyo": {"temp": 22, "condition": "Partly Cloudy", "humidity": 65},
-        "Paris": {"temp": 18, "condition": "Light Rain", "humidity": 80},
-        "New York": {"temp": 25, "condition": "Sunny", "humidity": 55},
-        "London": {"temp": 16, "condition": "Overcast", "humidity": 75},
-        "Sydney": {"temp": 28, "condition": "Clear", "humidity": 60},
-    }
-    
-    city1_title = city1.title()
-    city2_title = city2.title()
-    
-    weather1 = weather_data.get(city1_title, {"temp": 20, "condition": "Unknown", "humidity": 60})
-    weather2 = weather_data.get(city2_title, {"temp": 20, "condition": "Unknown", "humidity": 60})
-    
-    temp_diff = weather1["temp"] - weather2["temp"]
-    humidity_diff = weather1["humidity"] - weather2["humidity"]
-    
-    comparison = f"🌍 Weather Comparison: {city1_title} vs {city2_title}\n"
-    comparison += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    comparison += f"📍 {city1_title:<15} | 📍 {city2_title}\n"
-    comparison += f"🌡️  {weather1['temp']}°C{'':<12} | 🌡️  {weather2['temp']}°C\n"
-    comparison += f"☁️  {weather1['condition']:<15} | ☁️  {weather2['condition']}\n"
-    comparison += f"💧 {weather1['humidity']}% humidity{'':<5} | 💧 {weather2['humidity']}% humidity\n"
-    comparison += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    
+    try:
+        place1 = resolve_city(city1)
+        place2 = resolve_city(city2)
+    except UnknownCity as e:
+        return str(e)
+    # Provider errors propagate as tool errors, which the agent does not cache
+    weather1, weather2 = await asyncio.gather(PROVIDER.current(place1), PROVIDER.current(place2))
+    city1_title = place1.name
+    city2_title = place2.name
+
+    temp_diff = weather1.temp - weather2.temp
+    humidity_diff = weather1.humidity - weather2.humidity
+
     if temp_diff > 0:
-        comparison += f"🔥 {city1_title} is {abs(temp_diff)}°C warmer than {city2_title}\n"
+        temp_line = f"🔥 {city1_title} is {temp_diff}°C warmer than {city2_title}"
     elif temp_diff < 0:
-        comparison += f"❄️  {city2_title} is {abs(temp_diff)}°C warmer than {city1_title}\n"
+        temp_line = f"❄️  {city2_title} is {-temp_diff}°C warmer than {city1_title}"
     else:
-        comparison += f"🌡️  Both cities have the same temperature\n"
-    
+        temp_line = "🌡️  Both cities have the same temperature"
+
     if humidity_diff > 0:
-        comparison += f"💧 {city1_title} is {abs(humidity_diff)}% more humid than {city2_title}"
+        humidity_line = f"💧 {city1_title} is {humidity_diff}% more humid than {city2_title}"
     elif humidity_diff < 0:
-        comparison += f"💧 {city2_title} is {abs(humidity_diff)}% more humid than {city1_title}"
+        humidity_line = f"💧 {city2_title} is {-humidity_diff}% more humid than {city1_title}"
     else:
-        comparison += f"💧 Both cities have the same humidity level"
-    
-    return comparison
+        humidity_line = "💧 Both cities have the same humidity level"
+
+    return "\n".join((
+        f"🌍 Weather Comparison: {city1_title} vs {city2_title}",
+        COMPARE_RULE,
+        f"📍 {city1_title:<15} | 📍 {city2_title}",
+        f"🌡️  {weather1.temp}°C{'':<12} | 🌡️  {weather2.temp}°C",
+        f"☁️  {weather1.condition:<15} | ☁️  {weather2.condition}",
+        f"💧 {weather1.humidity}% humidity{'':<5} | 💧 {weather2.humidity}% humidity",
+        COMPARE_RULE,
+        temp_line,
+        humidity_line,
+    ))
 
 
 if __name__ == "__main__":
     # Run the MCP server
-    print("🌤️  Starting Weather MCP Server...")
-    print("📡 Available tools:")
-    print("   • get_current_weather(city)")
-    print("   • get_weather_forecast(city, days)")
-    print("   • get_weather_alerts(city)")
-    print("   • compare_weather(city1, city2)")
-    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    # stdout carries the MCP protocol over stdio, so the banner goes to stderr
+    print("🌤️  Starting Weather MCP Server...", file=sys.stderr)
+    print("📡 Available tools:", file=sys.stderr)
+    print("   • get_current_weather(city)", file=sys.stderr)
+    print("   • get_weather_forecast(city, days)", file=sys.stderr)
+    print("   • get_weather_alerts(city)", file=sys.stderr)
+    print("   • compare_weather(city1, city2)", file=sys.stderr)
+    print("   • get_current_weather_many(cities)", file=sys.stderr)
+    print("   • get_weather_forecast_many(cities, days)", file=sys.stderr)
+    print("   • get_weather_alerts_many(cities)", file=sys.stderr)
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━", file=sys.stderr)
     
-    mcp.run() 
\ No newline at end of file
+    from server_transport import serve
+
+    serve(mcp, default_port=8200) 
\ No newline at end of file
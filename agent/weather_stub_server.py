@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Weather API Stub Server
+
+A local stand-in for the Open-Meteo forecast API, for exercising the
+weather server's HTTP provider without network access or rate limits:
+
+  python weather_stub_server.py --port 8300 --delay 0.2
+  WEATHER_PROVIDER=open-meteo WEATHER_API_URL=http://127.0.0.1:8300 python weather_server.py
+
+GET /v1/forecast answers the `current` and `daily` variables the provider
+asks for, with values derived deterministically from the coordinates.
+GET /stats reports how many forecast requests arrived, which shows whether
+concurrent tool calls were coalesced; POST /stats/reset zeroes it.
+"""
+
+import argparse
+import asyncio
+import datetime
+import sys
+import zlib
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+WEATHER_CODES = (0, 1, 2, 3, 45, 61, 63, 80, 95)
+
+
+def _seed(latitude: float, longitude: float, salt: str = "") -> int:
+    return zlib.crc32(f"{latitude:.2f},{longitude:.2f}{salt}".encode())
+
+
+def current_conditions(latitude: float, longitude: float) -> dict:
+    seed = _seed(latitude, longitude)
+    return {
+        "time": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M"),
+        "interval": 900,
+        "temperature_2m": round(30 - abs(latitude) * 0.4 + (seed % 80) / 10 - 4, 1),
+        "relative_humidity_2m": 35 + seed % 60,
+        "wind_speed_10m": round(3 + (seed % 300) / 10, 1),
+        "weather_code": WEATHER_CODES[seed % len(WEATHER_CODES)],
+    }
+
+
+def daily_forecast(latitude: float, longitude: float, days: int) -> dict:
+    today = datetime.date.today()
+    rows = []
+    for day in range(days):
+        seed = _seed(latitude, longitude, f":{day}")
+        high = 30 - abs(latitude) * 0.4 + (seed % 60) / 10 - 2
+        rows.append((
+            (today + datetime.timedelta(days=day)).isoformat(),
+            round(high, 1),
+            round(high - 4 - seed % 6, 1),
+            seed % 101,
+            WEATHER_CODES[seed % len(WEATHER_CODES)],
+        ))
+    keys = ("time", "temperature_2m_max", "temperature_2m_min", "precipitation_probability_max", "weather_code")
+    return {key: [row[index] for row in rows] for index, key in enumerate(keys)}
+
+
+def build_app(delay: float = 0.0) -> Starlette:
+    stats = {"forecast_requests": 0}
+
+    async def forecast(request: Request) -> JSONResponse:
+        stats["forecast_requests"] += 1
+        try:
+            latitude = float(request.query_params["latitude"])
+            longitude = float(request.query_params["longitude"])
+            days = int(request.query_params.get("forecast_days", "7"))
+        except (KeyError, ValueError):
+            return JSONResponse({"error": True, "reason": "latitude and longitude are required"}, status_code=400)
+        if delay:
+            await asyncio.sleep(delay)
+        body = {"latitude": latitude, "longitude": longitude, "timezone": "GMT"}
+        if "current" in request.query_params:
+            body["current"] = current_conditions(latitude, longitude)
+        if "daily" in request.query_params:
+            body["daily"] = daily_forecast(latitude, longitude, min(max(days, 1), 16))
+        return JSONResponse(body)
+
+    async def get_stats(request: Request) -> JSONResponse:
+        return JSONResponse(stats)
+
+    async def reset_stats(request: Request) -> JSONResponse:
+        stats["forecast_requests"] = 0
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/v1/forecast", forecast),
+        Route("/stats", get_stats),
+        Route("/stats/reset", reset_stats, methods=["POST"]),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub of the Open-Meteo forecast API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each forecast response")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    print(f"🧪 Weather API stub on http://{args.host}:{args.port}/v1/forecast", file=sys.stderr)
+    uvicorn.run(build_app(args.delay), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -48,7 +48,9 @@ export function MCPConfigModal({ isOpen, onClose }: MCPConfigModalProps) {
 
   // Initialize agent state with the data from localStorage
   const { state: agentState, setState: setAgentState } = useCoAgent<{
-    mcp_config: Record<string, ServerConfig>;
+    // The agent interns a sent config and clears this field, keeping only its id
+    mcp_config: Record<string, ServerConfig> | null;
+    mcp_config_id?: string | null;
     response: string;
     logs: Array<{ message: string; done: boolean }>;
   }>({
@@ -60,8 +62,8 @@ export function MCPConfigModal({ isOpen, onClose }: MCPConfigModalProps) {
     },
   });
 
-  // Simple getter for configs
-  const configs = agentState?.mcp_config || {};
+  // Simple getter for configs; once the agent has interned them they are only in localStorage
+  const configs = agentState?.mcp_config || savedConfigs || {};
 
   // Simple setter wrapper for configs
   const setConfigs = (newConfigs: Record<string, ServerConfig>) => {